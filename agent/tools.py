@@ -137,7 +137,11 @@ def rag_search(
         
         result = _rag_system.query(query, k=5, date_range=date_range, recency_boost=recency_boost)
         answer = result["answer"]
-        citations = "\n".join([f"{Fore.BLUE}[{i+1}]{Style.RESET_ALL} {c['source']}" for i, c in enumerate(result["citations"])])
+        citations = "\n".join([
+            f"{Fore.BLUE}[{i+1}]{Style.RESET_ALL} {c['source']}"
+            + (f" (also in {', '.join(sorted({d['source'] for d in c['also_in']}))})" if c.get("also_in") else "")
+            for i, c in enumerate(result["citations"])
+        ])
         return f"{answer}\n\n{Fore.BLUE}Sources:{Style.RESET_ALL}\n{citations}"
     except Exception as e:
         error_msg = f"Error in RAG search: {type(e).__name__}: {str(e)}"
@@ -0,0 +1,195 @@
+# Pipelined bulk upserts into the vector store
+
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+from colorama import Fore, Style
+
+EmbedDocuments = Callable[[List[str]], List[List[float]]]
+# write_batch(ids, embeddings, texts, metadatas) stores one batch
+WriteBatch = Callable[[List[str], List[List[float]], List[str], List[dict]], None]
+# existing_ids(ids) returns the subset already stored
+ExistingIds = Callable[[List[str]], Set[str]]
+# progress_callback(chunks_written, total_chunks); total is None for streams of unknown length
+ProgressCallback = Callable[[int, Optional[int]], None]
+
+
+class BulkWriter:
+    """Embeds and uploads chunks in batches, overlapping the two stages.
+
+    The calling thread embeds batch after batch while up to max_workers
+    batches are written concurrently. At most 2 * max_workers embedded
+    batches wait in memory, so embedding pauses when the uploads fall behind.
+    A failed write is retried with exponential backoff; ids are fixed before
+    the first attempt, so a retried upsert never duplicates chunks. With
+    existing_ids, chunks already in the store are skipped before embedding.
+    write_stream adds a bounded read-ahead stage in front, so loading and
+    splitting overlap with embedding too.
+    """
+
+    def __init__(
+        self,
+        embed_documents: EmbedDocuments,
+        write_batch: WriteBatch,
+        batch_size: int = 256,
+        max_workers: int = 4,
+        max_retries: int = 3,
+        retry_backoff: float = 1.0,
+        progress_callback: Optional[ProgressCallback] = None,
+        existing_ids: Optional[ExistingIds] = None
+    ):
+        if batch_size <= 0:
+            raise ValueError(f"batch_size must be positive, got {batch_size}")
+        if max_workers <= 0:
+            raise ValueError(f"max_workers must be positive, got {max_workers}")
+        self.embed_documents = embed_documents
+        self.write_batch = write_batch
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.progress_callback = progress_callback
+        self.existing_ids = existing_ids
+        self._lock = threading.Lock()
+
+    def _write_with_retry(self, ids, embeddings, texts, metadatas):
+        attempt = 0
+        while True:
+            try:
+                self.write_batch(ids, embeddings, texts, metadatas)
+                return
+            except Exception as e:
+                if attempt >= self.max_retries:
+                    raise
+                wait = self.retry_backoff * 2 ** attempt
+                attempt += 1
+                print(
+                    f"{Fore.YELLOW}Batch write failed ({type(e).__name__}: {str(e)}), "
+                    f"retry {attempt}/{self.max_retries} in {wait:.1f}s{Style.RESET_ALL}"
+                )
+                time.sleep(wait)
+
+    def write(self, ids: Sequence[str], texts: Sequence[str], metadatas: Sequence[dict]) -> List[str]:
+        """Embed and store all chunks; returns ids in input order. Raises the first batch failure."""
+        return self.write_stream(zip(ids, texts, metadatas), total=len(ids))
+
+    def write_stream(self, records: Iterable[Tuple[str, str, dict]], total: Optional[int] = None) -> List[str]:
+        """Embed and store (id, text, metadata) records pulled lazily from an iterable.
+
+        A background thread reads records into a buffer of 2 * batch_size, so
+        producing records (loading, splitting) overlaps with embedding, and
+        memory stays bounded however long the stream is. total is only passed
+        on to the progress callback. Returns the ids in stream order.
+        """
+        all_ids: List[str] = []
+        written = [0]
+        errors: List[BaseException] = []
+        slots = threading.BoundedSemaphore(2 * self.max_workers)
+
+        def upload(size: int, batch: List[Tuple[str, str, dict]], embeddings: List[List[float]]):
+            try:
+                if batch:
+                    self._write_with_retry(
+                        [record[0] for record in batch],
+                        embeddings,
+                        [record[1] for record in batch],
+                        [record[2] for record in batch]
+                    )
+                with self._lock:
+                    written[0] += size
+                    done = written[0]
+                if self.progress_callback is not None:
+                    self.progress_callback(done, total)
+            except BaseException as e:
+                errors.append(e)
+            finally:
+                slots.release()
+
+        buffered = prefetch(records, 2 * self.batch_size)
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+                for batch in _batches(buffered, self.batch_size):
+                    slots.acquire()
+                    if errors:
+                        slots.release()
+                        break
+                    size = len(batch)
+                    all_ids.extend(record[0] for record in batch)
+                    try:
+                        # A repeated id within one write is rejected by the store; keep its last version
+                        batch = list({record[0]: record for record in batch}.values())
+                        if self.existing_ids is not None:
+                            stored = self.existing_ids([record[0] for record in batch])
+                            batch = [record for record in batch if record[0] not in stored]
+                        embeddings = self.embed_documents([record[1] for record in batch]) if batch else []
+                    except BaseException:
+                        slots.release()
+                        raise
+                    pool.submit(upload, size, batch, embeddings)
+        finally:
+            buffered.close()
+
+        if errors:
+            raise errors[0]
+        return all_ids
+
+
+def _batches(items: Iterable, size: int) -> Iterator[list]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def prefetch(iterable: Iterable, max_buffered: int) -> Iterator:
+    """Iterate over iterable in a background thread, holding at most max_buffered items ahead.
+
+    The producer blocks while the buffer is full. Exceptions are re-raised in
+    the consumer, and closing the returned generator stops the producer.
+    """
+    buffer = queue.Queue(maxsize=max(1, max_buffered))
+    stop = threading.Event()
+    finished = object()
+
+    def put(entry) -> bool:
+        while not stop.is_set():
+            try:
+                buffer.put(entry, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if not put((item, None)):
+                    return
+            put((finished, None))
+        except BaseException as e:
+            put((finished, e))
+
+    def consume():
+        # The producer starts on first use, so an unused generator leaves no thread behind
+        producer = threading.Thread(target=produce, daemon=True)
+        producer.start()
+        try:
+            while True:
+                item, error = buffer.get()
+                if item is finished:
+                    if error is not None:
+                        raise error
+                    return
+                yield item
+        finally:
+            stop.set()
+            producer.join()
+
+    return consume()
@@ -0,0 +1,95 @@
+# Micro-batching of concurrent query embedding requests
+
+import threading
+import time
+from typing import Callable, List, Optional
+
+
+class _PendingQuery:
+    __slots__ = ("text", "wake", "finished", "embedding", "error")
+
+    def __init__(self, text: str):
+        self.text = text
+        self.wake = threading.Event()
+        self.finished = False
+        self.embedding: Optional[List[float]] = None
+        self.error: Optional[BaseException] = None
+
+
+class QueryCoalescer:
+    """Gathers query texts submitted by concurrent threads into batched embedding calls.
+
+    The first caller to arrive becomes the leader: it waits up to max_wait
+    seconds (or until max_batch_size queries are queued), embeds the queued
+    texts with one embed_batch call and hands each caller its vector. Queries
+    that arrive while a batch is in flight form the next batch, led by the
+    oldest of them. No background thread is needed.
+    """
+
+    def __init__(
+        self,
+        embed_batch: Callable[[List[str]], List[List[float]]],
+        max_wait: float = 0.005,
+        max_batch_size: int = 128
+    ):
+        self.embed_batch = embed_batch
+        self.max_wait = max_wait
+        self.max_batch_size = max_batch_size
+        self._cond = threading.Condition()
+        self._queue: List[_PendingQuery] = []
+        self._leader: Optional[_PendingQuery] = None
+        self.batches = 0
+        self.queries = 0
+
+    def embed(self, text: str) -> List[float]:
+        entry = _PendingQuery(text)
+        with self._cond:
+            self._queue.append(entry)
+            if self._leader is None:
+                self._leader = entry
+            elif len(self._queue) >= self.max_batch_size:
+                self._cond.notify_all()
+
+        while not entry.finished:
+            if self._leader is entry:
+                self._run_batch()
+            else:
+                entry.wake.wait()
+                entry.wake.clear()
+
+        if entry.error is not None:
+            raise entry.error
+        return entry.embedding
+
+    def _run_batch(self):
+        with self._cond:
+            deadline = time.monotonic() + self.max_wait
+            while len(self._queue) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            batch = self._queue[:self.max_batch_size]
+            del self._queue[:len(batch)]
+
+        # Identical concurrent questions are embedded once
+        texts = list(dict.fromkeys(entry.text for entry in batch))
+        try:
+            by_text = dict(zip(texts, self.embed_batch(texts)))
+            error = None
+        except Exception as e:
+            by_text, error = {}, e
+
+        with self._cond:
+            self.batches += 1
+            self.queries += len(batch)
+            # The oldest waiting query leads the next batch
+            self._leader = self._queue[0] if self._queue else None
+            if self._leader is not None:
+                self._leader.wake.set()
+
+        for entry in batch:
+            entry.embedding = by_text.get(entry.text)
+            entry.error = error
+            entry.finished = True
+            entry.wake.set()
@@ -0,0 +1,91 @@
+# Deterministic content date extraction from document text
+
+import re
+from datetime import datetime
+from typing import Optional
+
+_MONTHS = {
+    "january": 1, "february": 2, "march": 3, "april": 4, "may": 5, "june": 6, "july": 7,
+    "august": 8, "september": 9, "october": 10, "november": 11, "december": 12,
+    "jan": 1, "feb": 2, "mar": 3, "apr": 4, "jun": 6, "jul": 7, "aug": 8, "sep": 9, "sept": 9,
+    "oct": 10, "nov": 11, "dec": 12
+}
+_MONTH = r"(?:" + "|".join(sorted(_MONTHS, key=len, reverse=True)) + r")\.?"
+
+# Date expressions, most specific first; each alternative captures its own groups
+_DATE = (
+    rf"(?P<iso_year>\d{{4}})-(?P<iso_month>\d{{1,2}})(?:-(?P<iso_day>\d{{1,2}}))?\b"
+    rf"|(?P<mdy_month>{_MONTH})\s+(?P<mdy_day>\d{{1,2}})(?:st|nd|rd|th)?,?\s+(?P<mdy_year>\d{{4}})\b"
+    rf"|(?P<dmy_day>\d{{1,2}})(?:st|nd|rd|th)?\s+(?P<dmy_month>{_MONTH}),?\s+(?P<dmy_year>\d{{4}})\b"
+    rf"|(?P<my_month>{_MONTH}),?\s+(?P<my_year>\d{{4}})\b"
+    rf"|Q(?P<q_quarter>[1-4])\s*(?:FY\s*)?(?P<q_year>\d{{4}})\b"
+)
+# Labels that introduce the date a document's content refers to; bare "as of" and "dated"
+# are left out since running text uses them for historical dates ("as of March 2021 the company...")
+_LABEL = (
+    r"(?:last\s+(?:updated|modified|revised|reviewed)|updated(?:\s+on)?|revised(?:\s+on)?|revision\s+date"
+    r"|effective(?:\s+date)?(?:\s+as\s+of)?|report(?:ing)?\s+date|reporting\s+period|period\s+ending"
+    r"|published(?:\s+on)?|publication\s+date|release\s+date)"
+)
+_LABELLED_DATE = re.compile(rf"\b{_LABEL}\s*[:\-–]?\s*(?:on\s+)?(?:{_DATE})", re.IGNORECASE)
+_QUARTER = re.compile(r"\bQ(?P<q_quarter>[1-4])\s*(?:FY\s*)?(?P<q_year>\d{4})\b", re.IGNORECASE)
+
+
+def _to_iso(match: re.Match) -> Optional[str]:
+    """First day of the period a date expression names, as an ISO timestamp, or None if invalid."""
+    groups = match.groupdict()
+    if groups.get("iso_year"):
+        year, month, day = groups["iso_year"], groups["iso_month"], groups["iso_day"] or 1
+    elif groups.get("mdy_year"):
+        year, month, day = groups["mdy_year"], groups["mdy_month"], groups["mdy_day"]
+    elif groups.get("dmy_year"):
+        year, month, day = groups["dmy_year"], groups["dmy_month"], groups["dmy_day"]
+    elif groups.get("my_year"):
+        year, month, day = groups["my_year"], groups["my_month"], 1
+    else:
+        year, month, day = groups["q_year"], 3 * int(groups["q_quarter"]) - 2, 1
+    if isinstance(month, str) and not month.isdigit():
+        month = _MONTHS[month.lower().rstrip(".")]
+    try:
+        parsed = datetime(int(year), int(month), int(day))
+    except ValueError:
+        return None
+    if not 1900 <= parsed.year <= 2100:
+        return None
+    return parsed.isoformat()
+
+
+class DateExtractor:
+    """Finds content dates such as "Last Updated: January 2026", "Effective Date:
+    January 2025" or "Reporting Period: October 1, 2024 - ..." with regular expressions.
+
+    Only labelled dates count for a chunk, since bare dates in running text are
+    mostly examples, deadlines or comparisons. A document's date may also come
+    from a quarter like "Q4 2024" near its start, as in a report title. Months and
+    quarters resolve to their first day, matching the curated temporal metadata.
+    """
+
+    def __init__(self, header_chars: int = 1000):
+        # How far into a document its title and header lines are looked for
+        self.header_chars = header_chars
+
+    def chunk_date(self, text: str) -> Optional[str]:
+        """First labelled date in text, as an ISO timestamp."""
+        for match in _LABELLED_DATE.finditer(text):
+            date = _to_iso(match)
+            if date:
+                return date
+        return None
+
+    def document_date(self, text: str) -> Optional[str]:
+        """Date of a whole document: the first labelled date or quarter in its header."""
+        header = text[:self.header_chars]
+        matches = sorted(
+            [*_LABELLED_DATE.finditer(header), *_QUARTER.finditer(header)],
+            key=lambda match: match.start()
+        )
+        for match in matches:
+            date = _to_iso(match)
+            if date:
+                return date
+        return None
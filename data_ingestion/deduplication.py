@@ -0,0 +1,286 @@
+# Near-duplicate chunk detection at ingestion (MinHash + LSH)
+
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Union
+
+import numpy as np
+from langchain_core.documents import Document
+
+_WORD_PATTERN = re.compile(r"\w+")
+# Multiplier of the polynomial hashes combining words into shingles and rows into band keys
+_PRIME = np.uint64(1099511628211)
+
+
+@lru_cache(maxsize=1 << 16)
+def _word_hash(word: str) -> int:
+    # Stable across processes, unlike hash()
+    return int.from_bytes(hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+class MinHasher:
+    """MinHash signatures of texts over word shingles.
+
+    Two signatures agree at a position with probability equal to the Jaccard
+    similarity of the texts' shingle sets, so the fraction of equal positions
+    estimates it. Signatures are cut into bands of rows; texts sharing a whole
+    band are candidate duplicates, which finds pairs above about
+    (1 / bands) ** (1 / rows) similarity without comparing every pair.
+    """
+
+    def __init__(self, num_perm: int = 128, shingle_size: int = 5, bands: int = 32, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be a multiple of bands ({bands})")
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.bands = bands
+        self.rows = num_perm // bands
+        rng = np.random.default_rng(seed)
+        # Multiply-shift hash functions; odd multipliers keep them permutations of 64-bit values
+        self._a = rng.integers(0, 2 ** 63, num_perm, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        self._b = rng.integers(0, 2 ** 63, num_perm, dtype=np.uint64)
+
+    def signature(self, text: str) -> Optional[np.ndarray]:
+        """MinHash signature of text, or None when it has no words."""
+        words = _WORD_PATTERN.findall(text.lower())
+        if not words:
+            return None
+        hashes = np.array([_word_hash(word) for word in words], dtype=np.uint64)
+        width = min(self.shingle_size, len(hashes))
+        count = len(hashes) - width + 1
+        shingles = np.zeros(count, dtype=np.uint64)
+        for offset in range(width):
+            shingles = shingles * _PRIME + hashes[offset:offset + count]
+        shingles = np.unique(shingles)
+        values = (self._a[:, None] * shingles[None, :] + self._b[:, None]) >> np.uint64(32)
+        return values.min(axis=1).astype(np.uint32)
+
+    def band_keys(self, signature: np.ndarray) -> List[int]:
+        """One key per band, equal for two signatures exactly when that band is identical."""
+        rows = signature.reshape(self.bands, self.rows).astype(np.uint64)
+        keys = np.arange(self.bands, dtype=np.uint64)
+        for row in range(self.rows):
+            keys = keys * _PRIME + rows[:, row]
+        # SQLite integers are signed 64-bit
+        return keys.view(np.int64).tolist()
+
+
+class ChunkDeduplicator:
+    """SQLite index of the chunks written to a collection, used to skip near-duplicates.
+
+    Chunks whose estimated Jaccard similarity to an indexed chunk reaches
+    threshold are not written. They are stored here instead, with their text
+    and metadata and a link to the chunk kept in their place, so citations can
+    name every source of a passage. If a kept chunk is later deleted, forget()
+    hands its duplicates back for ingestion.
+    """
+
+    def __init__(
+        self,
+        path: Union[str, Path],
+        collection_key: str,
+        threshold: float = 0.9,
+        num_perm: int = 128,
+        shingle_size: int = 5
+    ):
+        if not 0 < threshold <= 1:
+            raise ValueError(f"threshold must be in (0, 1], got {threshold}")
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.collection_key = collection_key
+        self.threshold = threshold
+        self.hasher = MinHasher(num_perm=num_perm, shingle_size=shingle_size)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS settings (
+                collection TEXT PRIMARY KEY, num_perm INTEGER NOT NULL, shingle_size INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS signatures (
+                collection TEXT NOT NULL, chunk_id TEXT NOT NULL, signature BLOB NOT NULL,
+                PRIMARY KEY (collection, chunk_id)
+            );
+            CREATE TABLE IF NOT EXISTS buckets (
+                collection TEXT NOT NULL, key INTEGER NOT NULL, chunk_id TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS buckets_key ON buckets (collection, key);
+            CREATE TABLE IF NOT EXISTS duplicates (
+                collection TEXT NOT NULL, chunk_id TEXT NOT NULL, canonical_id TEXT NOT NULL,
+                similarity REAL NOT NULL, page_content TEXT NOT NULL, metadata TEXT NOT NULL,
+                PRIMARY KEY (collection, chunk_id)
+            );
+            CREATE INDEX IF NOT EXISTS duplicates_canonical ON duplicates (collection, canonical_id);
+            """
+        )
+        # Signatures are only comparable when computed the same way
+        row = self._db.execute(
+            "SELECT num_perm, shingle_size FROM settings WHERE collection = ?", (collection_key,)
+        ).fetchone()
+        if row is None:
+            self._db.execute(
+                "INSERT INTO settings (collection, num_perm, shingle_size) VALUES (?, ?, ?)",
+                (collection_key, num_perm, shingle_size)
+            )
+        elif tuple(row) != (num_perm, shingle_size):
+            raise ValueError(
+                f"Collection {collection_key} was deduplicated with num_perm={row[0]}, shingle_size={row[1]}; "
+                f"got num_perm={num_perm}, shingle_size={shingle_size}"
+            )
+        self._db.commit()
+
+    def _best_match(self, signature: np.ndarray):
+        keys = self.hasher.band_keys(signature)
+        placeholders = ",".join("?" * len(keys))
+        rows = self._db.execute(
+            "SELECT s.chunk_id, s.signature FROM signatures s WHERE s.collection = ? AND s.chunk_id IN ("
+            f"SELECT chunk_id FROM buckets WHERE collection = ? AND key IN ({placeholders}))",
+            (self.collection_key, self.collection_key, *keys)
+        ).fetchall()
+        best_id, best = None, 0.0
+        for candidate_id, blob in rows:
+            similarity = float(np.mean(np.frombuffer(blob, dtype=np.uint32) == signature))
+            if similarity > best:
+                best_id, best = candidate_id, similarity
+        return best_id, best
+
+    def _index(self, chunk_id: str, signature: np.ndarray):
+        self._db.execute(
+            "INSERT OR REPLACE INTO signatures (collection, chunk_id, signature) VALUES (?, ?, ?)",
+            (self.collection_key, chunk_id, signature.tobytes())
+        )
+        self._db.executemany(
+            "INSERT INTO buckets (collection, key, chunk_id) VALUES (?, ?, ?)",
+            [(self.collection_key, key, chunk_id) for key in self.hasher.band_keys(signature)]
+        )
+
+    @property
+    def settings(self) -> Dict[str, Union[float, int]]:
+        return {
+            "threshold": self.threshold,
+            "num_perm": self.hasher.num_perm,
+            "shingle_size": self.hasher.shingle_size
+        }
+
+    def _check(
+        self,
+        document: Document,
+        duplicates: Optional[List[str]] = None,
+        indexed: Optional[List[str]] = None
+    ) -> bool:
+        """Index a chunk and tell whether it should be written.
+
+        Ids of chunks recorded as duplicates by this call are appended to duplicates,
+        and ids of chunks it newly indexed to indexed.
+        """
+        with self._lock, self._db:
+            if self._db.execute(
+                "SELECT 1 FROM signatures WHERE collection = ? AND chunk_id = ?", (self.collection_key, document.id)
+            ).fetchone():
+                return True
+            if self._db.execute(
+                "SELECT 1 FROM duplicates WHERE collection = ? AND chunk_id = ?", (self.collection_key, document.id)
+            ).fetchone():
+                return False
+            signature = self.hasher.signature(document.page_content)
+            if signature is None:
+                return True
+            canonical_id, similarity = self._best_match(signature)
+            if canonical_id is not None and similarity >= self.threshold:
+                self._db.execute(
+                    "INSERT INTO duplicates (collection, chunk_id, canonical_id, similarity, page_content, metadata) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (
+                        self.collection_key, document.id, canonical_id, similarity,
+                        document.page_content, json.dumps(document.metadata, default=str)
+                    )
+                )
+                if duplicates is not None:
+                    duplicates.append(document.id)
+                return False
+            self._index(document.id, signature)
+            if indexed is not None:
+                indexed.append(document.id)
+            return True
+
+    def filter(
+        self,
+        documents: Iterable[Document],
+        duplicates: Optional[List[str]] = None,
+        indexed: Optional[List[str]] = None
+    ) -> Iterator[Document]:
+        """Yield the documents to write, recording near-duplicates of indexed chunks instead.
+
+        Documents need ids, as set by DocumentProcessor; those without one are passed through.
+        Ids newly recorded as duplicates are appended to duplicates; such a chunk may have been
+        written before deduplication was enabled, and then has to be deleted from the store.
+        Ids newly indexed are appended to indexed. If the write fails, forget(indexed + duplicates)
+        undoes what this call recorded.
+        """
+        for document in documents:
+            if getattr(document, "id", None) is None or self._check(document, duplicates, indexed):
+                yield document
+
+    def forget(self, ids: Iterable[str]) -> List[Document]:
+        """Drop deleted chunks from the index.
+
+        Returns the recorded duplicates of dropped chunks that are not deleted themselves,
+        which have lost the chunk standing in for them and must be ingested again.
+        """
+        ids = set(ids)
+        orphans = []
+        with self._lock, self._db:
+            for chunk_id in ids:
+                self._db.execute(
+                    "DELETE FROM duplicates WHERE collection = ? AND chunk_id = ?", (self.collection_key, chunk_id)
+                )
+                row = self._db.execute(
+                    "SELECT signature FROM signatures WHERE collection = ? AND chunk_id = ?",
+                    (self.collection_key, chunk_id)
+                ).fetchone()
+                if row is None:
+                    continue
+                keys = self.hasher.band_keys(np.frombuffer(row[0], dtype=np.uint32))
+                self._db.executemany(
+                    "DELETE FROM buckets WHERE collection = ? AND key = ? AND chunk_id = ?",
+                    [(self.collection_key, key, chunk_id) for key in keys]
+                )
+                self._db.execute(
+                    "DELETE FROM signatures WHERE collection = ? AND chunk_id = ?", (self.collection_key, chunk_id)
+                )
+                orphans.extend(self._db.execute(
+                    "SELECT chunk_id, page_content, metadata FROM duplicates WHERE collection = ? AND canonical_id = ?",
+                    (self.collection_key, chunk_id)
+                ).fetchall())
+                self._db.execute(
+                    "DELETE FROM duplicates WHERE collection = ? AND canonical_id = ?", (self.collection_key, chunk_id)
+                )
+        return [
+            Document(page_content=page_content, metadata=json.loads(metadata), id=chunk_id)
+            for chunk_id, page_content, metadata in orphans
+            if chunk_id not in ids
+        ]
+
+    def provenance(self, chunk_ids: Iterable[str]) -> Dict[str, List[dict]]:
+        """Metadata of the duplicates each chunk stands in for, with their similarity to it."""
+        chunk_ids = list(chunk_ids)
+        if not chunk_ids:
+            return {}
+        placeholders = ",".join("?" * len(chunk_ids))
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT canonical_id, metadata, similarity FROM duplicates "
+                f"WHERE collection = ? AND canonical_id IN ({placeholders}) ORDER BY canonical_id, chunk_id",
+                (self.collection_key, *chunk_ids)
+            ).fetchall()
+        sources: Dict[str, List[dict]] = {}
+        for canonical_id, metadata, similarity in rows:
+            sources.setdefault(canonical_id, []).append({**json.loads(metadata), "similarity": similarity})
+        return sources
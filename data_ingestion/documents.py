@@ -1,7 +1,10 @@
 import warnings
 import os
 import json
-from typing import List, Optional, Union
+import hashlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Iterator, List, Optional, Union
 from pathlib import Path
 from datetime import datetime
 from langchain_text_splitters import RecursiveCharacterTextSplitter
@@ -12,31 +15,131 @@ from langchain_community.document_loaders import (
     UnstructuredFileLoader
 )
 
+from data_ingestion.date_extractor import DateExtractor
+from data_ingestion.offset_splitter import OffsetTextSplitter
+from data_ingestion.token_counter import get_token_counter
+
 warnings.filterwarnings("ignore")
 
 
+# Metadata that locates a chunk rather than describing it
+_POSITION_KEYS = ("source", "page", "start_index", "end_index")
+
+
+def chunk_id(document: Document) -> str:
+    """Stable id of a chunk derived from its source, page, start offset and content hash.
+    
+    Raw text inputs all share one source, so their remaining metadata is part of the id:
+    identical texts added with different metadata stay separate chunks.
+    """
+    metadata = document.metadata
+    content_hash = hashlib.sha256(document.page_content.encode("utf-8")).hexdigest()
+    parts = [metadata.get("source"), metadata.get("page"), metadata.get("start_index", 0), content_hash]
+    if metadata.get("source") == "text_input":
+        described = {key: value for key, value in metadata.items() if key not in _POSITION_KEYS}
+        if described:
+            parts.append(described)
+    key = json.dumps(parts, default=str, sort_keys=True)
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+def _is_file(source: str) -> bool:
+    """Whether a source names an existing file rather than being raw text."""
+    try:
+        return Path(source).is_file()
+    except OSError:
+        # Too long (or otherwise invalid) to be a path
+        return False
+
+
+# Per-process DocumentProcessor of a loading pool, set up by _init_worker
+_worker_processor = None
+
+
+def _init_worker(
+    chunk_size, chunk_overlap, separators, splitter, length_unit, tokenizer_model, extract_dates,
+    ingestion_date, temporal_metadata
+):
+    global _worker_processor
+    _worker_processor = DocumentProcessor(
+        chunk_size, chunk_overlap, separators,
+        splitter=splitter, length_unit=length_unit, tokenizer_model=tokenizer_model, extract_dates=extract_dates
+    )
+    # Same metadata as the parent process, whatever the worker's start time
+    _worker_processor.ingestion_date = ingestion_date
+    _worker_processor.temporal_metadata = temporal_metadata
+
+
+def _chunk_file(path: str, metadata: Optional[dict], auto_chunk: bool) -> List[Document]:
+    return _worker_processor.load_and_chunk(path, metadata=metadata, auto_chunk=auto_chunk)
+
+
 class DocumentProcessor:
     def __init__(
         self,
         chunk_size: int = 1000,
         chunk_overlap: int = 200,
-        separators: Optional[List[str]] = None
+        separators: Optional[List[str]] = None,
+        max_workers: int = 1,
+        splitter: str = "offsets",
+        length_unit: str = "chars",
+        tokenizer_model: str = "voyage-large-2",
+        extract_dates: bool = True
     ):
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
+        # Processes used to load and split files; 1 keeps everything in this process
+        self.max_workers = max_workers
         self.ingestion_date = datetime.now().isoformat()
         
         # Load temporal metadata from JSON file
         self.temporal_metadata = self._load_temporal_metadata()
+        # Dates found in the text fill in files missing from it, and date individual chunks
+        self.date_extractor = DateExtractor() if extract_dates else None
         
         if separators is None:
             separators = ["\n\n", "\n", " ", ""]
+        self.separators = separators
+        self.splitter = splitter.lower()
+        self.length_unit = length_unit.lower()
+        self.tokenizer_model = tokenizer_model
         
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=chunk_size,
-            chunk_overlap=chunk_overlap,
-            separators=separators
-        )
+        # In "tokens" mode chunk_size and chunk_overlap are token budgets of the embedding model
+        self.token_counter = None
+        if self.length_unit == "tokens":
+            self.token_counter = get_token_counter(tokenizer_model)
+            max_tokens = self.token_counter.max_tokens
+            if max_tokens is not None and chunk_size > max_tokens:
+                raise ValueError(
+                    f"chunk_size of {chunk_size} tokens exceeds the {max_tokens} token context of {tokenizer_model}"
+                )
+        elif self.length_unit != "chars":
+            raise ValueError(
+                f"Unsupported length unit: {length_unit}. "
+                f"Supported length units: 'chars', 'tokens'"
+            )
+        
+        # Both splitters produce the same chunks; "offsets" is faster and records exact start/end offsets
+        if self.splitter == "offsets":
+            self.text_splitter = OffsetTextSplitter(
+                chunk_size=chunk_size,
+                chunk_overlap=chunk_overlap,
+                separators=separators,
+                token_counter=self.token_counter
+            )
+        elif self.splitter == "langchain":
+            self.text_splitter = RecursiveCharacterTextSplitter(
+                chunk_size=chunk_size,
+                chunk_overlap=chunk_overlap,
+                separators=separators,
+                length_function=self.token_counter.count if self.token_counter else len,
+                add_start_index=True  # Chunk offsets make chunk ids stable across runs
+            )
+        else:
+            raise ValueError(
+                f"Unsupported splitter: {splitter}. "
+                f"Supported splitters: 'offsets', 'langchain'"
+            )
     
     def _load_temporal_metadata(self) -> dict:
         """Load temporal metadata from JSON file."""
@@ -67,6 +170,36 @@ class DocumentProcessor:
             }
         return {}
     
+    def settings_fingerprint(self, file_name: str, metadata: Optional[dict] = None, dedup: Optional[dict] = None) -> str:
+        """Hash of everything besides file content that shapes a file's chunks and their metadata.
+        
+        dedup holds the near-duplicate settings of the collection, which decide which chunks are written.
+        """
+        temporal_meta = {
+            key: value for key, value in self._get_temporal_metadata_for_file(file_name).items()
+            if key != "ingestion_date"
+        }
+        settings = {
+            "chunk_size": self.chunk_size,
+            "chunk_overlap": self.chunk_overlap,
+            "separators": self.separators,
+            "splitter": self.splitter,
+            "metadata": metadata or {},
+            "temporal_metadata": temporal_meta
+        }
+        if self.token_counter is not None:
+            # Only token sizing adds keys, so existing character-sized entries keep their fingerprint
+            settings["length_unit"] = self.length_unit
+            settings["tokenizer_model"] = self.tokenizer_model
+            # The tokenizer, or the estimate used when it cannot be loaded
+            settings["token_counter"] = type(self.token_counter).__name__
+        if self.date_extractor is not None:
+            # Extracted dates only fill in missing ones; the value changed when they stopped overriding
+            settings["extract_dates"] = "missing_only"
+        if dedup:
+            settings["dedup"] = dedup
+        return hashlib.sha256(json.dumps(settings, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+    
     def _get_file_loader(self, file_path: str):
         """Get appropriate loader based on file extension."""
         file_ext = Path(file_path).suffix.lower()
@@ -84,51 +217,156 @@ class DocumentProcessor:
         metadata: Optional[dict] = None,
         auto_chunk: bool = True
     ) -> List[Document]:
+        return list(self.stream_chunks(source, metadata=metadata, auto_chunk=auto_chunk))
+    
+    def _iter_source_documents(self, src: str, base_metadata: dict) -> Iterator[Document]:
+        """Pages of a file (loaded lazily) or a raw text input as a single document."""
+        src_path = Path(src)
+        
+        if _is_file(src):
+            loader = self._get_file_loader(src)
+            
+            # Get temporal metadata for this file
+            temporal_meta = self._get_temporal_metadata_for_file(src_path.name)
+            
+            file_metadata = {
+                **base_metadata,
+                "source": str(src_path),
+                "file_name": src_path.name,
+                **temporal_meta  # Add temporal metadata
+            }
+            
+            for page_number, doc in enumerate(loader.lazy_load()):
+                if page_number == 0:
+                    self._date_document(doc.page_content, file_metadata)
+                doc.metadata.update(file_metadata)
+                yield doc
+        else:
+            text_metadata = {**base_metadata, "source": "text_input"}
+            self._date_document(src, text_metadata)
+            yield Document(
+                page_content=src,
+                metadata=text_metadata
+            )
+    
+    def _date_document(self, text: str, metadata: dict):
+        """Date a document from its header when neither the caller nor the curated metadata does."""
+        if self.date_extractor is None or metadata.get("content_date"):
+            return
+        content_date = self.date_extractor.document_date(text)
+        if content_date:
+            metadata["content_date"] = content_date
+    
+    def _date_chunk(self, chunk: Document):
+        """Date a chunk from a date labelled in its text when the caller, the curated metadata
+        and its file's header left it undated; extracted dates never replace a given one."""
+        if self.date_extractor is None or chunk.metadata.get("content_date"):
+            return
+        content_date = self.date_extractor.chunk_date(chunk.page_content)
+        if content_date:
+            chunk.metadata["content_date"] = content_date
+    
+    def _split_page(self, doc: Document) -> Iterable[Document]:
+        if isinstance(self.text_splitter, OffsetTextSplitter):
+            # Chunk text is sliced out only as each chunk is consumed
+            return self.text_splitter.iter_split_documents([doc])
+        return self.text_splitter.split_documents([doc])
+    
+    def stream_chunks(
+        self,
+        source: Union[str, List[str], Path, List[Path]],
+        metadata: Optional[dict] = None,
+        auto_chunk: bool = True
+    ) -> Iterator[Document]:
+        """Yield chunks one page at a time, so memory does not grow with document size.
+        
+        With max_workers > 1 and several sources, whole files are processed in the pool instead.
+        """
         base_metadata = metadata or {}
-        documents = []
         
         sources = [source] if not isinstance(source, list) else source
         sources = [str(s) for s in sources]
         
+        if self.max_workers > 1 and len(sources) > 1:
+            for chunks in self.iter_chunks(sources, metadata, auto_chunk):
+                yield from chunks
+            return
+        
         for src in sources:
-            src_path = Path(src)
-            
-            if src_path.exists() and src_path.is_file():
-                loader = self._get_file_loader(src)
-                docs = loader.load()
-                
-                # Get temporal metadata for this file
-                temporal_meta = self._get_temporal_metadata_for_file(src_path.name)
-                
-                file_metadata = {
-                    **base_metadata,
-                    "source": str(src_path),
-                    "file_name": src_path.name,
-                    **temporal_meta  # Add temporal metadata
-                }
-                
-                for doc in docs:
-                    doc.metadata.update(file_metadata)
-                documents.extend(docs)
-            else:
-                doc = Document(
-                    page_content=src,
-                    metadata={**base_metadata, "source": "text_input"}
-                )
-                documents.append(doc)
+            for doc in self._iter_source_documents(src, base_metadata):
+                # Pages are split independently, so splitting one at a time gives the same chunks
+                chunks = self._split_page(doc) if auto_chunk else [doc]
+                # Re-ingesting the same content yields the same ids, so upserts replace instead of duplicating
+                for chunk in chunks:
+                    self._date_chunk(chunk)
+                    chunk.id = chunk_id(chunk)
+                    yield chunk
+    
+    def iter_chunks(
+        self,
+        sources: List[Union[str, Path]],
+        metadata: Optional[dict] = None,
+        auto_chunk: bool = True
+    ) -> Iterator[Iterable[Document]]:
+        """Yield the chunks of each source in input order, as soon as that source is processed.
         
-        if auto_chunk and documents:
-            return self.text_splitter.split_documents(documents)
+        With max_workers > 1, files are loaded and split in a process pool while earlier
+        results are consumed; at most 2 * max_workers processed files wait in memory.
+        Otherwise each source's chunks are streamed lazily and must be consumed before
+        the next source is requested.
+        """
+        sources = [str(s) for s in sources]
+        if self.max_workers <= 1:
+            for src in sources:
+                yield self.stream_chunks(src, metadata=metadata, auto_chunk=auto_chunk)
+            return
         
-        return documents
+        pool = ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            initializer=_init_worker,
+            initargs=(
+                self.chunk_size, self.chunk_overlap, self.separators, self.splitter,
+                self.length_unit, self.tokenizer_model, self.date_extractor is not None,
+                self.ingestion_date, self.temporal_metadata
+            )
+        )
+        pending = deque()
+        try:
+            for src in sources:
+                if _is_file(src):
+                    pending.append(pool.submit(_chunk_file, src, metadata, auto_chunk))
+                else:
+                    # Raw text needs no parsing
+                    pending.append(self.load_and_chunk(src, metadata=metadata, auto_chunk=auto_chunk))
+                while len(pending) >= 2 * self.max_workers:
+                    result = pending.popleft()
+                    yield result if isinstance(result, list) else result.result()
+            while pending:
+                result = pending.popleft()
+                yield result if isinstance(result, list) else result.result()
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
     
     def load_text(self, text: str, metadata: Optional[dict] = None, auto_chunk: bool = True) -> List[Document]:
         """Load and chunk a single text string."""
         return self.load_and_chunk(text, metadata=metadata, auto_chunk=auto_chunk)
     
-    def load_texts(self, texts: List[str], metadata: Optional[dict] = None, auto_chunk: bool = True) -> List[Document]:
-        """Load and chunk multiple text strings."""
-        return self.load_and_chunk(texts, metadata=metadata, auto_chunk=auto_chunk)
+    def load_texts(
+        self,
+        texts: List[str],
+        metadata: Optional[dict] = None,
+        auto_chunk: bool = True,
+        metadatas: Optional[List[Optional[dict]]] = None
+    ) -> List[Document]:
+        """Load and chunk multiple text strings; metadatas[i] is added to metadata for the chunks of texts[i]."""
+        if metadatas is None:
+            return self.load_and_chunk(texts, metadata=metadata, auto_chunk=auto_chunk)
+        chunks = []
+        for text, text_metadata in zip(texts, metadatas):
+            chunks.extend(self.load_and_chunk(
+                text, metadata={**(metadata or {}), **(text_metadata or {})}, auto_chunk=auto_chunk
+            ))
+        return chunks
     
     def load_file(self, file_path: Union[str, Path], metadata: Optional[dict] = None, auto_chunk: bool = True) -> List[Document]:
         """Load and chunk a single file."""
@@ -140,5 +378,9 @@ class DocumentProcessor:
     
     def chunk_documents(self, documents: List[Document]) -> List[Document]:
         """Manually chunk already loaded documents."""
-        return self.text_splitter.split_documents(documents)
+        chunks = self.text_splitter.split_documents(documents)
+        for chunk in chunks:
+            self._date_chunk(chunk)
+            chunk.id = chunk_id(chunk)
+        return chunks
 
@@ -0,0 +1,313 @@
+# Embedding caches: query embeddings (LRU + TTL) and document chunks (content hash)
+
+import hashlib
+import sqlite3
+import threading
+import time
+import unicodedata
+from array import array
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+from langchain_core.embeddings import Embeddings
+
+from data_ingestion.coalescer import QueryCoalescer
+from data_ingestion.rate_limiter import EmbeddingDispatcher
+
+
+def normalize_query(text: str) -> str:
+    """Normalize query text for cache lookups: Unicode NFC and collapsed whitespace."""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def _encode(embedding: List[float]) -> bytes:
+    return array("d", embedding).tobytes()
+
+
+def _decode(blob: bytes) -> List[float]:
+    values = array("d")
+    values.frombytes(blob)
+    return values.tolist()
+
+
+class QueryEmbeddingCache:
+    """Bounded LRU cache of query embeddings with TTL expiry.
+
+    Keys combine the model name and normalized query text. When path is set,
+    entries are also kept in a SQLite file that several processes can share;
+    memory misses fall through to it before calling the API.
+    """
+
+    def __init__(
+        self,
+        max_size: int = 1024,
+        ttl: Optional[float] = 3600.0,
+        path: Optional[Union[str, Path]] = None
+    ):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.path = Path(path) if path else None
+        self._entries: "OrderedDict[str, Tuple[List[float], float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._db = None
+        if self.path is not None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS query_embeddings "
+                "(key TEXT PRIMARY KEY, embedding BLOB NOT NULL, created REAL NOT NULL)"
+            )
+            self._db.commit()
+
+    @staticmethod
+    def make_key(model: str, text: str) -> str:
+        return hashlib.sha256(f"{model}\x00{normalize_query(text)}".encode("utf-8")).hexdigest()
+
+    def _expired(self, created: float, now: float) -> bool:
+        return self.ttl is not None and now - created > self.ttl
+
+    def get(self, key: str) -> Optional[List[float]]:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if not self._expired(entry[1], now):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[0]
+                del self._entries[key]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT embedding, created FROM query_embeddings WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None and not self._expired(row[1], now):
+                    embedding = _decode(row[0])
+                    self._remember(key, embedding, row[1])
+                    self.disk_hits += 1
+                    return embedding
+
+            self.misses += 1
+            return None
+
+    def put(self, key: str, embedding: List[float]):
+        created = time.time()
+        with self._lock:
+            self._remember(key, list(embedding), created)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO query_embeddings (key, embedding, created) VALUES (?, ?, ?)",
+                    (key, _encode(embedding), created)
+                )
+                self._db.commit()
+
+    def _remember(self, key: str, embedding: List[float], created: float):
+        if self.max_size <= 0:
+            return
+        self._entries[key] = (embedding, created)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM query_embeddings")
+                self._db.commit()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions
+            }
+
+
+class DocumentEmbeddingStore:
+    """Persistent embeddings of document chunks keyed by (model, sha256 of the chunk text).
+
+    Backed by a SQLite file, so re-ingesting unchanged chunks needs no API calls.
+    """
+
+    # Keys per SELECT, below SQLite's bound parameter limit
+    LOOKUP_BATCH = 500
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS document_embeddings "
+            "(model TEXT NOT NULL, text_hash TEXT NOT NULL, embedding BLOB NOT NULL, "
+            "PRIMARY KEY (model, text_hash))"
+        )
+        self._db.commit()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def text_hash(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def get_many(self, model: str, hashes: List[str]) -> Dict[str, List[float]]:
+        """Stored embeddings for the given text hashes; missing hashes are left out."""
+        found = {}
+        unique = list(dict.fromkeys(hashes))
+        with self._lock:
+            for start in range(0, len(unique), self.LOOKUP_BATCH):
+                batch = unique[start:start + self.LOOKUP_BATCH]
+                rows = self._db.execute(
+                    "SELECT text_hash, embedding FROM document_embeddings "
+                    f"WHERE model = ? AND text_hash IN ({', '.join('?' * len(batch))})",
+                    [model, *batch]
+                ).fetchall()
+                found.update((text_hash, _decode(blob)) for text_hash, blob in rows)
+            self.hits += len(found)
+            self.misses += len(unique) - len(found)
+        return found
+
+    def put_many(self, model: str, items: Dict[str, List[float]]):
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO document_embeddings (model, text_hash, embedding) VALUES (?, ?, ?)",
+                [(model, text_hash, _encode(embedding)) for text_hash, embedding in items.items()]
+            )
+            self._db.commit()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            count = self._db.execute("SELECT COUNT(*) FROM document_embeddings").fetchone()[0]
+            return {"size": count, "hits": self.hits, "misses": self.misses}
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper that answers repeated queries from a QueryEmbeddingCache
+    and already embedded chunks from a DocumentEmbeddingStore.
+
+    This is the object handed to langchain_chroma, so similarity searches and
+    writes made by the vector store are cached too. Other attributes are read
+    from the wrapped embeddings.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        model: str,
+        query_cache: QueryEmbeddingCache,
+        document_store: Optional[DocumentEmbeddingStore] = None,
+        dispatcher: Optional[EmbeddingDispatcher] = None,
+        query_batch_wait: float = 0.005
+    ):
+        self.embeddings = embeddings
+        self.model = model
+        self.query_cache = query_cache
+        self.document_store = document_store
+        # API calls go through the dispatcher, which enforces the provider's rate limits;
+        # without one (local embeddings) the wrapped embeddings are called directly
+        self.dispatcher = dispatcher
+        self.query_client = self._voyage_query_client(embeddings)
+        # Single-query misses from concurrent callers are coalesced into one request
+        self.coalescer = QueryCoalescer(self._embed_queries_uncached, max_wait=query_batch_wait)
+
+    def __getattr__(self, name):
+        if name == "embeddings":
+            raise AttributeError(name)
+        return getattr(self.embeddings, name)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_queries([text])[0]
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Query embeddings for several texts; only cache misses are sent to the API, in batches."""
+        keys = [self.query_cache.make_key(self.model, text) for text in texts]
+        results: List[Optional[List[float]]] = [self.query_cache.get(key) for key in keys]
+
+        # Identical questions in one call are embedded once
+        missing: Dict[str, List[int]] = {}
+        for i, (key, embedding) in enumerate(zip(keys, results)):
+            if embedding is None:
+                missing.setdefault(key, []).append(i)
+        if missing:
+            positions = list(missing.values())
+            if len(positions) == 1:
+                embedded = [self.coalescer.embed(texts[positions[0][0]])]
+            else:
+                embedded = self._embed_queries_uncached([texts[group[0]] for group in positions])
+            for key, group, embedding in zip(missing, positions, embedded):
+                self.query_cache.put(key, embedding)
+                for i in group:
+                    results[i] = embedding
+        return results
+
+    @staticmethod
+    def _voyage_query_client(embeddings: Embeddings):
+        """A voyageai.Client with the credentials of wrapped VoyageAIEmbeddings, for batched queries.
+
+        VoyageAIEmbeddings sends one query per request. Contextualized models
+        and other embeddings get no client and are not batched.
+        """
+        api_key = getattr(embeddings, "voyage_api_key", None)
+        if api_key is None or "context" in embeddings.model:
+            return None
+        import voyageai
+
+        return voyageai.Client(api_key=api_key.get_secret_value(), base_url=getattr(embeddings, "base_url", None))
+
+    def _embed_queries_uncached(self, texts: List[str]) -> List[List[float]]:
+        if self.dispatcher is None:
+            return [self.embeddings.embed_query(text) for text in texts]
+        if self.query_client is None:
+            return self.dispatcher.embed(texts, lambda batch: [self.embeddings.embed_query(batch[0])], max_batch_size=1)
+        return self.dispatcher.embed(texts, self._embed_query_batch)
+
+    def _embed_documents_uncached(self, texts: List[str]) -> List[List[float]]:
+        if self.dispatcher is None:
+            return self.embeddings.embed_documents(texts)
+        # Dispatcher batches fit in one request of the wrapped embeddings
+        return self.dispatcher.embed(
+            texts,
+            self.embeddings.embed_documents,
+            max_batch_size=getattr(self.embeddings, "batch_size", None)
+        )
+
+    def _embed_query_batch(self, texts: List[str]) -> List[List[float]]:
+        """One Voyage request with the settings VoyageAIEmbeddings.embed_query sends."""
+        return self.query_client.embed(
+            texts,
+            model=self.embeddings.model,
+            input_type="query",
+            truncation=self.embeddings.truncation,
+            output_dimension=self.embeddings.output_dimension
+        ).embeddings
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Document embeddings; only chunks missing from the document store are sent to the API."""
+        if self.document_store is None:
+            return self._embed_documents_uncached(texts)
+
+        hashes = [self.document_store.text_hash(text) for text in texts]
+        found = self.document_store.get_many(self.model, hashes)
+        # Each distinct missing text is embedded once
+        missing = {}
+        for text_hash, text in zip(hashes, texts):
+            if text_hash not in found:
+                missing.setdefault(text_hash, text)
+        if missing:
+            embedded = dict(zip(missing, self._embed_documents_uncached(list(missing.values()))))
+            self.document_store.put_many(self.model, embedded)
+            found.update(embedded)
+        return [found[text_hash] for text_hash in hashes]
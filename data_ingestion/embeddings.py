@@ -1,7 +1,8 @@
 import warnings
 import os
+from pathlib import Path
 from dotenv import load_dotenv
-from typing import List, Union
+from typing import List, Optional, Union
 
 # Suppress all warnings
 warnings.filterwarnings("ignore")
@@ -9,13 +10,70 @@ os.environ["HF_HUB_DISABLE_SYMLINKS_WARNING"] = "1"
 
 from langchain_voyageai import VoyageAIEmbeddings
 
+from data_ingestion.embedding_cache import CachedEmbeddings, DocumentEmbeddingStore, QueryEmbeddingCache
+from data_ingestion.local_embeddings import HashingEmbeddings
+from data_ingestion.rate_limiter import EmbeddingDispatcher
+
 load_dotenv()
 
+
+def _env_float(name: str) -> Optional[float]:
+    value = os.getenv(name)
+    return float(value) if value else None
+
+
 class EmbeddingProvider:
-    def __init__(self, provider: str = "voyage", model: str = "voyage-large-2"):
+    def __init__(
+        self,
+        provider: str = "voyage",
+        model: str = "voyage-large-2",
+        query_cache_size: int = 1024,
+        query_cache_ttl: Optional[float] = 3600.0,
+        query_cache_path: Optional[str] = None,
+        document_cache_path: Optional[str] = None,
+        use_document_cache: bool = True,
+        requests_per_minute: Optional[float] = None,
+        tokens_per_minute: Optional[float] = None,
+        max_concurrency: int = 4,
+        query_batch_wait: float = 0.005
+    ):
         self.provider = provider.lower()
         self.model = model
-        self.embeddings = self._initialize_embeddings()
+        # Repeated questions are answered from the cache; QUERY_EMBEDDING_CACHE_PATH adds a shared disk tier
+        self.query_cache = QueryEmbeddingCache(
+            max_size=query_cache_size,
+            ttl=query_cache_ttl,
+            path=query_cache_path or os.getenv("QUERY_EMBEDDING_CACHE_PATH")
+        )
+        # Local embeddings are cheaper to compute than to look up, and need no rate limiting
+        remote = self.provider != "local"
+        
+        # Chunk embeddings are stored by content hash, so unchanged chunks are never re-embedded
+        self.document_store = None
+        if use_document_cache and remote:
+            if document_cache_path is None:
+                document_cache_path = os.getenv("DOCUMENT_EMBEDDING_CACHE_PATH") or str(
+                    Path(__file__).parent.parent / "embedding_cache" / "documents.sqlite"
+                )
+            self.document_store = DocumentEmbeddingStore(document_cache_path)
+        # Voyage quota, enforced client-side only when set here or via VOYAGE_RPM / VOYAGE_TPM;
+        # 429s are retried either way
+        self.dispatcher = None
+        if remote:
+            self.dispatcher = EmbeddingDispatcher(
+                rpm=requests_per_minute or _env_float("VOYAGE_RPM"),
+                tpm=tokens_per_minute or _env_float("VOYAGE_TPM"),
+                max_concurrency=max_concurrency,
+                model=model
+            )
+        self.embeddings = CachedEmbeddings(
+            self._initialize_embeddings(),
+            self.model,
+            self.query_cache,
+            self.document_store,
+            self.dispatcher,
+            query_batch_wait if remote else 0.0
+        )
     
     def _initialize_embeddings(self):
         if self.provider == "voyage":
@@ -26,16 +84,32 @@ class EmbeddingProvider:
                 voyage_api_key=api_key,
                 model=self.model
             )
+        elif self.provider == "local":
+            return HashingEmbeddings(dimension=self._local_dimension())
         else:
             raise ValueError(
                 f"Unsupported provider: {self.provider}. "
-                f"Supported providers: 'voyage'"
+                f"Supported providers: 'voyage', 'local'"
+            )
+    
+    def _local_dimension(self) -> int:
+        """Dimension encoded in a local model name such as 'hash-1024'."""
+        prefix, _, dimension = self.model.partition("-")
+        if prefix != "hash" or not dimension.isdigit() or int(dimension) <= 0:
+            raise ValueError(
+                f"Unsupported local model: {self.model}. "
+                f"Supported models: 'hash-<dimension>', e.g. 'hash-1024'"
             )
+        return int(dimension)
     
     def embed_query(self, text: str) -> List[float]:
         """Generate embedding for a single query text."""
         return self.embeddings.embed_query(text)
     
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Generate query embeddings for several texts, embedding only cache misses in batched requests."""
+        return self.embeddings.embed_queries(texts)
+    
     def embed_documents(self, texts: List[str]) -> List[List[float]]:
         """Generate embeddings for multiple documents."""
         return self.embeddings.embed_documents(texts)
@@ -48,6 +122,9 @@ class EmbeddingProvider:
         else:
             raise TypeError("Input must be a string or a list of strings")
     
+    def get_query_cache_stats(self) -> dict:
+        return self.query_cache.stats()
+    
     def get_provider_info(self):
         return {
             "provider": self.provider,
@@ -56,6 +133,8 @@ class EmbeddingProvider:
         }
     
     def _get_embedding_dimension(self) -> int:
+        if self.provider == "local":
+            return self._local_dimension()
         dimension_map = {
             "voyage-large-2": 1536,
             "voyage-code-2": 1536,
@@ -0,0 +1,87 @@
+# Record of ingested files, used to re-index only what changed
+
+import hashlib
+import json
+import sqlite3
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+
+def file_sha256(path: Union[str, Path], block_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+@dataclass
+class ManifestEntry:
+    path: str
+    sha256: str
+    mtime_ns: int
+    size: int
+    settings: str
+    chunk_ids: List[str]
+
+
+class IngestionManifest:
+    """SQLite manifest of the files ingested into a collection.
+
+    Each entry holds the file's content hash, mtime and size, the fingerprint
+    of the chunker settings that produced its chunks, and the chunk ids, so a
+    changed or deleted file can have exactly its chunks replaced or removed.
+    """
+
+    def __init__(self, path: Union[str, Path], collection_key: str):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.collection_key = collection_key
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            "collection TEXT NOT NULL, path TEXT NOT NULL, sha256 TEXT NOT NULL, mtime_ns INTEGER NOT NULL, "
+            "size INTEGER NOT NULL, settings TEXT NOT NULL, chunk_ids TEXT NOT NULL, "
+            "PRIMARY KEY (collection, path))"
+        )
+        self._db.commit()
+
+    def entries(self) -> Dict[str, ManifestEntry]:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT path, sha256, mtime_ns, size, settings, chunk_ids FROM files WHERE collection = ?",
+                (self.collection_key,)
+            ).fetchall()
+        return {
+            row[0]: ManifestEntry(row[0], row[1], row[2], row[3], row[4], json.loads(row[5]))
+            for row in rows
+        }
+
+    def get(self, path: str) -> Optional[ManifestEntry]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT path, sha256, mtime_ns, size, settings, chunk_ids FROM files WHERE collection = ? AND path = ?",
+                (self.collection_key, path)
+            ).fetchone()
+        if row is None:
+            return None
+        return ManifestEntry(row[0], row[1], row[2], row[3], row[4], json.loads(row[5]))
+
+    def record(self, entry: ManifestEntry):
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO files (collection, path, sha256, mtime_ns, size, settings, chunk_ids) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    self.collection_key, entry.path, entry.sha256, entry.mtime_ns, entry.size,
+                    entry.settings, json.dumps(entry.chunk_ids)
+                )
+            )
+
+    def remove(self, path: str):
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM files WHERE collection = ? AND path = ?", (self.collection_key, path))
@@ -1,12 +1,15 @@
 import warnings
+import os
 import sys
-from typing import List, Optional, Union
+from typing import Callable, Dict, List, Optional, Union
 from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
+from data_ingestion.deduplication import ChunkDeduplicator
 from data_ingestion.documents import DocumentProcessor
 from data_ingestion.embeddings import EmbeddingProvider
+from data_ingestion.ingestion_manifest import IngestionManifest, ManifestEntry, file_sha256
 from data_ingestion.vector_store import VectorStore
 
 warnings.filterwarnings("ignore")
@@ -20,22 +23,42 @@ class RAGSystem:
         chunk_size: int = 1000,
         chunk_overlap: int = 200,
         persist_directory: Optional[str] = None,
-        use_cloud: bool = True  # Default to cloud
+        use_cloud: bool = True,  # Default to cloud
+        upload_batch_size: int = 256,
+        upload_workers: int = 4,
+        progress_callback: Optional[Callable[[int, Optional[int]], None]] = None,
+        manifest_path: Optional[str] = None,
+        load_workers: int = 1,
+        length_unit: str = "chars",
+        dedup_threshold: Optional[float] = None,
+        dedup_path: Optional[str] = None,
+        requests_per_minute: Optional[float] = None,
+        tokens_per_minute: Optional[float] = None
     ):
         if persist_directory is None:
             from pathlib import Path
             project_root = Path(__file__).parent
             persist_directory = str(project_root / "chroma_db")
         self.collection_name = collection_name
+        self.upload_batch_size = upload_batch_size
+        self.upload_workers = upload_workers
+        self.progress_callback = progress_callback
         
         self.document_processor = DocumentProcessor(
             chunk_size=chunk_size,
-            chunk_overlap=chunk_overlap
+            chunk_overlap=chunk_overlap,
+            max_workers=load_workers,
+            # "tokens" sizes chunks against the embedding model's tokenizer
+            length_unit=length_unit,
+            tokenizer_model=embedding_model
         )
         
+        # Bulk ingestion stays within the Voyage quota; defaults are the free tier limits (3 RPM, 10K TPM)
         self.embedding_provider = EmbeddingProvider(
             provider=embedding_provider,
-            model=embedding_model
+            model=embedding_model,
+            requests_per_minute=requests_per_minute or float(os.getenv("VOYAGE_RPM", 3)),
+            tokens_per_minute=tokens_per_minute or float(os.getenv("VOYAGE_TPM", 10_000))
         )
         
         self.vector_store = VectorStore(
@@ -44,6 +67,20 @@ class RAGSystem:
             persist_directory=persist_directory,
             use_cloud=use_cloud
         )
+        
+        # Which files are already ingested, so sync_directory only touches what changed
+        manifest_path = manifest_path or os.getenv("INGESTION_MANIFEST_PATH") or str(
+            Path(__file__).parent.parent / "ingestion_manifest" / "manifest.sqlite"
+        )
+        self.manifest = IngestionManifest(manifest_path, self.vector_store.collection_key)
+        
+        # Chunks at least dedup_threshold similar (estimated Jaccard) to a stored chunk are not written
+        self.deduplicator = None
+        if dedup_threshold is not None:
+            dedup_path = dedup_path or os.getenv("CHUNK_DEDUP_PATH") or str(
+                Path(__file__).parent.parent / "chunk_dedup" / "dedup.sqlite"
+            )
+            self.deduplicator = ChunkDeduplicator(dedup_path, self.vector_store.collection_key, dedup_threshold)
     
     def add_documents(
         self,
@@ -51,13 +88,15 @@ class RAGSystem:
         metadata: Optional[dict] = None,
         auto_chunk: bool = True
     ) -> List[str]:
-        documents = self.document_processor.load_and_chunk(
+        # Chunks stream from the loader to the vector store, so large files are never held in memory
+        documents = self.document_processor.stream_chunks(
             source=source,
             metadata=metadata,
             auto_chunk=auto_chunk
         )
         
-        return self.vector_store.add_documents(documents)
+        # Unchanged chunks are rewritten too, so new caller metadata replaces the stored one
+        return self._upload(documents, skip_existing=False)
     
     def add_texts(
         self,
@@ -65,20 +104,135 @@ class RAGSystem:
         metadatas: Optional[List[dict]] = None,
         auto_chunk: bool = True
     ) -> List[str]:
+        # Metadata goes in before chunk ids are derived, and reaches every chunk of its text
         documents = self.document_processor.load_texts(
             texts=texts,
             metadata=None,
-            auto_chunk=auto_chunk
+            auto_chunk=auto_chunk,
+            metadatas=metadatas
         )
         
-        if metadatas:
-            for doc, meta in zip(documents, metadatas):
-                doc.metadata.update(meta)
+        return self._upload(documents, skip_existing=False)
+    
+    def _upload(self, documents, skip_existing: bool = True) -> List[str]:
+        duplicates, indexed = [], []
+        if self.deduplicator is not None:
+            documents = self.deduplicator.filter(documents, duplicates, indexed)
+        try:
+            # Chunk ids are content-derived, so a stored id is an unchanged chunk
+            ids = self.vector_store.add_documents_stream(
+                documents,
+                batch_size=self.upload_batch_size,
+                max_workers=self.upload_workers,
+                progress_callback=self.progress_callback,
+                skip_existing=skip_existing
+            )
+        except Exception:
+            if self.deduplicator is not None:
+                # Chunks of a failed write must not stand in for others; a retry checks them again
+                self.deduplicator.forget(indexed + duplicates)
+            raise
+        if duplicates:
+            # Chunks written before deduplication was enabled are kept only through their stand-in
+            stored = self.vector_store.existing_ids(duplicates)
+            if stored:
+                self.vector_store.delete(ids=[chunk_id for chunk_id in duplicates if chunk_id in stored])
+        return ids
+    
+    @staticmethod
+    def _recording_ids(documents, ids: List[str]):
+        for doc in documents:
+            ids.append(doc.id)
+            yield doc
+    
+    def _delete_chunks(self, ids: List[str]):
+        self.vector_store.delete(ids=ids)
+        if self.deduplicator is not None:
+            # Duplicates that were represented by a deleted chunk are stored in its place
+            orphans = self.deduplicator.forget(ids)
+            if orphans:
+                self._upload(orphans)
+    
+    def sync_directory(
+        self,
+        directory: Union[str, Path],
+        pattern: str = "*.txt",
+        metadata: Optional[dict] = None
+    ) -> Dict[str, List[str]]:
+        """Bring the collection in line with the files in a directory, touching only what changed.
+        
+        New and changed files are re-chunked and upserted, and chunks a changed file no longer
+        produces are deleted, as are all chunks of files that disappeared. Unchanged files are
+        recognised by size and mtime, or by content hash when only the mtime moved.
+        Returns the file paths per outcome: added, updated, removed and unchanged.
+        """
+        directory = Path(directory)
+        files = sorted(path for path in directory.glob(pattern) if path.is_file())
+        entries = self.manifest.entries()
+        report = {"added": [], "updated": [], "removed": [], "unchanged": []}
+        
+        changed = []
+        for file_path in files:
+            key = str(file_path)
+            stat = file_path.stat()
+            settings = self.document_processor.settings_fingerprint(
+                file_path.name,
+                metadata,
+                dedup=self.deduplicator.settings if self.deduplicator is not None else None
+            )
+            entry = entries.get(key)
+            if (
+                entry is not None and entry.settings == settings
+                and entry.mtime_ns == stat.st_mtime_ns and entry.size == stat.st_size
+            ):
+                report["unchanged"].append(key)
+                continue
+            
+            sha256 = file_sha256(file_path)
+            if entry is not None and entry.settings == settings and entry.sha256 == sha256:
+                # Touched but not modified
+                self.manifest.record(
+                    ManifestEntry(key, sha256, stat.st_mtime_ns, stat.st_size, settings, entry.chunk_ids)
+                )
+                report["unchanged"].append(key)
+                continue
+            
+            changed.append((key, stat, sha256, settings, entry))
+        
+        # Files are parsed in the loader pool while earlier ones are embedded and written
+        chunked = self.document_processor.iter_chunks([key for key, *_ in changed], metadata=metadata)
+        for (key, stat, sha256, settings, entry), documents in zip(changed, chunked):
+            # Ids of every chunk of the file, including near-duplicates that are not written
+            chunk_ids = []
+            # New settings can change chunk metadata without changing chunk ids, so rewrite everything
+            self._upload(
+                self._recording_ids(documents, chunk_ids),
+                skip_existing=entry is None or entry.settings == settings
+            )
+            chunk_ids = list(dict.fromkeys(chunk_ids))
+            if entry is not None:
+                stale = set(entry.chunk_ids) - set(chunk_ids)
+                if stale:
+                    self._delete_chunks(sorted(stale))
+            self.manifest.record(
+                ManifestEntry(key, sha256, stat.st_mtime_ns, stat.st_size, settings, chunk_ids)
+            )
+            report["added" if entry is None else "updated"].append(key)
+        
+        present = {str(path) for path in files}
+        for key, entry in entries.items():
+            path = Path(key)
+            if key in present or directory not in path.parents or not path.relative_to(directory).match(pattern):
+                continue
+            if entry.chunk_ids:
+                self._delete_chunks(entry.chunk_ids)
+            self.manifest.remove(key)
+            report["removed"].append(key)
         
-        return self.vector_store.add_documents(documents)
+        return report
     
-    def get_stats(self):
-        return self.vector_store.get_stats()
+    def get_stats(self, refresh: bool = False):
+        return self.vector_store.get_stats(refresh=refresh)
     
     def get_persist_directory(self) -> Optional[str]:
         return self.vector_store.persist_directory
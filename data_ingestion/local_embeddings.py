@@ -0,0 +1,53 @@
+# Offline embeddings from hashed n-gram features
+
+import math
+import re
+import zlib
+from collections import Counter
+from typing import List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+WORD_PATTERN = re.compile(r'\w+')
+
+
+class HashingEmbeddings(Embeddings):
+    """Deterministic embeddings that need no network or model download.
+
+    Word unigrams, word bigrams and character trigrams are hashed (CRC32) into
+    `dimension` buckets with a hash-derived sign, weighted by 1 + log(count)
+    and L2-normalized. Similar texts share features, so cosine distance still
+    ranks lexical matches sensibly. Queries and documents embed the same way.
+    """
+
+    def __init__(self, dimension: int = 1024):
+        if dimension <= 0:
+            raise ValueError(f"dimension must be positive, got {dimension}")
+        self.dimension = dimension
+
+    def _features(self, text: str) -> Counter:
+        words = WORD_PATTERN.findall(text.lower())
+        features = Counter(words)
+        features.update(f"{first} {second}" for first, second in zip(words, words[1:]))
+        for word in words:
+            padded = f"<{word}>"
+            features.update(f"#{padded[i:i + 3]}" for i in range(len(padded) - 2))
+        return features
+
+    def _embed(self, text: str) -> List[float]:
+        vector = np.zeros(self.dimension, dtype=np.float64)
+        for feature, count in self._features(text).items():
+            hashed = zlib.crc32(feature.encode("utf-8"))
+            sign = 1.0 if hashed & 0x80000000 else -1.0
+            vector[hashed % self.dimension] += sign * (1.0 + math.log(count))
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            vector /= norm
+        return vector.tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
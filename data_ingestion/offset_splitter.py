@@ -0,0 +1,191 @@
+# Recursive character splitting on (start, end) offsets
+
+import copy
+from bisect import bisect_left, bisect_right
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+from data_ingestion.token_counter import TokenCounter, text_codes
+
+
+class OffsetTextSplitter:
+    """Drop-in replacement for RecursiveCharacterTextSplitter that works on offsets.
+
+    Chunks are computed as (start, end) offsets into the source text, with the
+    same separator order, keep-separator-at-start behaviour, chunk_overlap
+    merging and whitespace stripping as LangChain. Pieces are never copied or
+    re-joined: separators are located with vectorized scans over the text's
+    code points, and merging jumps over runs of pieces with binary searches
+    instead of visiting them one by one. Chunk text is sliced only when a
+    Document is built; its offsets are stored as start_index and end_index.
+
+    With a token_counter, chunk_size and chunk_overlap are counted in tokens:
+    the text's token prefix sums are computed once and every piece length is
+    read from them, so chunks fill the token budget without re-tokenizing.
+    """
+
+    def __init__(
+        self,
+        chunk_size: int = 1000,
+        chunk_overlap: int = 200,
+        separators: Optional[List[str]] = None,
+        token_counter: Optional[TokenCounter] = None
+    ):
+        if chunk_size <= 0:
+            raise ValueError(f"chunk_size must be > 0, got {chunk_size}")
+        if chunk_overlap < 0:
+            raise ValueError(f"chunk_overlap must be >= 0, got {chunk_overlap}")
+        if chunk_overlap > chunk_size:
+            raise ValueError(
+                f"Got a larger chunk overlap ({chunk_overlap}) than chunk size ({chunk_size}), should be smaller."
+            )
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.separators = separators or ["\n\n", "\n", " ", ""]
+        self.token_counter = token_counter
+
+    def _scan(self, codes: np.ndarray, start: int, end: int, separator: str) -> np.ndarray:
+        """Non-overlapping separator positions in text[start:end], found with array comparisons."""
+        width = len(separator)
+        window = codes[start:end]
+        candidates = len(window) - width + 1
+        if candidates <= 0:
+            return np.zeros(0, dtype=np.int64)
+        matches = window[:candidates] == ord(separator[0])
+        for offset in range(1, width):
+            matches &= window[offset:candidates + offset] == ord(separator[offset])
+        found = np.flatnonzero(matches) + start
+        if width > 1 and found.size > 1 and (np.diff(found) < width).any():
+            # Overlapping candidates (e.g. "\n\n\n"): keep matches left to right, as re.split does
+            kept, next_allowed = [], start
+            for position in found.tolist():
+                if position >= next_allowed:
+                    kept.append(position)
+                    next_allowed = position + width
+            found = np.array(kept, dtype=np.int64)
+        return found
+
+    def _pieces(
+        self,
+        codes: np.ndarray,
+        positions: Optional[np.ndarray],
+        start: int,
+        end: int,
+        separator: str
+    ) -> Tuple[List[int], List[int], List[int], List[int], List[int]]:
+        """Start and end offsets of the pieces of text[start:end], each beginning with its
+        separator, the same bounds in length units, and the indices of the pieces too long to merge."""
+        if not separator:
+            found = np.arange(start, end, dtype=np.int64)
+        else:
+            found = self._scan(codes, start, end, separator)
+        if not found.size or found[0] != start:
+            found = np.concatenate(([start], found))
+        piece_ends = np.append(found[1:], end)
+        # Plain lists make the many small lookups of _merge cheaper than array indexing
+        starts, ends = found.tolist(), piece_ends.tolist()
+        if positions is None:
+            long_pieces = np.flatnonzero(piece_ends - found >= self.chunk_size).tolist()
+            return starts, ends, starts, ends, long_pieces
+        # Token bounds of the pieces, read from the prefix counts
+        length_starts, length_ends = positions[found], positions[piece_ends]
+        long_pieces = np.flatnonzero(length_ends - length_starts >= self.chunk_size).tolist()
+        return starts, ends, length_starts.tolist(), length_ends.tolist(), long_pieces
+
+    def _emit(self, text: str, start: int, end: int, chunks: List[Tuple[int, int]]):
+        # Offsets of the chunk with surrounding whitespace stripped; blank chunks are dropped
+        while start < end and text[start].isspace():
+            start += 1
+        while end > start and text[end - 1].isspace():
+            end -= 1
+        if start < end:
+            chunks.append((start, end))
+
+    def _merge(
+        self,
+        text: str,
+        starts: List[int],
+        ends: List[int],
+        length_starts: List[int],
+        length_ends: List[int],
+        lo: int,
+        hi: int,
+        chunks: List[Tuple[int, int]]
+    ):
+        """Merge the contiguous pieces lo..hi-1 into chunks of at most chunk_size, with overlap."""
+        chunk_size, overlap = self.chunk_size, self.chunk_overlap
+        first, k = lo, lo + 1
+        while k < hi:
+            # Every following piece that still fits joins the current chunk
+            k = bisect_right(length_ends, length_starts[first] + chunk_size, k, hi)
+            if k >= hi:
+                break
+            self._emit(text, starts[first], ends[k - 1], chunks)
+            # Drop leading pieces until what is left fits the overlap and leaves room for piece k;
+            # once nothing of length is left, zero-length (token) pieces are kept, as LangChain does
+            room = min(length_ends[k] - chunk_size, length_ends[k - 1])
+            first = bisect_left(length_starts, max(length_ends[k - 1] - overlap, room), first, k)
+            k += 1
+        self._emit(text, starts[first], ends[hi - 1], chunks)
+
+    def _split(
+        self,
+        text: str,
+        codes: np.ndarray,
+        positions: Optional[np.ndarray],
+        start: int,
+        end: int,
+        separators: List[str],
+        chunks: List[Tuple[int, int]]
+    ):
+        separator = separators[-1]
+        remaining: List[str] = []
+        for i, candidate in enumerate(separators):
+            if not candidate:
+                separator = candidate
+                break
+            if text.find(candidate, start, end) != -1:
+                separator = candidate
+                remaining = separators[i + 1:]
+                break
+
+        starts, ends, length_starts, length_ends, long_pieces = self._pieces(codes, positions, start, end, separator)
+        # Runs of mergeable pieces are handled in bulk; long pieces end a run and are split further
+        run = 0
+        for i in long_pieces:
+            if run < i:
+                self._merge(text, starts, ends, length_starts, length_ends, run, i, chunks)
+            if remaining:
+                self._split(text, codes, positions, starts[i], ends[i], remaining, chunks)
+            else:
+                chunks.append((starts[i], ends[i]))
+            run = i + 1
+        if run < len(starts):
+            self._merge(text, starts, ends, length_starts, length_ends, run, len(starts), chunks)
+
+    def split_offsets(self, text: str) -> List[Tuple[int, int]]:
+        """(start, end) offsets of the chunks of text, in order."""
+        chunks: List[Tuple[int, int]] = []
+        if text:
+            codes = text_codes(text)
+            # Token counts of the whole text, shared by every level of the recursion
+            positions = None if self.token_counter is None else self.token_counter.prefix_counts(codes)
+            self._split(text, codes, positions, 0, len(text), self.separators, chunks)
+        return chunks
+
+    def split_text(self, text: str) -> List[str]:
+        return [text[start:end] for start, end in self.split_offsets(text)]
+
+    def iter_split_documents(self, documents: Iterable[Document]) -> Iterator[Document]:
+        for doc in documents:
+            text = doc.page_content
+            for start, end in self.split_offsets(text):
+                metadata = copy.deepcopy(doc.metadata)
+                metadata["start_index"] = start
+                metadata["end_index"] = end
+                yield Document(page_content=text[start:end], metadata=metadata)
+
+    def split_documents(self, documents: Iterable[Document]) -> List[Document]:
+        return list(self.iter_split_documents(documents))
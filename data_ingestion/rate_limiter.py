@@ -0,0 +1,188 @@
+# Rate-limit-aware dispatcher for embedding API calls
+
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, Sequence
+
+from colorama import Fore, Style
+
+from data_ingestion.token_counter import get_token_counter
+
+EmbedBatch = Callable[[List[str]], List[List[float]]]
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    """Seconds from a Retry-After header on a rate limit error, when the client exposes one."""
+    headers = getattr(error, "headers", None) or getattr(getattr(error, "response", None), "headers", None)
+    if not headers:
+        return None
+    value = headers.get("retry-after") or headers.get("Retry-After")
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    status = getattr(error, "http_status", None) or getattr(error, "status_code", None)
+    return status == 429 or type(error).__name__ == "RateLimitError"
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at per_minute tokens per minute.
+
+    reserve() takes tokens immediately and returns how long the caller must wait
+    before spending them, so concurrent callers queue up without polling.
+    """
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount: float) -> float:
+        with self._lock:
+            self._refill(time.monotonic())
+            self.tokens -= min(amount, self.capacity)
+            return max(0.0, -self.tokens / self.rate)
+
+    def drain(self):
+        """Empty the bucket, e.g. after the server reported the quota as exhausted."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self.tokens = min(self.tokens, 0.0)
+
+
+class EmbeddingDispatcher:
+    """Sends embedding batches within requests-per-minute and tokens-per-minute quotas.
+
+    Texts are cut into batches bounded by the current batch size and a token
+    budget. Up to max_concurrency batches are in flight at once. The batch size
+    grows by one after each success and halves on a 429; the failing batch is
+    split and retried after the server's Retry-After (or exponential backoff).
+    A quota of None is not enforced client-side; 429s are still handled.
+    """
+
+    def __init__(
+        self,
+        rpm: Optional[float] = 3,
+        tpm: Optional[float] = 10_000,
+        max_concurrency: int = 4,
+        max_batch_size: int = 128,
+        max_batch_tokens: int = 120_000,
+        max_retries: int = 6,
+        model: str = "voyage-large-2"
+    ):
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+        self.max_batch_size = max_batch_size
+        self.max_batch_tokens = min(max_batch_tokens, int(tpm)) if tpm else max_batch_tokens
+        self.max_retries = max_retries
+        self.batch_size = max_batch_size
+        self.max_concurrency = max_concurrency
+        self._in_flight = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self._paused_until = 0.0
+        self.rate_limited = 0
+        # Same counter as token-sized chunking; resolved on first use, as loading the tokenizer may download it
+        self.model = model
+
+    def count_tokens(self, text: str) -> int:
+        return max(1, get_token_counter(self.model).count(text))
+
+    def _wait_for_quota(self, tokens: int):
+        delay = max(
+            self.requests.reserve(1) if self.requests is not None else 0.0,
+            self.tokens.reserve(tokens) if self.tokens is not None else 0.0
+        )
+        with self._lock:
+            delay = max(delay, self._paused_until - time.monotonic())
+        if delay > 0:
+            time.sleep(delay)
+
+    def _on_success(self):
+        with self._lock:
+            self.batch_size = min(self.max_batch_size, self.batch_size + 1)
+
+    def _on_rate_limited(self, error: Exception, attempt: int) -> float:
+        wait = _retry_after(error)
+        if wait is None:
+            wait = min(60.0, 2.0 ** attempt)
+        with self._lock:
+            self.rate_limited += 1
+            self.batch_size = max(1, self.batch_size // 2)
+            self._paused_until = max(self._paused_until, time.monotonic() + wait)
+        if self.requests is not None:
+            self.requests.drain()
+        print(f"{Fore.YELLOW}Rate limited by embedding API, retrying in {wait:.1f}s{Style.RESET_ALL}")
+        return wait
+
+    def _call(self, texts: List[str], embed_batch: EmbedBatch, attempt: int = 0) -> List[List[float]]:
+        tokens = sum(self.count_tokens(text) for text in texts)
+        self._wait_for_quota(tokens)
+        try:
+            with self._in_flight:
+                embeddings = embed_batch(texts)
+        except Exception as e:
+            if not is_rate_limit_error(e) or attempt >= self.max_retries:
+                raise
+            self._on_rate_limited(e, attempt)
+            if len(texts) > self.batch_size:
+                middle = len(texts) // 2
+                return (
+                    self._call(texts[:middle], embed_batch, attempt + 1)
+                    + self._call(texts[middle:], embed_batch, attempt + 1)
+                )
+            return self._call(texts, embed_batch, attempt + 1)
+        self._on_success()
+        return embeddings
+
+    def _next_batch(self, texts: Sequence[str], cursor: List[int], max_batch_size: Optional[int]):
+        with self._lock:
+            start = end = cursor[0]
+            limit = min(self.batch_size, max_batch_size or self.batch_size)
+            budget = 0
+            while end < len(texts) and end - start < limit:
+                cost = self.count_tokens(texts[end])
+                if end > start and budget + cost > self.max_batch_tokens:
+                    break
+                budget += cost
+                end += 1
+            cursor[0] = end
+        return (start, end) if end > start else None
+
+    def embed(
+        self,
+        texts: Sequence[str],
+        embed_batch: EmbedBatch,
+        max_batch_size: Optional[int] = None
+    ) -> List[List[float]]:
+        """Embed texts with embed_batch (one API request per call), in input order."""
+        texts = list(texts)
+        results: List[Optional[List[float]]] = [None] * len(texts)
+        cursor = [0]
+
+        def drain_batches():
+            while True:
+                batch = self._next_batch(texts, cursor, max_batch_size)
+                if batch is None:
+                    return
+                start, end = batch
+                results[start:end] = self._call(texts[start:end], embed_batch)
+
+        workers = min(self.max_concurrency, math.ceil(len(texts) / (max_batch_size or self.batch_size)))
+        if workers <= 1:
+            drain_batches()
+        else:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                for future in [pool.submit(drain_batches) for _ in range(workers)]:
+                    future.result()
+        return results
@@ -0,0 +1,180 @@
+# Collection statistics maintained at write time
+
+import json
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+# Metadata keys with per-value chunk counts reported by stats()
+_SOURCE_KEY = "source"
+_DATE_KEY = "content_date"
+
+
+def _encode_value(value: Any) -> str:
+    return json.dumps(value, sort_keys=True, default=str)
+
+
+class StatsCatalog:
+    """SQLite catalog of per-collection statistics, updated on every write.
+
+    Each chunk's metadata is remembered so deletes and upserts can undo its
+    contribution. Counts are kept per metadata key and per (key, value), so
+    stats() reads a handful of aggregate rows instead of scanning the collection.
+    It registers as a VectorStore change listener.
+    """
+
+    def __init__(self, path: Union[str, Path], collection_key: str):
+        self.path = Path(path)
+        self.collection_key = collection_key
+        self._lock = threading.Lock()
+        # Opened on the first write, so read-only processes never create the file
+        self._db: Optional[sqlite3.Connection] = None
+
+    def _connection(self, create: bool = True) -> Optional[sqlite3.Connection]:
+        """The catalog database; None when reading before anything was written. Call under _lock."""
+        if self._db is None:
+            if not create and not self.path.exists():
+                return None
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS chunks (
+                    collection TEXT NOT NULL, id TEXT NOT NULL, metadata TEXT NOT NULL,
+                    PRIMARY KEY (collection, id)
+                );
+                CREATE TABLE IF NOT EXISTS totals (
+                    collection TEXT PRIMARY KEY, count INTEGER NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS key_stats (
+                    collection TEXT NOT NULL, key TEXT NOT NULL, distinct_values INTEGER NOT NULL, chunks INTEGER NOT NULL,
+                    PRIMARY KEY (collection, key)
+                );
+                CREATE TABLE IF NOT EXISTS key_values (
+                    collection TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, count INTEGER NOT NULL,
+                    PRIMARY KEY (collection, key, value)
+                );
+                """
+            )
+            self._db.commit()
+        return self._db
+
+    def _apply(self, metadata: Dict[str, Any], delta: int):
+        for key, value in metadata.items():
+            encoded = _encode_value(value)
+            row = self._db.execute(
+                "SELECT count FROM key_values WHERE collection = ? AND key = ? AND value = ?",
+                (self.collection_key, key, encoded)
+            ).fetchone()
+            before = row[0] if row else 0
+            after = before + delta
+            if after > 0:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO key_values (collection, key, value, count) VALUES (?, ?, ?, ?)",
+                    (self.collection_key, key, encoded, after)
+                )
+            else:
+                self._db.execute(
+                    "DELETE FROM key_values WHERE collection = ? AND key = ? AND value = ?",
+                    (self.collection_key, key, encoded)
+                )
+            # Distinct value count changes when a value appears or disappears
+            self._db.execute(
+                "INSERT INTO key_stats (collection, key, distinct_values, chunks) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (collection, key) DO UPDATE SET "
+                "distinct_values = distinct_values + excluded.distinct_values, chunks = chunks + excluded.chunks",
+                (self.collection_key, key, int(after > 0) - int(before > 0), delta)
+            )
+
+    def _count(self, delta: int):
+        self._db.execute(
+            "INSERT INTO totals (collection, count) VALUES (?, ?) "
+            "ON CONFLICT (collection) DO UPDATE SET count = count + excluded.count",
+            (self.collection_key, delta)
+        )
+
+    def _remove(self, ids: Iterable[str]):
+        for doc_id in ids:
+            row = self._db.execute(
+                "SELECT metadata FROM chunks WHERE collection = ? AND id = ?", (self.collection_key, doc_id)
+            ).fetchone()
+            if row is None:
+                continue
+            self._apply(json.loads(row[0]), -1)
+            self._count(-1)
+            self._db.execute("DELETE FROM chunks WHERE collection = ? AND id = ?", (self.collection_key, doc_id))
+
+    def _add(self, ids: List[str], metadatas: List[Optional[dict]]):
+        # Re-added ids replace their previous version
+        self._remove(ids)
+        for doc_id, metadata in zip(ids, metadatas):
+            metadata = metadata or {}
+            self._db.execute(
+                "INSERT INTO chunks (collection, id, metadata) VALUES (?, ?, ?)",
+                (self.collection_key, doc_id, json.dumps(metadata, default=str))
+            )
+            self._apply(metadata, 1)
+            self._count(1)
+
+    def _prune(self):
+        self._db.execute("DELETE FROM key_stats WHERE collection = ? AND chunks <= 0", (self.collection_key,))
+
+    def on_documents_added(self, ids: List[str], texts: List[str], metadatas: List[dict]):
+        with self._lock, self._connection():
+            self._add(list(ids), list(metadatas))
+            self._prune()
+
+    def on_documents_deleted(self, ids: List[str]):
+        with self._lock, self._connection():
+            self._remove(ids)
+            self._prune()
+
+    def rebuild(self, pages: Iterable[Dict[str, Any]]):
+        """Replace the catalog of this collection with collection.get() pages (ids + metadatas)."""
+        with self._lock, self._connection():
+            self._db.execute("DELETE FROM chunks WHERE collection = ?", (self.collection_key,))
+            self._db.execute("DELETE FROM key_values WHERE collection = ?", (self.collection_key,))
+            self._db.execute("DELETE FROM key_stats WHERE collection = ?", (self.collection_key,))
+            self._db.execute("DELETE FROM totals WHERE collection = ?", (self.collection_key,))
+            for page in pages:
+                ids = page.get("ids", [])
+                self._add(ids, page.get("metadatas") or [{}] * len(ids))
+            self._prune()
+
+    def total(self) -> int:
+        with self._lock:
+            if self._connection(create=False) is None:
+                return 0
+            row = self._db.execute(
+                "SELECT count FROM totals WHERE collection = ?", (self.collection_key,)
+            ).fetchone()
+            return row[0] if row else 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Metadata keys with chunk counts and distinct values, chunks per source and the content date range."""
+        key_rows, source_rows, date_range = [], [], (None, None)
+        with self._lock:
+            if self._connection(create=False) is not None:
+                key_rows = self._db.execute(
+                    "SELECT key, distinct_values, chunks FROM key_stats WHERE collection = ?",
+                    (self.collection_key,)
+                ).fetchall()
+                source_rows = self._db.execute(
+                    "SELECT value, count FROM key_values WHERE collection = ? AND key = ?",
+                    (self.collection_key, _SOURCE_KEY)
+                ).fetchall()
+                date_range = self._db.execute(
+                    "SELECT MIN(value), MAX(value) FROM key_values WHERE collection = ? AND key = ?",
+                    (self.collection_key, _DATE_KEY)
+                ).fetchone()
+        return {
+            "metadata_keys": {key for key, _, _ in key_rows},
+            "metadata_key_cardinality": {key: distinct for key, distinct, _ in key_rows},
+            "metadata_key_counts": {key: chunks for key, _, chunks in key_rows},
+            "chunks_per_source": {json.loads(value): count for value, count in source_rows},
+            "content_date_range": (
+                None if date_range[0] is None else (json.loads(date_range[0]), json.loads(date_range[1]))
+            )
+        }
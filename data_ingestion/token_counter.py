@@ -0,0 +1,151 @@
+# Voyage token counts, used to size chunks in tokens and to budget tokens per minute
+
+import os
+from functools import lru_cache
+from typing import Optional
+
+import numpy as np
+from colorama import Fore, Style
+
+# Context length, in tokens, of each Voyage embedding model
+VOYAGE_CONTEXT_LENGTHS = {
+    "voyage-3-large": 32000,
+    "voyage-3": 32000,
+    "voyage-3-lite": 32000,
+    "voyage-code-3": 32000,
+    "voyage-finance-2": 32000,
+    "voyage-multilingual-2": 32000,
+    "voyage-large-2": 16000,
+    "voyage-large-2-instruct": 16000,
+    "voyage-code-2": 16000,
+    "voyage-law-2": 16000,
+    "voyage-2": 4000,
+    "voyage-lite-02-instruct": 4000,
+}
+
+# Character classes of the pre-tokenizer
+_SPACE, _LETTER, _DIGIT, _OTHER = 0, 1, 2, 3
+
+_ASCII_CLASSES = np.full(128, _OTHER, dtype=np.int8)
+for _char in " \t\n\r\x0b\x0c":
+    _ASCII_CLASSES[ord(_char)] = _SPACE
+for _char in "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ":
+    _ASCII_CLASSES[ord(_char)] = _LETTER
+for _char in "0123456789":
+    _ASCII_CLASSES[ord(_char)] = _DIGIT
+
+# Non-ASCII spaces; CJK and later scripts (from U+2E80) are about one token per character
+_UNICODE_SPACES = np.array([0x85, 0xA0, 0x1680, 0x2028, 0x2029, 0x202F, 0x205F, 0x3000], dtype=np.uint32)
+_CJK_START = 0x2E80
+
+
+class TokenCounter:
+    """Rough local estimate of how many tokens a Voyage model sees in a text, used
+    when the model's tokenizer cannot be loaded (see get_token_counter).
+
+    Text is cut into runs of letters, digits and whitespace plus single
+    punctuation marks, as BPE pre-tokenizers do. A letter run costs one token
+    per letters_per_token characters, a digit run one per 3 digits, each
+    punctuation mark or CJK character one, and whitespace beyond a single
+    space one per run. Tokens are attributed to individual characters, so the
+    count of any slice of a text is a difference of two prefix sums.
+
+    The ratios are not calibrated against the Voyage tokenizer, so counts can be
+    off in either direction, notably for numbers, symbols and non-Latin scripts.
+    """
+
+    def __init__(self, model: str = "voyage-large-2", letters_per_token: int = 6):
+        self.model = model
+        self.letters_per_token = letters_per_token
+        # None for models outside the Voyage table, e.g. local hashing embeddings
+        self.max_tokens: Optional[int] = VOYAGE_CONTEXT_LENGTHS.get(model)
+
+    def token_weights(self, codes: np.ndarray) -> np.ndarray:
+        """Tokens attributed to each code point of a text, as 0 or 1."""
+        n = len(codes)
+        if not n:
+            return np.zeros(0, dtype=np.int64)
+        classes = np.full(n, _LETTER, dtype=np.int8)
+        ascii_chars = codes < 128
+        classes[ascii_chars] = _ASCII_CLASSES[codes[ascii_chars]]
+        classes[codes >= _CJK_START] = _OTHER
+        classes[np.isin(codes, _UNICODE_SPACES)] = _SPACE
+
+        # Every punctuation mark is a run of its own
+        run_start = np.empty(n, dtype=bool)
+        run_start[0] = True
+        np.not_equal(classes[1:], classes[:-1], out=run_start[1:])
+        run_start |= classes == _OTHER
+        starts = np.flatnonzero(run_start)
+        lengths = np.diff(np.append(starts, n))
+        offsets = np.arange(n) - np.repeat(starts, lengths)
+
+        # A token every `period` characters into a run, or on the second character of whitespace
+        period = np.where(classes == _DIGIT, 3, np.where(classes == _LETTER, self.letters_per_token, 1))
+        weights = np.where(classes == _SPACE, offsets == 1, offsets % period == 0)
+        return weights.astype(np.int64)
+
+    def prefix_counts(self, codes: np.ndarray) -> np.ndarray:
+        """Tokens before each position of a text; text[a:b] holds counts[b] - counts[a]."""
+        counts = np.zeros(len(codes) + 1, dtype=np.int64)
+        np.cumsum(self.token_weights(codes), out=counts[1:])
+        return counts
+
+    def count(self, text: str) -> int:
+        return int(self.token_weights(text_codes(text)).sum())
+
+
+class TokenizerCounter(TokenCounter):
+    """Token counts from the model's own tokenizer, a `tokenizers.Tokenizer` as used by
+    voyageai.Client.tokenize and count_tokens.
+
+    For prefix sums each token is attributed to the character it starts at, so a
+    slice is counted as the tokens starting inside it; tokenizing the slice on its
+    own can differ by about a token at either end.
+    """
+
+    def __init__(self, tokenizer, model: str = "voyage-large-2"):
+        super().__init__(model)
+        self.tokenizer = tokenizer
+
+    def token_weights(self, codes: np.ndarray) -> np.ndarray:
+        weights = np.zeros(len(codes), dtype=np.int64)
+        if len(codes):
+            text = codes.tobytes().decode("utf-32-le", "surrogatepass")
+            encoding = self.tokenizer.encode(text, add_special_tokens=False)
+            starts = np.array([start for start, _ in encoding.offsets], dtype=np.int64)
+            np.add.at(weights, np.minimum(starts, len(codes) - 1), 1)
+        return weights
+
+    def count(self, text: str) -> int:
+        return len(self.tokenizer.encode(text).ids)
+
+
+def _load_tokenizer(model: str):
+    """The model's tokenizer from VOYAGE_TOKENIZER_PATH (a tokenizer.json) or the Hugging Face Hub."""
+    from tokenizers import Tokenizer
+
+    path = os.getenv("VOYAGE_TOKENIZER_PATH")
+    tokenizer = Tokenizer.from_file(path) if path else Tokenizer.from_pretrained(f"voyageai/{model}")
+    tokenizer.no_truncation()
+    return tokenizer
+
+
+def text_codes(text: str) -> np.ndarray:
+    """Code points of a text, one per element, so array positions are string offsets."""
+    return np.frombuffer(text.encode("utf-32-le", "surrogatepass"), dtype=np.uint32)
+
+
+@lru_cache(maxsize=None)
+def get_token_counter(model: str = "voyage-large-2") -> TokenCounter:
+    """Shared counter for a model: its tokenizer for Voyage models, else the local estimate."""
+    if model not in VOYAGE_CONTEXT_LENGTHS:
+        return TokenCounter(model)
+    try:
+        return TokenizerCounter(_load_tokenizer(model), model)
+    except Exception as e:
+        print(
+            f"{Fore.YELLOW}Warning: could not load the {model} tokenizer ({type(e).__name__}: {str(e)}); "
+            f"token counts are estimated and may differ from the model's{Style.RESET_ALL}"
+        )
+        return TokenCounter(model)
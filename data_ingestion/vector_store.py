@@ -1,18 +1,35 @@
 import warnings
 import os
+import threading
+import uuid
+import weakref
+from pathlib import Path
+from colorama import Fore, Style
 from dotenv import load_dotenv
-from typing import List, Dict, Optional, Any
+from typing import Callable, List, Dict, Iterable, Iterator, Optional, Any, Sequence
 import chromadb
 from langchain_chroma import Chroma
 from langchain_core.documents import Document
 
+from data_ingestion.bulk_writer import BulkWriter
+from data_ingestion.stats_catalog import StatsCatalog
+
 # Suppress all warnings
 warnings.filterwarnings("ignore")
 
 load_dotenv()
 
+# Objects notified of writes to a collection, keyed by collection_key and shared by every
+# VectorStore in the process. Listeners implement on_documents_added(ids, texts, metadatas) and on_documents_deleted(ids).
+_change_listeners: Dict[str, "weakref.WeakSet"] = {}
+# One StatsCatalog per (catalog file, collection), shared by VectorStores in the process
+_stats_catalogs: Dict[tuple, StatsCatalog] = {}
+
 
 class VectorStore:
+    # Ids per existence lookup, below SQLite's bound parameter limit
+    ID_LOOKUP_BATCH = 500
+    
     def __init__(
         self,
         collection_name: str,
@@ -21,7 +38,8 @@ class VectorStore:
         use_cloud: bool = True,  # Default to cloud
         api_key: Optional[str] = None,
         tenant: Optional[str] = None,
-        database: Optional[str] = None
+        database: Optional[str] = None,
+        stats_catalog_path: Optional[str] = None
     ):
         self.collection_name = collection_name
         self.embedding_function = embedding_function
@@ -65,10 +83,50 @@ class VectorStore:
                 persist_directory=persist_directory
             )
     
+        # Identifies the collection across processes, for the stats catalog and ingestion manifest
+        if use_cloud:
+            self.collection_key = f"cloud:{tenant}/{database}/{collection_name}"
+        else:
+            self.collection_key = f"local:{Path(persist_directory or '.').resolve()}/{collection_name}"
+        # Statistics are maintained on write, so get_stats does not scan the collection;
+        # the catalog file is only created by the first write
+        stats_catalog_path = stats_catalog_path or os.getenv("STATS_CATALOG_PATH") or str(
+            Path(__file__).parent.parent / "stats_catalog" / "catalog.sqlite"
+        )
+        catalog_id = (str(Path(stats_catalog_path).resolve()), self.collection_key)
+        if catalog_id not in _stats_catalogs:
+            _stats_catalogs[catalog_id] = StatsCatalog(stats_catalog_path, self.collection_key)
+        self.stats_catalog = _stats_catalogs[catalog_id]
+        self.add_change_listener(self.stats_catalog)
+        # Bulk upload workers report their batches one at a time
+        self._notify_lock = threading.Lock()
+    
+    def add_change_listener(self, listener):
+        """Register a listener for documents added to or deleted from this collection."""
+        _change_listeners.setdefault(self.collection_key, weakref.WeakSet()).add(listener)
+    
+    def _has_listeners(self) -> bool:
+        return bool(_change_listeners.get(self.collection_key))
+    
+    def _notify(self, method: str, *args):
+        for listener in list(_change_listeners.get(self.collection_key, ())):
+            try:
+                getattr(listener, method)(*args)
+            except Exception as e:
+                print(f"{Fore.YELLOW}Warning: change listener failed: {type(e).__name__}: {str(e)}{Style.RESET_ALL}")
+    
     def add_documents(self, documents: List[Document], ids: Optional[List[str]] = None):
         if ids:
-            return self.vectorstore.add_documents(documents=documents, ids=ids)
-        return self.vectorstore.add_documents(documents=documents)
+            added_ids = self.vectorstore.add_documents(documents=documents, ids=ids)
+        else:
+            added_ids = self.vectorstore.add_documents(documents=documents)
+        self._notify(
+            "on_documents_added",
+            added_ids,
+            [doc.page_content for doc in documents],
+            [doc.metadata for doc in documents]
+        )
+        return added_ids
     
     def add_texts(
         self,
@@ -77,17 +135,107 @@ class VectorStore:
         ids: Optional[List[str]] = None
     ):
         if ids and metadatas:
-            return self.vectorstore.add_texts(
+            added_ids = self.vectorstore.add_texts(
                 texts=texts,
                 metadatas=metadatas,
                 ids=ids
             )
         elif ids:
-            return self.vectorstore.add_texts(texts=texts, ids=ids)
+            added_ids = self.vectorstore.add_texts(texts=texts, ids=ids)
         elif metadatas:
-            return self.vectorstore.add_texts(texts=texts, metadatas=metadatas)
+            added_ids = self.vectorstore.add_texts(texts=texts, metadatas=metadatas)
         else:
-            return self.vectorstore.add_texts(texts=texts)
+            added_ids = self.vectorstore.add_texts(texts=texts)
+        self._notify("on_documents_added", added_ids, list(texts), metadatas or [{} for _ in texts])
+        return added_ids
+    
+    def _upsert_batch(self, ids: List[str], embeddings: List[List[float]], texts: List[str], metadatas: List[dict]):
+        collection = self.get_collection()
+        # Chroma rejects empty metadata dicts, so chunks without metadata are written separately
+        with_metadata = [i for i, metadata in enumerate(metadatas) if metadata]
+        without_metadata = [i for i, metadata in enumerate(metadatas) if not metadata]
+        if with_metadata:
+            collection.upsert(
+                ids=[ids[i] for i in with_metadata],
+                embeddings=[embeddings[i] for i in with_metadata],
+                documents=[texts[i] for i in with_metadata],
+                metadatas=[metadatas[i] for i in with_metadata]
+            )
+        if without_metadata:
+            collection.upsert(
+                ids=[ids[i] for i in without_metadata],
+                embeddings=[embeddings[i] for i in without_metadata],
+                documents=[texts[i] for i in without_metadata]
+            )
+        with self._notify_lock:
+            self._notify("on_documents_added", ids, texts, [metadata or {} for metadata in metadatas])
+    
+    def existing_ids(self, ids: List[str]) -> set:
+        """The subset of ids stored in the collection."""
+        collection = self.get_collection()
+        found = set()
+        for start in range(0, len(ids), self.ID_LOOKUP_BATCH):
+            found.update(collection.get(ids=ids[start:start + self.ID_LOOKUP_BATCH], include=[]).get("ids", []))
+        return found
+    
+    def add_documents_bulk(
+        self,
+        documents: List[Document],
+        ids: Optional[List[str]] = None,
+        batch_size: int = 256,
+        max_workers: int = 4,
+        max_retries: int = 3,
+        progress_callback: Optional[Callable[[int, Optional[int]], None]] = None,
+        skip_existing: bool = False
+    ) -> List[str]:
+        """Upsert many documents in batches, embedding the next batch while earlier ones upload.
+        
+        Up to max_workers batches are written concurrently and each failed batch is retried
+        max_retries times. progress_callback(chunks_written, total_chunks) runs after each batch.
+        skip_existing leaves ids already in the collection untouched, which suits content-derived ids.
+        """
+        if ids is None:
+            ids = [getattr(doc, "id", None) or str(uuid.uuid4()) for doc in documents]
+        # Chroma rejects repeated ids within one write; the last occurrence wins, as with sequential upserts
+        last = {doc_id: i for i, doc_id in enumerate(ids)}
+        if len(last) < len(ids):
+            documents = [documents[i] for i in sorted(last.values())]
+            ids = [ids[i] for i in sorted(last.values())]
+        writer = self._bulk_writer(batch_size, max_workers, max_retries, progress_callback, skip_existing)
+        return writer.write(ids, [doc.page_content for doc in documents], [doc.metadata for doc in documents])
+    
+    def add_documents_stream(
+        self,
+        documents: Iterable[Document],
+        batch_size: int = 256,
+        max_workers: int = 4,
+        max_retries: int = 3,
+        progress_callback: Optional[Callable[[int, Optional[int]], None]] = None,
+        skip_existing: bool = False
+    ) -> List[str]:
+        """Upsert documents pulled lazily from an iterable, e.g. DocumentProcessor.stream_chunks.
+        
+        Reading, embedding and writing run as bounded stages, so memory does not grow with the
+        number of documents and the first batch is written while later ones are still produced.
+        Documents without an id get a random one. progress_callback receives None as the total.
+        """
+        records = (
+            (getattr(doc, "id", None) or str(uuid.uuid4()), doc.page_content, doc.metadata)
+            for doc in documents
+        )
+        writer = self._bulk_writer(batch_size, max_workers, max_retries, progress_callback, skip_existing)
+        return writer.write_stream(records)
+    
+    def _bulk_writer(self, batch_size, max_workers, max_retries, progress_callback, skip_existing) -> BulkWriter:
+        return BulkWriter(
+            self.embedding_function.embed_documents,
+            self._upsert_batch,
+            batch_size=batch_size,
+            max_workers=max_workers,
+            max_retries=max_retries,
+            progress_callback=progress_callback,
+            existing_ids=self.existing_ids if skip_existing else None
+        )
     
     def similarity_search(
         self,
@@ -113,38 +261,95 @@ class VectorStore:
             filter=filter
         )
     
+    def similarity_search_ids_with_score(
+        self,
+        query: str,
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None
+    ) -> List[tuple]:
+        """(id, distance) pairs of the nearest chunks, without fetching their text or metadata."""
+        embedding = self.embedding_function.embed_query(query)
+        return self.similarity_search_ids_by_vectors([embedding], k=k, filter=filter)[0]
+    
+    def similarity_search_ids_by_vectors(
+        self,
+        embeddings: List[List[float]],
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None
+    ) -> List[List[tuple]]:
+        """(id, distance) pairs of the nearest chunks for each query embedding, in one request."""
+        if not embeddings:
+            return []
+        results = self.get_collection().query(
+            query_embeddings=embeddings,
+            n_results=k,
+            where=filter,
+            include=["distances"]
+        )
+        return [list(zip(ids, distances)) for ids, distances in zip(results["ids"], results["distances"])]
+    
     def get_collection(self):
         return self.vectorstore._collection
     
-    def view_data(self, limit: Optional[int] = None, include_embeddings: bool = False):
+    def iter_data(
+        self,
+        batch_size: int = 1000,
+        include: Sequence[str] = ("documents", "metadatas"),
+        where: Optional[Dict[str, Any]] = None,
+        limit: Optional[int] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """Yield the collection page by page, fetched with server-side limit/offset.
+        
+        Each page is a collection.get() result holding ids plus the included fields.
+        Pages follow storage order, so writes made while iterating may be skipped or seen twice.
+        """
         collection = self.get_collection()
+        offset = 0
+        while limit is None or offset < limit:
+            page_size = batch_size if limit is None else min(batch_size, limit - offset)
+            page = collection.get(include=list(include), where=where, limit=page_size, offset=offset)
+            if not page.get("ids"):
+                return
+            yield page
+            offset += len(page["ids"])
+            if len(page["ids"]) < page_size:
+                return
+    
+    def view_data(self, limit: Optional[int] = None, include_embeddings: bool = False, batch_size: int = 1000):
         include_list = ["documents", "metadatas"]
         if include_embeddings:
             include_list.append("embeddings")
         
-        results = collection.get(include=include_list)
-        
-        if limit:
+        results = {"ids": []}
+        for key in include_list:
+            results[key] = []
+        for page in self.iter_data(batch_size=batch_size, include=include_list, limit=limit):
             for key in results:
-                if isinstance(results[key], list):
-                    results[key] = results[key][:limit]
+                values = page.get(key)
+                results[key].extend(values if values is not None else [None] * len(page["ids"]))
         
         return results
     
-    def get_stats(self) -> Dict[str, Any]:
+    def get_stats(self, refresh: bool = False) -> Dict[str, Any]:
+        """Collection statistics, read from the write-time catalog without scanning the collection.
+        
+        The catalog is local to this machine, so it misses writes made elsewhere (e.g. other
+        hosts on a cloud collection) or before it existed; stats_current is then False.
+        refresh=True rebuilds it by streaming the collection's metadata once.
+        """
         collection = self.get_collection()
         count = collection.count()
-        data = collection.get()
+        if refresh:
+            self.stats_catalog.rebuild(self.iter_data(include=["metadatas"]))
+        catalog = self.stats_catalog.stats()
         
         return {
             "collection_name": self.collection_name,
             "total_documents": count,
-            "has_ids": len(data.get("ids", [])) > 0,
-            "has_metadata": len(data.get("metadatas", [])) > 0,
-            "metadata_keys": set() if not data.get("metadatas") else set(
-                key for meta in data.get("metadatas", []) if meta 
-                for key in meta.keys()
-            )
+            "has_ids": count > 0,
+            "has_metadata": bool(catalog["metadata_keys"]),
+            "stats_current": self.stats_catalog.total() == count,
+            **catalog
         }
     
     def print_data(self, limit: Optional[int] = 10):
@@ -173,8 +378,14 @@ class VectorStore:
     
     def delete(self, ids: Optional[List[str]] = None, filter: Optional[Dict[str, Any]] = None):
         collection = self.get_collection()
+        if not ids and filter and self._has_listeners():
+            # Resolve the filter first so listeners learn which ids were removed
+            ids = collection.get(where=filter, include=[]).get("ids", [])
+            if not ids:
+                return
         if ids:
             collection.delete(ids=ids)
+            self._notify("on_documents_deleted", list(ids))
         elif filter:
             collection.delete(where=filter)
         else:
@@ -0,0 +1,338 @@
+# Inverted-index BM25 engine
+
+import re
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+
+from rag_query.fusion import top_k_indices
+
+TOKEN_PATTERN = re.compile(r'\w+')
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokenization shared by indexing and querying."""
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class BM25Index:
+    """BM25 (Okapi) over compact posting lists.
+
+    Each term maps to a slice of two flat arrays holding the ids of the
+    documents that contain it and the term frequencies. Scoring a query only
+    touches the posting lists of its terms. Scores match rank_bm25.BM25Okapi
+    with the same k1, b and epsilon.
+    """
+
+    def __init__(
+        self,
+        tokenized_docs: Iterable[List[str]],
+        k1: float = 1.5,
+        b: float = 0.75,
+        epsilon: float = 0.25
+    ):
+        self.k1 = k1
+        self.b = b
+        self.epsilon = epsilon
+
+        vocabulary: Dict[str, int] = {}
+        term_ids, doc_ids, term_freqs, doc_lengths = [], [], [], []
+        for doc_id, tokens in enumerate(tokenized_docs):
+            doc_lengths.append(len(tokens))
+            for term, freq in Counter(tokens).items():
+                term_ids.append(vocabulary.setdefault(term, len(vocabulary)))
+                doc_ids.append(doc_id)
+                term_freqs.append(freq)
+
+        # Number terms in sorted order so the vocabulary can be stored as a sorted string table
+        terms = sorted(vocabulary)
+        sorted_ids = np.empty(len(terms), dtype=np.int64)
+        sorted_ids[[vocabulary[term] for term in terms]] = np.arange(len(terms))
+        self.vocabulary = {term: term_id for term_id, term in enumerate(terms)}
+        self.doc_lengths = np.asarray(doc_lengths, dtype=np.int32)
+
+        # Group postings by term; a stable sort keeps doc ids ascending within each list
+        term_ids = sorted_ids[np.asarray(term_ids, dtype=np.int64)]
+        order = np.argsort(term_ids, kind="stable")
+        self.postings_docs = np.asarray(doc_ids, dtype=np.int32)[order]
+        self.postings_freqs = np.asarray(term_freqs, dtype=np.int32)[order]
+        self.postings_offsets = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(term_ids, minlength=len(vocabulary)), out=self.postings_offsets[1:])
+
+        self._compute_statistics()
+
+    @classmethod
+    def from_arrays(
+        cls,
+        vocabulary,
+        doc_lengths: np.ndarray,
+        postings_docs: np.ndarray,
+        postings_freqs: np.ndarray,
+        postings_offsets: np.ndarray,
+        idf: np.ndarray,
+        length_norms: np.ndarray,
+        upper_bounds: np.ndarray,
+        avgdl: float,
+        k1: float = 1.5,
+        b: float = 0.75,
+        epsilon: float = 0.25
+    ) -> "BM25Index":
+        """Rebuild an index from precomputed arrays (e.g. memory-mapped from disk).
+
+        The vocabulary only needs a get(term) method returning the term id or None.
+        """
+        index = cls.__new__(cls)
+        index.k1, index.b, index.epsilon = k1, b, epsilon
+        index.vocabulary = vocabulary
+        index.doc_lengths = doc_lengths
+        index.postings_docs = postings_docs
+        index.postings_freqs = postings_freqs
+        index.postings_offsets = postings_offsets
+        index.idf = idf
+        index.length_norms = length_norms
+        index.upper_bounds = upper_bounds
+        index.avgdl = avgdl
+        return index
+
+    @property
+    def corpus_size(self) -> int:
+        return len(self.doc_lengths)
+
+    def _compute_statistics(self):
+        """Compute avgdl, idf and per-document length normalization."""
+        self.avgdl = float(self.doc_lengths.sum()) / self.corpus_size if self.corpus_size else 0.0
+
+        doc_freqs = np.diff(self.postings_offsets).astype(np.float64)
+        idf = np.log(self.corpus_size - doc_freqs + 0.5) - np.log(doc_freqs + 0.5)
+        if idf.size:
+            # Same floor as BM25Okapi for terms present in most documents
+            idf[idf < 0] = self.epsilon * idf.mean()
+        self.idf = idf
+
+        avgdl = self.avgdl or 1.0
+        self.length_norms = self.k1 * (1 - self.b + self.b * self.doc_lengths / avgdl)
+
+        self.compute_upper_bounds()
+
+    def compute_upper_bounds(self):
+        """Per-term upper bound: the largest contribution the term makes to any document."""
+        self.upper_bounds = np.zeros(len(self.idf), dtype=np.float64)
+        if self.postings_docs.size:
+            term_of_posting = np.repeat(np.arange(len(self.idf)), np.diff(self.postings_offsets))
+            freqs = self.postings_freqs
+            weights = self.idf[term_of_posting] * (freqs * (self.k1 + 1)) / (freqs + self.length_norms[self.postings_docs])
+            non_empty = np.diff(self.postings_offsets) > 0
+            self.upper_bounds[non_empty] = np.maximum.reduceat(weights, self.postings_offsets[:-1][non_empty])
+
+    def postings(self, term_id: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Doc ids and term frequencies for a term."""
+        start, end = self.postings_offsets[term_id], self.postings_offsets[term_id + 1]
+        return self.postings_docs[start:end], self.postings_freqs[start:end]
+
+    def _query_terms(self, query: List[str]) -> List[Tuple[int, int]]:
+        """(term_id, count) pairs for query tokens present in the vocabulary."""
+        counts = Counter(query)
+        terms = []
+        for token, count in counts.items():
+            term_id = self.vocabulary.get(token)
+            if term_id is not None:
+                terms.append((int(term_id), count))
+        return terms
+
+    def term_scores(self, term_id: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Doc ids and BM25 contributions of a single term."""
+        docs, freqs = self.postings(term_id)
+        weights = self.idf[term_id] * (freqs * (self.k1 + 1)) / (freqs + self.length_norms[docs])
+        return docs, weights
+
+    def get_sparse_scores(self, query: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """Doc ids (ascending) and scores of every document matching at least one query term."""
+        parts = []
+        for term_id, count in self._query_terms(query):
+            docs, weights = self.term_scores(term_id)
+            parts.append((docs, weights * count))
+        if not parts:
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float64)
+
+        docs = np.concatenate([docs for docs, _ in parts])
+        weights = np.concatenate([weights for _, weights in parts])
+        matched, inverse = np.unique(docs, return_inverse=True)
+        return matched, np.bincount(inverse, weights=weights, minlength=matched.size)
+
+    def get_scores(self, query: List[str]) -> np.ndarray:
+        """Dense score array over the corpus, like BM25Okapi.get_scores."""
+        scores = np.zeros(self.corpus_size, dtype=np.float64)
+        for term_id, count in self._query_terms(query):
+            docs, weights = self.term_scores(term_id)
+            scores[docs] += weights * count
+        return scores
+
+    def score_documents(self, query: List[str], doc_ids: np.ndarray) -> np.ndarray:
+        """Exact scores for the given documents, probing each posting list by binary search."""
+        doc_ids = np.asarray(doc_ids, dtype=np.int64)
+        order = np.argsort(doc_ids, kind="stable")
+        sorted_ids = doc_ids[order]
+        scores = np.zeros(doc_ids.size, dtype=np.float64)
+        for term_id, count in self._query_terms(query):
+            scores[order] += self._probe(term_id, sorted_ids) * count
+        return scores
+
+    def posting_size(self, term_id: int) -> int:
+        return int(self.postings_offsets[term_id + 1] - self.postings_offsets[term_id])
+
+    def _probe(self, term_id: int, doc_ids: np.ndarray) -> np.ndarray:
+        """Contribution of a term to each of doc_ids (sorted; 0 where the term is absent)."""
+        docs, freqs = self.postings(term_id)
+        contributions = np.zeros(doc_ids.size, dtype=np.float64)
+        if docs.size == 0 or doc_ids.size == 0:
+            return contributions
+        if doc_ids.size * np.log2(docs.size + 1) < docs.size:
+            # Few documents: binary search each one in the posting list
+            positions = np.minimum(np.searchsorted(docs, doc_ids), docs.size - 1)
+            found = docs[positions] == doc_ids
+            targets, freqs = np.flatnonzero(found), freqs[positions[found]]
+        else:
+            # Many documents: one linear pass over the posting list; a dense lookup also serves repeated ids
+            dense_freqs = np.zeros(self.length_norms.size, dtype=freqs.dtype)
+            dense_freqs[docs] = freqs
+            freqs = dense_freqs[doc_ids]
+            targets = np.flatnonzero(freqs)
+            freqs = freqs[targets]
+        contributions[targets] = self.idf[term_id] * (freqs * (self.k1 + 1)) / (
+            freqs + self.length_norms[doc_ids[targets]]
+        )
+        return contributions
+
+    def match_bound(self, query: List[str]) -> Tuple[int, bool]:
+        """Upper bound on the number of documents matching query (the summed posting sizes), and
+        whether all its terms have positive idf, so that unmatched documents have the lowest score, 0."""
+        terms = self._query_terms(query)
+        return (
+            sum(self.posting_size(term_id) for term_id, _ in terms),
+            all(self.idf[term_id] > 0 for term_id, _ in terms)
+        )
+
+    def top_k(self, query: List[str], k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Doc ids and scores of the k best documents, highest first (see max_score_top_k)."""
+        sources = [(self, term_id, count) for term_id, count in self._query_terms(query)]
+        return max_score_top_k(sources, k, self.length_norms.size)
+
+    def score_batch(self, queries: List[List[str]], doc_ids: Optional[np.ndarray] = None) -> np.ndarray:
+        """Scores of several queries at once, one row per query (see batch_scores)."""
+        return batch_scores([self], queries, self.length_norms.size, doc_ids)
+
+
+
+def _kth_score(scores: np.ndarray, k: int) -> float:
+    """k-th largest score, or 0 with fewer than k candidates."""
+    if scores.size < k:
+        return 0.0
+    return float(np.partition(scores, scores.size - k)[scores.size - k])
+
+
+def _select(docs: np.ndarray, scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Top k by score, ties broken by ascending doc id (docs must be sorted)."""
+    order = top_k_indices(scores, k)
+    return docs[order], scores[order]
+
+
+def max_score_top_k(
+    sources: List[Tuple[BM25Index, int, int]],
+    k: int,
+    doc_space: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Doc ids and scores of the k best documents, highest first.
+
+    sources are (index, term_id, query_count) posting lists whose doc ids share
+    one id space of size doc_space; a term split across index segments is
+    simply several sources.
+
+    MaxScore pruning: sources are visited by descending upper bound. Once the
+    upper bounds of the remaining sources cannot lift an unseen document past
+    the current k-th score, those sources stop contributing new candidates and
+    are only probed for the documents already collected. Results are the same
+    as exhaustive scoring, up to floating-point summation order.
+    """
+    if k <= 0 or not sources:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+
+    if any(index.idf[term_id] <= 0 for index, term_id, _ in sources):
+        # Non-positive contributions break the upper-bound argument
+        accumulator = np.zeros(doc_space, dtype=np.float64)
+        for index, term_id, count in sources:
+            docs, weights = index.term_scores(term_id)
+            accumulator[docs] += weights * count
+        matched = np.zeros(doc_space, dtype=bool)
+        for index, term_id, _ in sources:
+            docs = index.postings(term_id)[0]
+            # Deleted documents of an incremental index carry an infinite length norm
+            matched[docs[np.isfinite(index.length_norms[docs])]] = True
+        docs = np.flatnonzero(matched)
+        return _select(docs, accumulator[docs], k)
+
+    sources = sorted(sources, key=lambda source: source[0].upper_bounds[source[1]] * source[2], reverse=True)
+    bounds = np.array([index.upper_bounds[term_id] * count for index, term_id, count in sources])
+    remaining = np.cumsum(bounds[::-1])[::-1]
+
+    # Essential sources are scattered into an accumulator; all contributions are positive,
+    # so untouched documents hold 0 and never outrank a matching one
+    accumulator = np.zeros(doc_space, dtype=np.float64)
+    threshold = 0.0
+    probe_from = len(sources)
+    for i, (index, term_id, count) in enumerate(sources):
+        if remaining[i] < threshold:
+            probe_from = i
+            break
+        docs, weights = index.term_scores(term_id)
+        accumulator[docs] += weights * count
+        # The k-th score within one posting list is a lower bound on the overall k-th score
+        threshold = max(threshold, _kth_score(accumulator[docs], k))
+
+    cand_docs = np.flatnonzero(accumulator > 0)
+    for j in range(probe_from, len(sources)):
+        # Non-essential sources only score candidates that can still reach the top k
+        cand_docs = cand_docs[accumulator[cand_docs] + remaining[j] >= threshold]
+        index, term_id, count = sources[j]
+        accumulator[cand_docs] += index._probe(term_id, cand_docs) * count
+        threshold = max(threshold, _kth_score(accumulator[cand_docs], k))
+
+    return _select(cand_docs, accumulator[cand_docs], k)
+
+
+def batch_scores(
+    segments: List[BM25Index],
+    queries: List[List[str]],
+    doc_space: int,
+    doc_ids: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """Score matrix of several queries over index segments sharing one doc id space.
+
+    Each distinct term is read once for the whole batch and its contributions
+    are added to the rows of every query containing it. Returns shape
+    (len(queries), doc_space), or (len(queries), len(doc_ids)) when doc_ids
+    restricts scoring to those documents.
+    """
+    rows_by_term: Dict[str, List[Tuple[int, int]]] = {}
+    for row, query in enumerate(queries):
+        for term, count in Counter(query).items():
+            rows_by_term.setdefault(term, []).append((row, count))
+
+    if doc_ids is not None:
+        doc_ids = np.asarray(doc_ids, dtype=np.int64)
+        order = np.argsort(doc_ids, kind="stable")
+        sorted_ids = doc_ids[order]
+    scores = np.zeros((len(queries), doc_space if doc_ids is None else doc_ids.size), dtype=np.float64)
+
+    for term, row_counts in rows_by_term.items():
+        rows = np.array([row for row, _ in row_counts], dtype=np.int64)
+        counts = np.array([count for _, count in row_counts], dtype=np.float64)[:, None]
+        for segment in segments:
+            term_id = segment.vocabulary.get(term)
+            if term_id is None:
+                continue
+            if doc_ids is None:
+                docs, weights = segment.term_scores(int(term_id))
+                scores[np.ix_(rows, docs)] += counts * weights
+            else:
+                scores[np.ix_(rows, order)] += counts * segment._probe(int(term_id), sorted_ids)
+    return scores
@@ -0,0 +1,82 @@
+# Array-based score fusion for hybrid search
+
+from datetime import datetime
+from typing import Optional
+import numpy as np
+
+EPOCH = datetime(1970, 1, 1)
+# content_days value of chunks without a (valid) content_date
+UNDATED = np.iinfo(np.int64).min
+
+
+def to_epoch_day(value: Optional[str]) -> int:
+    """Parse an ISO date string into days since 1970-01-01. Returns UNDATED when missing or invalid."""
+    if not value:
+        return UNDATED
+    try:
+        parsed = datetime.fromisoformat(value)
+        if parsed.tzinfo is not None:
+            return UNDATED
+        return (parsed - EPOCH).days
+    except (ValueError, TypeError):
+        return UNDATED
+
+
+def normalize_distances(distances: np.ndarray) -> np.ndarray:
+    """Map vector distances to (0, 1]. Non-positive distances (missing hits) map to 0."""
+    normalized = np.zeros_like(distances, dtype=np.float64)
+    positive = distances > 0
+    normalized[positive] = 1.0 / (1.0 + distances[positive])
+    return normalized
+
+
+def min_max_normalize(scores: np.ndarray, mask: Optional[np.ndarray] = None) -> np.ndarray:
+    """Min-max normalize scores into [0, 1]. Returns zeros when all scores are equal.
+
+    When mask is given, the range is taken over the masked entries only.
+    """
+    scores = np.asarray(scores, dtype=np.float64)
+    reference = scores if mask is None else scores[mask]
+    if reference.size == 0:
+        return np.zeros_like(scores)
+    low, high = reference.min(), reference.max()
+    if high <= low:
+        return np.zeros_like(scores)
+    return (scores - low) / (high - low + 1e-8)
+
+
+def hybrid_scores(vector_norm: np.ndarray, bm25_norm: np.ndarray, alpha: float) -> np.ndarray:
+    """Blend normalized scores: alpha * semantic + (1 - alpha) * BM25."""
+    return alpha * vector_norm + (1 - alpha) * bm25_norm
+
+
+def recency_factors(content_days: np.ndarray, now: Optional[datetime] = None) -> np.ndarray:
+    """Recency factor 1 / (1 + years_ago) per document. Undated documents get 0."""
+    today = ((now or datetime.now()) - EPOCH).days
+    dated = content_days != UNDATED
+    factors = np.zeros(content_days.shape, dtype=np.float64)
+    factors[dated] = 1.0 / (1.0 + (today - content_days[dated]) / 365.0)
+    return factors
+
+
+def top_k_indices(scores: np.ndarray, k: int, mask: Optional[np.ndarray] = None) -> np.ndarray:
+    """Indices of the k highest scores in descending order.
+
+    Uses argpartition so only the selected candidates are sorted. Ties keep
+    corpus order, matching a stable sort on the full list.
+    """
+    if mask is not None:
+        scores = np.where(mask, scores, -np.inf)
+    if k <= 0 or scores.size == 0:
+        return np.empty(0, dtype=np.int64)
+
+    if scores.size > k:
+        top = np.argpartition(-scores, k - 1)[:k]
+        # Include every candidate tied with the k-th score so tie-breaking stays stable
+        candidates = np.flatnonzero(scores >= scores[top].min())
+    else:
+        candidates = np.arange(scores.size)
+    candidates = candidates[scores[candidates] > -np.inf]
+
+    order = np.lexsort((candidates, -scores[candidates]))
+    return candidates[order][:k]
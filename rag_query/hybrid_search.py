@@ -1,14 +1,23 @@
 import warnings
-import re
+import threading
 from typing import List, Optional, Dict, Any
 from pathlib import Path
+import numpy as np
+from colorama import Fore, Style
 from rank_bm25 import BM25Okapi
 
 from data_ingestion.embeddings import EmbeddingProvider
 from data_ingestion.vector_store import VectorStore
+from rag_query import fusion, index_store
+from rag_query.bm25_index import BM25Index, tokenize
+from rag_query.incremental_index import ExtendableSequence, IncrementalBM25Index
+from rag_query.metadata_columns import MetadataColumns
 
 warnings.filterwarnings("ignore")
 
+# Upper bound on cells in one block of the batched keyword score matrix
+_SCORE_BLOCK_CELLS = 4_000_000
+
 class RAG:
     def __init__(
         self,
@@ -17,7 +26,10 @@ class RAG:
         embedding_model: str = "voyage-large-2",
         persist_directory: Optional[str] = None,
         use_cloud: bool = True,  # Default to cloud
-        use_reranker: bool = False
+        use_reranker: bool = False,
+        bm25_backend: str = "rank_bm25",
+        bm25_pruning: bool = False,
+        bm25_index_dir: Optional[str] = None
     ):
         if persist_directory is None:
             project_root = Path(__file__).parent.parent
@@ -25,6 +37,19 @@ class RAG:
         self.collection_name = collection_name
         self.use_reranker = use_reranker
         
+        if bm25_backend not in ("rank_bm25", "inverted"):
+            raise ValueError(
+                f"Unsupported BM25 backend: {bm25_backend}. "
+                f"Supported backends: 'rank_bm25', 'inverted'"
+            )
+        self.bm25_backend = bm25_backend
+        if bm25_pruning and bm25_backend != "inverted":
+            raise ValueError("bm25_pruning requires bm25_backend='inverted'")
+        self.bm25_pruning = bm25_pruning
+        if bm25_index_dir and bm25_backend != "inverted":
+            raise ValueError("bm25_index_dir requires bm25_backend='inverted'")
+        self.bm25_index_dir = bm25_index_dir
+        
         self.embedding_provider = EmbeddingProvider(
             provider=embedding_provider,
             model=embedding_model
@@ -44,17 +69,254 @@ class RAG:
         self._bm25_index = None
         self._documents = None
         self._bm25_data_cache = None  # Cache the data to avoid multiple view_data() calls
+        self._position_by_id = {}
+        self._id_overlay = {}
+        self._columns = None  # Parsed content dates, file names and sources
+        self._index_lock = threading.RLock()
+        
+        # Keep the keyword index in sync with writes to this collection
+        self.vector_store.add_change_listener(self)
     
     def _build_bm25_index(self):
-        """Build BM25 index from documents in vector store. Caches data to avoid redundant calls."""
+        """Build BM25 index from documents in vector store. Caches data to avoid redundant calls.
+        
+        When bm25_index_dir holds a saved index of the current collection it is memory-mapped instead.
+        """
         if self._bm25_index is None or self._bm25_data_cache is None:
-            data = self.vector_store.view_data()
-            self._bm25_data_cache = data  # Cache the data
+            if self.bm25_index_dir and index_store.index_exists(self.bm25_index_dir) and self._saved_index_current():
+                self._bm25_index, data, self._columns, id_lookup = index_store.load_index(self.bm25_index_dir)
+                self._bm25_data_cache = data
+                self._documents = data["documents"]
+                self._index_corpus(id_lookup)
+            else:
+                self.rebuild_bm25_index()
+    
+    def _saved_index_current(self) -> bool:
+        """Whether the saved index was built from this collection as it is now.
+        
+        Chunks written or deleted since the build, e.g. by the ingestion script or another worker,
+        would be missing from keyword search (and their vector hits dropped) or come back as stale
+        keyword hits, so such an index is rebuilt instead. The count is compared first; when it
+        matches, the chunk ids are streamed and hashed, which catches chunks replaced one for one.
+        """
+        saved = index_store.read_meta(self.bm25_index_dir).get("collection") or {}
+        count = self.vector_store.get_collection().count()
+        if saved.get("key") != self.vector_store.collection_key:
+            reason = "built from another collection"
+        elif saved.get("count") != count:
+            reason = f"{saved.get('count')} chunks indexed, {count} in the collection"
+        else:
+            ids = (doc_id for page in self.vector_store.iter_data(include=()) for doc_id in page["ids"])
+            if saved.get("ids_sha256") == index_store.ids_fingerprint(ids):
+                return True
+            reason = "chunks replaced since the build"
+        print(
+            f"{Fore.YELLOW}Warning: saved BM25 index in {self.bm25_index_dir} is out of date "
+            f"({reason}); rebuilding{Style.RESET_ALL}"
+        )
+        return False
+    
+    def rebuild_bm25_index(self):
+        """Rebuild the BM25 index from the vector store and save it when bm25_index_dir is set."""
+        data = {"ids": [], "documents": [], "metadatas": []}
+        tokenized_docs = []
+        # Stream the collection in pages instead of one response holding every chunk
+        for page in self.vector_store.iter_data(include=("documents", "metadatas")):
+            documents = page.get("documents") or []
+            data["ids"].extend(page["ids"])
+            data["documents"].extend(documents)
+            data["metadatas"].extend(page.get("metadatas") or [{}] * len(documents))
+            tokenized_docs.extend(tokenize(doc) for doc in documents)
+        self._bm25_data_cache = data  # Cache the data
+        documents = data["documents"]
+        self._documents = documents
+        
+        if self.bm25_backend == "inverted":
+            self._bm25_index = BM25Index(tokenized_docs)
+        else:
+            self._bm25_index = BM25Okapi(tokenized_docs)
+        self._columns = MetadataColumns.from_metadatas(data.get("metadatas") or [{}] * len(documents))
+        
+        if self.bm25_index_dir:
+            index_store.save_index(
+                self.bm25_index_dir, self._bm25_index, data, self._columns, self.vector_store.collection_key
+            )
+        self._index_corpus()
+    
+    def _index_corpus(self, id_lookup=None):
+        """Map chunk ids to dense corpus positions, used to join vector hits."""
+        if id_lookup is None:
+            id_lookup = {doc_id: position for position, doc_id in enumerate(self._bm25_data_cache.get("ids", []))}
+        self._position_by_id = id_lookup
+        self._id_overlay = {}  # Positions of ids added or deleted since the build (None when deleted)
+    
+    def _position_of(self, doc_id: str) -> Optional[int]:
+        """Corpus position of a chunk id, or None when it is not indexed or was deleted."""
+        if doc_id in self._id_overlay:
+            return self._id_overlay[doc_id]
+        return self._position_by_id.get(doc_id)
+    
+    def _make_incremental(self) -> bool:
+        """Switch the keyword index and corpus to their appendable forms. False for rank_bm25."""
+        if isinstance(self._bm25_index, BM25Index):
+            self._bm25_index = IncrementalBM25Index(self._bm25_index)
+        if not isinstance(self._bm25_index, IncrementalBM25Index):
+            return False
+        data = self._bm25_data_cache
+        if not isinstance(data.get("ids"), ExtendableSequence):
             documents = data.get("documents", [])
-            self._documents = documents
+            data["ids"] = ExtendableSequence(data.get("ids", []))
+            data["documents"] = self._documents = ExtendableSequence(documents)
+            data["metadatas"] = ExtendableSequence(data.get("metadatas") or [{}] * len(documents))
+        return True
+    
+    def on_documents_added(self, ids: List[str], texts: List[str], metadatas: List[dict]):
+        """Add newly written chunks to the keyword index without a rebuild."""
+        with self._index_lock:
+            if self._bm25_index is None:
+                return  # The first query builds the index from the store
+            if not self._make_incremental():
+                self._bm25_index = None  # rank_bm25 cannot be updated; rebuild on next query
+                return
             
-            tokenized_docs = [re.findall(r'\w+', doc.lower()) for doc in documents]
-            self._bm25_index = BM25Okapi(tokenized_docs)
+            # Re-added ids replace their previous version
+            self.on_documents_deleted(ids)
+            data = self._bm25_data_cache
+            data["ids"].extend(ids)
+            data["documents"].extend(texts)
+            data["metadatas"].extend(metadatas)
+            self._columns.extend(metadatas)
+            positions = self._bm25_index.add_documents([tokenize(text) for text in texts])
+            self._id_overlay.update(zip(ids, positions.tolist()))
+    
+    def on_documents_deleted(self, ids: List[str]):
+        """Remove deleted chunks from the keyword index without a rebuild."""
+        with self._index_lock:
+            if self._bm25_index is None:
+                return
+            if not self._make_incremental():
+                self._bm25_index = None
+                return
+            
+            removed = {}
+            for doc_id in ids:
+                position = self._position_of(doc_id)
+                if position is not None:
+                    removed[doc_id] = position
+            if not removed:
+                return
+            positions = list(removed.values())
+            self._bm25_index.remove_documents(
+                positions,
+                [tokenize(self._documents[position]) for position in positions]
+            )
+            self._id_overlay.update(dict.fromkeys(removed))
+    
+    def _keyword_scores(self, tokenized_queries: List[List[str]], positions: Optional[np.ndarray] = None) -> np.ndarray:
+        """BM25 scores of several queries, one row each, over the corpus or only the given positions."""
+        if isinstance(self._bm25_index, BM25Okapi):
+            if positions is None:
+                rows = [self._bm25_index.get_scores(query) for query in tokenized_queries]
+            else:
+                rows = [self._bm25_index.get_batch_scores(query, positions.tolist()) for query in tokenized_queries]
+            return np.asarray(rows, dtype=np.float64).reshape(len(tokenized_queries), -1)
+        return self._bm25_index.score_batch(tokenized_queries, positions)
+    
+    def _pruned_fused_scores(
+        self,
+        tokenized_query: List[str],
+        k: int,
+        top_n: int,
+        distances: np.ndarray,
+        hit_positions: np.ndarray,
+        live: Optional[np.ndarray],
+        recency: Optional[np.ndarray],
+        alpha: float
+    ):
+        """Fused scores of the documents that can reach the fused top_n, and the mask of those scored.
+        
+        The keyword top k and the vector hits are scored exactly. Any other document has no vector
+        score and at most the k-th keyword score, so its fused score is bounded by that plus its own
+        recency; those whose bound still reaches the top_n-th exact score are scored as well, which
+        makes the ranking over the mask equal to exhaustive scoring. Returns None when the bound does
+        not apply: the lowest keyword score of the corpus is not known to be 0, fewer than top_n
+        documents were scored, or (without recency) every unscored document could tie.
+        """
+        size = distances.size
+        live_count = size if live is None else int(np.count_nonzero(live))
+        matched_bound, positive = self._bm25_index.match_bound(tokenized_query)
+        if not positive or matched_bound >= live_count:
+            # Every live document may match, so the minimum used to normalize is unknown
+            return None
+        
+        keyword_positions, keyword_scores = self._bm25_index.top_k(tokenized_query, k)
+        bm25_scores = np.zeros(size, dtype=np.float64)
+        bm25_scores[hit_positions] = self._bm25_index.score_documents(tokenized_query, hit_positions)
+        bm25_scores[keyword_positions] = keyword_scores
+        scored = np.zeros(size, dtype=bool)
+        scored[keyword_positions] = True
+        scored[hit_positions] = True
+        if live is not None:
+            scored &= live
+        
+        # Some live document matches no term, so the keyword range is [0, top score]
+        high = float(keyword_scores.max()) if keyword_scores.size else 0.0
+        
+        def fuse(keyword: np.ndarray) -> np.ndarray:
+            keyword_norm = keyword / (high + 1e-8) if high > 0 else np.zeros_like(keyword)
+            fused = fusion.hybrid_scores(fusion.normalize_distances(distances), keyword_norm, alpha)
+            return fused if recency is None else 0.7 * fused + 0.3 * recency
+        
+        if keyword_positions.size < k:
+            # Every matching document is in the keyword top k, so all scores are exact
+            return fuse(bm25_scores), live
+        
+        scores = fuse(bm25_scores)
+        values = scores[scored]
+        if values.size < top_n:
+            return None
+        threshold = np.partition(values, values.size - top_n)[values.size - top_n]
+        
+        # Bound of unscored documents: no vector hit, the k-th keyword score and their own recency;
+        # the small slack covers summation order differences between the scoring paths
+        kth = float(keyword_scores.min())
+        bound = fusion.hybrid_scores(0.0, kth / (high + 1e-8) if high > 0 else 0.0, alpha)
+        if recency is None:
+            if bound >= threshold - 1e-9:
+                return None
+            return scores, scored
+        reachable = ~scored & (0.7 * bound + 0.3 * recency >= threshold - 1e-9)
+        if live is not None:
+            reachable &= live
+        extra = np.flatnonzero(reachable)
+        if extra.size > matched_bound:
+            # Probing that many documents costs more than scoring every matching one from its postings
+            matched, matched_scores = self._bm25_index.get_sparse_scores(tokenized_query)
+            bm25_scores = np.zeros(size, dtype=np.float64)
+            bm25_scores[matched] = matched_scores
+            return fuse(bm25_scores), live
+        if extra.size:
+            bm25_scores[extra] = self._bm25_index.score_documents(tokenized_query, extra)
+            scored[extra] = True
+            scores = fuse(bm25_scores)
+        return scores, scored
+    
+    def _date_filter(self, filter: Optional[Dict[str, Any]], window: np.ndarray) -> Optional[Dict[str, Any]]:
+        """Restrict a vector search filter to chunks dated in the window, plus undated chunks.
+        
+        Undated chunks have no content_date to match, but $nin also matches chunks without
+        the field, so excluding the dates outside the window keeps them in the same search.
+        """
+        if self._columns.undated_positions().size == 0:
+            dates = self._columns.distinct_values("content_date", window)
+            date_filter = {"content_date": {"$in": dates}}
+        else:
+            outside = np.setdiff1d(self._columns.date_window(None, None), window, assume_unique=True)
+            dates = self._columns.distinct_values("content_date", outside)
+            date_filter = {"content_date": {"$nin": dates}}
+        if not dates:
+            return filter  # Nothing to exclude, or nothing dated in range and no undated fallbacks
+        return {"$and": [filter, date_filter]} if filter else date_filter
     
     def query(
         self, 
@@ -67,124 +329,189 @@ class RAG:
         recency_boost: bool = True,
         hybrid_alpha: float = 0.5
     ) -> List:
-        from datetime import datetime
+        return self.query_batch(
+            [question],
+            k=k,
+            filter=filter,
+            rerank=rerank,
+            rerank_top_k=rerank_top_k,
+            date_range=date_range,
+            recency_boost=recency_boost,
+            hybrid_alpha=hybrid_alpha
+        )[0]
+    
+    def query_batch(
+        self,
+        questions: List[str],
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None,
+        rerank: bool = False,
+        rerank_top_k: int = 20,
+        date_range: Optional[Dict[str, str]] = None,
+        recency_boost: bool = True,
+        hybrid_alpha: float = 0.5
+    ) -> List[List]:
+        """Run several questions with the same options as query and return one result list per question.
+        
+        All questions are embedded in one request, searched in one vector query, and
+        scored against the keyword index in one pass over the distinct query terms.
+        """
         from langchain_core.documents import Document
         
+        questions = list(questions)
+        if not questions:
+            return []
+        
         # Parse date range
         date_start = date_end = None
         if date_range:
-            try:
-                date_start = datetime.fromisoformat(date_range["start"]) if date_range.get("start") else None
-            except (ValueError, TypeError):
-                pass
-            try:
-                date_end = datetime.fromisoformat(date_range["end"]) if date_range.get("end") else None
-            except (ValueError, TypeError):
-                pass
+            date_start = fusion.to_epoch_day(date_range.get("start"))
+            date_end = fusion.to_epoch_day(date_range.get("end"))
+            date_start = None if date_start == fusion.UNDATED else date_start
+            date_end = None if date_end == fusion.UNDATED else date_end
+        has_date_filter = date_start is not None or date_end is not None
         
         # Need expanded retrieval for date filtering, recency boosting, or reranking
-        needs_filtering = (date_start or date_end) or recency_boost
+        needs_filtering = has_date_filter or recency_boost
         initial_k = max(rerank_top_k if (rerank or self.use_reranker) else k, k * 3 if needs_filtering else k * 2)
         
         # Step 1: Hybrid Search (BM25 + Semantic)
-        # Build BM25 index
-        self._build_bm25_index()
-        
-        # Semantic search (vector similarity)
-        vector_results = self.vector_store.similarity_search_with_score(question, k=initial_k, filter=filter)
-        vector_scores = {doc.page_content: (doc, score) for doc, score in vector_results}
+        vector_filter = filter
+        if has_date_filter:
+            with self._index_lock:
+                self._build_bm25_index()
+                # Undated fallbacks are searched too, so they keep their vector scores
+                vector_filter = self._date_filter(filter, self._columns.date_window(date_start, date_end))
         
-        # BM25 search (keyword matching)
-        tokenized_query = re.findall(r'\w+', question.lower())
-        bm25_scores = self._bm25_index.get_scores(tokenized_query)
+        # Semantic search (vector similarity) runs outside the index lock
+        query_embeddings = self.embedding_provider.embed_queries(questions)
+        vector_results = self.vector_store.similarity_search_ids_by_vectors(
+            query_embeddings, k=initial_k, filter=vector_filter
+        )
         
-        # Use cached data instead of calling view_data() again
-        data = self._bm25_data_cache
-        all_docs = data.get("documents", [])
-        all_ids = data.get("ids", [])
-        all_metadatas = data.get("metadatas", [])
-        
-        # Combine BM25 and semantic scores
-        combined_results = []
-        for idx, (doc_text, doc_id, metadata) in enumerate(zip(all_docs, all_ids, all_metadatas or [{}] * len(all_docs))):
-            # Get vector score
-            vector_doc, vector_score = vector_scores.get(doc_text, (None, float('inf')))
-            if vector_score == float('inf'):
-                vector_score = 0.0
-            
-            # Get BM25 score
-            bm25_score = bm25_scores[idx]
+        batch_results = []
+        with self._index_lock:
+            # Build BM25 index
+            self._build_bm25_index()
             
-            # Normalize scores
-            normalized_vector = 1.0 / (1.0 + vector_score) if vector_score > 0 else 0.0
-            normalized_bm25 = (bm25_score - min(bm25_scores)) / (max(bm25_scores) - min(bm25_scores) + 1e-8) if max(bm25_scores) > min(bm25_scores) else 0.0
+            # Use cached data instead of calling view_data() again
+            data = self._bm25_data_cache
+            all_docs = data.get("documents", [])
+            all_metadatas = data.get("metadatas") or [{}] * len(all_docs)
+            all_ids = data.get("ids", [])
+            size = len(all_docs)
             
-            # Hybrid score: alpha * semantic + (1-alpha) * BM25
-            hybrid_score = hybrid_alpha * normalized_vector + (1 - hybrid_alpha) * normalized_bm25
+            # Deleted chunks stay in the corpus as tombstones until the next rebuild
+            live = getattr(self._bm25_index, "live", None)
+            candidates = None if live is None or live.all() else live.copy()
+            normalize_over = live
             
-            # Use vector doc if available, otherwise create new document
-            doc = vector_doc if vector_doc else Document(page_content=doc_text, metadata=metadata)
-            combined_results.append((doc, hybrid_score))
-        
-        # Sort by hybrid score
-        combined_results.sort(key=lambda x: x[1], reverse=True)
-        
-        # Step 2: Temporal Filtering (if date range provided)
-        if date_start or date_end:
-            filtered = []
-            docs_without_dates = []
-            for doc, score in combined_results:
-                try:
-                    doc_date_str = doc.metadata.get("content_date", "")
-                    if not doc_date_str:
-                        # Document has no date - include it but with lower priority
-                        docs_without_dates.append((doc, score * 0.8))
-                        continue
-                    doc_date = datetime.fromisoformat(doc_date_str)
-                    if (date_start and doc_date < date_start) or (date_end and doc_date > date_end):
-                        continue
-                    filtered.append((doc, score))
-                except (ValueError, TypeError):
-                    # Invalid date format - include it but with lower priority
-                    docs_without_dates.append((doc, score * 0.8))
+            # Step 2: Temporal Filtering (if date range provided)
+            scope = penalized = None
+            in_window, undated = candidates, None
+            if has_date_filter:
+                # Date-sorted index: only chunks in the window (and undated fallbacks) are scored
+                window = self._columns.date_window(date_start, date_end)
+                undated_positions = self._columns.undated_positions()
+                scope = np.union1d(window, undated_positions)
+                in_scope = np.zeros(size, dtype=bool)
+                in_scope[scope] = True
+                candidates = in_scope if candidates is None else candidates & in_scope
+                normalize_over = candidates
+                
+                in_window = np.zeros(size, dtype=bool)
+                in_window[window] = True
+                undated = np.zeros(size, dtype=bool)
+                undated[undated_positions] = True
+                in_window &= candidates
+                undated &= candidates
+                # Documents without dates are kept with lower priority
+                penalized = undated
+                if not in_window.any():
+                    in_window = undated
+                    undated = None
             
-            # If date filtering resulted in no results, include documents without dates
-            if not filtered and docs_without_dates:
-                filtered = docs_without_dates
-            # Otherwise, append documents without dates at the end (lower priority)
-            elif filtered and docs_without_dates:
-                filtered.extend(docs_without_dates)
+            recency = fusion.recency_factors(self._columns.content_days) if recency_boost else None
+            top_n = rerank_top_k if (rerank or self.use_reranker) else k
+            pruning = self.bm25_pruning and scope is None
             
-            combined_results = filtered
+            tokenized_queries = [tokenize(question) for question in questions]
+            # Keyword scores are computed for blocks of questions to bound the score matrix size
+            block_size = max(1, _SCORE_BLOCK_CELLS // max(size, 1))
+            for block_start in range(0, len(questions), block_size):
+                block = tokenized_queries[block_start:block_start + block_size]
+                if pruning:
+                    keyword_rows = None
+                elif scope is not None:
+                    keyword_rows = np.zeros((len(block), size), dtype=np.float64)
+                    keyword_rows[:, scope] = self._keyword_scores(block, scope)
+                else:
+                    keyword_rows = self._keyword_scores(block)
                 
-        if recency_boost:
-            boosted_results = []
-            for doc, hybrid_score in combined_results:
-                recency = 0.0
-                if doc.metadata.get("content_date"):
-                    try:
-                        days_ago = (datetime.now() - datetime.fromisoformat(doc.metadata["content_date"])).days
-                        recency = 1.0 / (1.0 + days_ago / 365.0)
-                    except (ValueError, TypeError):
-                        pass
-                
-                # Combine hybrid score (70%) and recency (30%)
-                final_score = 0.7 * hybrid_score + 0.3 * recency
-                boosted_results.append((doc, final_score))
-            
-            combined_results = boosted_results
-            combined_results.sort(key=lambda x: x[1], reverse=True)
-        
-        # Take top k before reranking
-        results = [doc for doc, _ in combined_results[:rerank_top_k if (rerank or self.use_reranker) else k]]
+                for row, tokenized_query in enumerate(block):
+                    # Join vector hits to corpus positions by chunk id
+                    distances = np.zeros(size, dtype=np.float64)
+                    hit_positions = []
+                    for doc_id, score in vector_results[block_start + row]:
+                        position = self._position_of(doc_id)
+                        if position is not None:
+                            distances[position] = score
+                            hit_positions.append(position)
+                    
+                    pruned = None
+                    if pruning:
+                        # Only documents that can reach the top are scored; same ranking as exhaustive scoring
+                        pruned = self._pruned_fused_scores(
+                            tokenized_query, initial_k, top_n, distances,
+                            np.asarray(hit_positions, dtype=np.int64), candidates, recency, hybrid_alpha
+                        )
+                    if pruned is not None:
+                        scores, eligible = pruned
+                        top_indices = fusion.top_k_indices(scores, top_n, eligible)
+                    else:
+                        # Exhaustive scoring, also the fallback when pruning cannot bound the ranking
+                        bm25_scores = keyword_rows[row] if keyword_rows is not None else (
+                            self._keyword_scores([tokenized_query])[0]
+                        )
+                        eligible = in_window
+                        # Combine BM25 and semantic scores in one pass
+                        scores = fusion.hybrid_scores(
+                            fusion.normalize_distances(distances),
+                            fusion.min_max_normalize(bm25_scores, normalize_over),
+                            hybrid_alpha
+                        )
+                        if penalized is not None:
+                            scores = np.where(penalized, scores * 0.8, scores)
+                        
+                        if recency_boost:
+                            # Combine hybrid score (70%) and recency (30%)
+                            scores = 0.7 * scores + 0.3 * recency
+                            if undated is not None:
+                                eligible = eligible | undated
+                            top_indices = fusion.top_k_indices(scores, top_n, eligible)
+                        else:
+                            top_indices = fusion.top_k_indices(scores, top_n, eligible)
+                            if undated is not None and len(top_indices) < top_n:
+                                # Documents without dates go after the dated matches
+                                top_indices = np.concatenate([
+                                    top_indices,
+                                    fusion.top_k_indices(scores, top_n - len(top_indices), undated)
+                                ])
+                    
+                    # Take top k before reranking
+                    batch_results.append([
+                        Document(page_content=all_docs[idx], metadata=all_metadatas[idx] or {}, id=all_ids[idx])
+                        for idx in top_indices.tolist()
+                    ])
         
         # Step 4: Reranking (if enabled)
-        if rerank and self.use_reranker:
-            results = self.reranker.rerank(question, results, top_k=k)
-        elif len(results) > k:
-            results = results[:k]
+        for i, (question, results) in enumerate(zip(questions, batch_results)):
+            if rerank and self.use_reranker:
+                batch_results[i] = self.reranker.rerank(question, results, top_k=k)
+            elif len(results) > k:
+                batch_results[i] = results[:k]
         
-        return results
+        return batch_results
     
     def query_with_scores(self, question: str, k: int = 4, filter: Optional[Dict[str, Any]] = None) -> List:
         return self.vector_store.similarity_search_with_score(
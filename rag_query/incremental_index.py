@@ -0,0 +1,304 @@
+# Incremental BM25 index (base index plus appended segments)
+
+import threading
+from collections import Counter
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+
+from rag_query.bm25_index import BM25Index, batch_scores, max_score_top_k
+
+
+class ExtendableSequence(Sequence):
+    """Read-only base sequence (e.g. a memory-mapped string table) followed by appended items."""
+
+    def __init__(self, base: Sequence):
+        self.base = base
+        self.extra = []
+
+    def append(self, item):
+        self.extra.append(item)
+
+    def extend(self, items):
+        self.extra.extend(items)
+
+    def __len__(self) -> int:
+        return len(self.base) + len(self.extra)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if i < len(self.base):
+            return self.base[i]
+        return self.extra[i - len(self.base)]
+
+
+class IncrementalBM25Index:
+    """BM25 index that supports adding and deleting documents without a rebuild.
+
+    Works like a small LSM tree. The base index (possibly memory-mapped) stays
+    immutable. Each add_documents batch becomes a new segment whose doc ids
+    continue after the last position, so positions never move. Deleted
+    documents are tombstoned: their length norm is set to infinity, which
+    makes every contribution 0. Document frequencies and avgdl are tracked
+    logically, so scores match a BM25Okapi rebuilt over the live documents.
+    Once there are more than max_segments appended segments, they are merged
+    in a background thread. The merge drops postings of deleted documents.
+    """
+
+    def __init__(
+        self,
+        base: Optional[BM25Index] = None,
+        k1: float = 1.5,
+        b: float = 0.75,
+        epsilon: float = 0.25,
+        max_segments: int = 4,
+        background_merge: bool = True
+    ):
+        if base is not None:
+            k1, b, epsilon = base.k1, base.b, base.epsilon
+        self.k1 = k1
+        self.b = b
+        self.epsilon = epsilon
+        self.max_segments = max_segments
+        self.background_merge = background_merge
+
+        self._base = base
+        self._segments: List[BM25Index] = []
+        self.doc_lengths = np.array(base.doc_lengths if base is not None else [], dtype=np.int32)
+        self.live = np.ones(len(self.doc_lengths), dtype=bool)
+        # Document frequency changes relative to the base index, per term
+        self._df_delta: Counter = Counter()
+
+        self._lock = threading.RLock()
+        self._merge_thread: Optional[threading.Thread] = None
+        self._dirty = True
+        self.avgdl = 0.0
+
+    @property
+    def corpus_size(self) -> int:
+        """Number of positions, including deleted ones."""
+        return len(self.doc_lengths)
+
+    @property
+    def live_count(self) -> int:
+        return int(self.live.sum())
+
+    @property
+    def segments(self) -> List[BM25Index]:
+        return ([self._base] if self._base is not None else []) + self._segments
+
+    def add_documents(self, tokenized_docs: List[List[str]]) -> np.ndarray:
+        """Append documents and return their positions."""
+        segment = BM25Index(tokenized_docs, k1=self.k1, b=self.b, epsilon=self.epsilon)
+        with self._lock:
+            start = self.corpus_size
+            segment.postings_docs = segment.postings_docs + start
+            segment.doc_lengths = None  # Lengths live in the global array
+            for term, term_id in segment.vocabulary.items():
+                self._df_delta[term] += segment.posting_size(term_id)
+
+            lengths = np.fromiter((len(tokens) for tokens in tokenized_docs), dtype=np.int32, count=len(tokenized_docs))
+            self.doc_lengths = np.concatenate([self.doc_lengths, lengths])
+            self.live = np.concatenate([self.live, np.ones(len(lengths), dtype=bool)])
+            self._segments = self._segments + [segment]
+            self._dirty = True
+            positions = np.arange(start, self.corpus_size)
+
+        if len(self._segments) > self.max_segments:
+            self._schedule_merge()
+        return positions
+
+    def remove_documents(self, positions: Sequence[int], tokenized_docs: Sequence[List[str]]):
+        """Tombstone documents. tokenized_docs are their tokens, used to update document frequencies."""
+        with self._lock:
+            for position, tokens in zip(positions, tokenized_docs):
+                if not self.live[position]:
+                    continue
+                self.live[position] = False
+                for term in set(tokens):
+                    self._df_delta[term] -= 1
+            self._dirty = True
+
+    def _refresh(self):
+        """Recompute avgdl, idf, length norms and upper bounds after a change."""
+        with self._lock:
+            if not self._dirty:
+                return
+            live_count = self.live_count
+            total_length = float(self.doc_lengths[self.live].sum())
+            self.avgdl = total_length / live_count if live_count else 0.0
+            length_norms = self.k1 * (1 - self.b + self.b * self.doc_lengths / (self.avgdl or 1.0))
+            length_norms[~self.live] = np.inf
+
+            # Live document frequency of every term: base counts plus tracked deltas
+            base_df = np.zeros(0, dtype=np.float64)
+            extra_terms, extra_df = [], []
+            if self._base is not None:
+                base_df = np.diff(self._base.postings_offsets).astype(np.float64)
+            for term, delta in self._df_delta.items():
+                term_id = self._base.vocabulary.get(term) if self._base is not None else None
+                if term_id is not None:
+                    base_df[term_id] += delta
+                else:
+                    extra_terms.append(term)
+                    extra_df.append(delta)
+            extra_df = np.asarray(extra_df, dtype=np.float64)
+
+            def idf_of(df):
+                return np.log(live_count - df + 0.5) - np.log(df + 0.5)
+
+            base_idf, extra_idf = idf_of(base_df), idf_of(extra_df)
+            present = np.concatenate([base_idf[base_df > 0], extra_idf[extra_df > 0]])
+            # Same floor as BM25Okapi for terms present in most documents
+            floor = self.epsilon * present.mean() if present.size else 0.0
+            base_idf[base_idf < 0] = floor
+            extra_idf[extra_idf < 0] = floor
+            idf_by_term: Dict[str, float] = dict(zip(extra_terms, extra_idf.tolist()))
+
+            for segment in self.segments:
+                if segment is self._base:
+                    segment_idf = base_idf
+                else:
+                    segment_idf = np.empty(len(segment.vocabulary), dtype=np.float64)
+                    for term, term_id in segment.vocabulary.items():
+                        base_id = self._base.vocabulary.get(term) if self._base is not None else None
+                        segment_idf[term_id] = base_idf[base_id] if base_id is not None else idf_by_term[term]
+                segment.idf = segment_idf
+                segment.length_norms = length_norms
+                segment.avgdl = self.avgdl
+                segment.compute_upper_bounds()
+
+            self._dirty = False
+
+    def _snapshot(self) -> Tuple[List[BM25Index], int]:
+        """Refreshed segments and the doc id space size, taken together under the lock.
+
+        A merge may publish its segment between a refresh and a later read, and that
+        segment has no idf or length norms until the next refresh.
+        """
+        with self._lock:
+            self._refresh()
+            return self.segments, self.corpus_size
+
+    def _query_sources(self, query: List[str]) -> Tuple[List[Tuple[BM25Index, int, int]], int]:
+        """(segment, term_id, count) posting sources for the query, and the doc id space size."""
+        segments, doc_space = self._snapshot()
+        counts = Counter(query)
+        sources = []
+        for segment in segments:
+            for token, count in counts.items():
+                term_id = segment.vocabulary.get(token)
+                if term_id is not None:
+                    sources.append((segment, int(term_id), count))
+        return sources, doc_space
+
+    def get_scores(self, query: List[str]) -> np.ndarray:
+        """Dense score array over all positions; deleted documents score 0."""
+        sources, doc_space = self._query_sources(query)
+        scores = np.zeros(doc_space, dtype=np.float64)
+        for segment, term_id, count in sources:
+            docs, weights = segment.term_scores(term_id)
+            scores[docs] += weights * count
+        return scores
+
+    def get_sparse_scores(self, query: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """Positions (ascending) and scores of live documents matching at least one query term."""
+        sources, doc_space = self._query_sources(query)
+        scores = np.zeros(doc_space, dtype=np.float64)
+        matched = np.zeros(doc_space, dtype=bool)
+        for segment, term_id, count in sources:
+            docs, weights = segment.term_scores(term_id)
+            scores[docs] += weights * count
+            matched[docs] = True
+        docs = np.flatnonzero(matched & self.live[:doc_space])
+        return docs, scores[docs]
+
+    def score_documents(self, query: List[str], doc_ids: np.ndarray) -> np.ndarray:
+        """Exact scores for the given positions."""
+        sources, _ = self._query_sources(query)
+        doc_ids = np.asarray(doc_ids, dtype=np.int64)
+        order = np.argsort(doc_ids, kind="stable")
+        sorted_ids = doc_ids[order]
+        scores = np.zeros(doc_ids.size, dtype=np.float64)
+        for segment, term_id, count in sources:
+            scores[order] += segment._probe(term_id, sorted_ids) * count
+        return scores
+
+    def score_batch(self, queries: List[List[str]], doc_ids: Optional[np.ndarray] = None) -> np.ndarray:
+        """Scores of several queries at once, one row per query; deleted documents score 0."""
+        segments, doc_space = self._snapshot()
+        return batch_scores(segments, queries, doc_space, doc_ids)
+
+    def match_bound(self, query: List[str]) -> Tuple[int, bool]:
+        """Upper bound on the number of documents matching query, deleted ones included, and
+        whether all its terms have positive idf (see BM25Index.match_bound)."""
+        sources, _ = self._query_sources(query)
+        return (
+            sum(segment.posting_size(term_id) for segment, term_id, _ in sources),
+            all(segment.idf[term_id] > 0 for segment, term_id, _ in sources)
+        )
+
+    def top_k(self, query: List[str], k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Positions and scores of the k best live documents, using MaxScore pruning."""
+        sources, doc_space = self._query_sources(query)
+        return max_score_top_k(sources, k, doc_space)
+
+    def _schedule_merge(self):
+        if not self.background_merge:
+            self.merge()
+            return
+        with self._lock:
+            if self._merge_thread is not None and self._merge_thread.is_alive():
+                return
+            self._merge_thread = threading.Thread(target=self.merge, daemon=True)
+            self._merge_thread.start()
+
+    def merge(self):
+        """Merge all appended segments into one, dropping postings of deleted documents."""
+        with self._lock:
+            segments = list(self._segments)
+            live = self.live.copy()
+        if len(segments) < 2:
+            return
+
+        # Segments cover increasing position ranges, so a stable sort by term keeps doc ids ascending
+        terms = sorted(set().union(*(segment.vocabulary for segment in segments)))
+        merged_ids = {term: term_id for term_id, term in enumerate(terms)}
+        term_ids, docs, freqs = [], [], []
+        for segment in segments:
+            local_to_merged = np.empty(len(segment.vocabulary), dtype=np.int64)
+            for term, term_id in segment.vocabulary.items():
+                local_to_merged[term_id] = merged_ids[term]
+            term_ids.append(np.repeat(local_to_merged, np.diff(segment.postings_offsets)))
+            docs.append(segment.postings_docs)
+            freqs.append(segment.postings_freqs)
+        term_ids, docs, freqs = np.concatenate(term_ids), np.concatenate(docs), np.concatenate(freqs)
+
+        keep = live[docs]
+        term_ids, docs, freqs = term_ids[keep], docs[keep], freqs[keep]
+        order = np.argsort(term_ids, kind="stable")
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(term_ids, minlength=len(terms)), out=offsets[1:])
+
+        merged = BM25Index.from_arrays(
+            vocabulary=merged_ids,
+            doc_lengths=None,
+            postings_docs=docs[order],
+            postings_freqs=freqs[order],
+            postings_offsets=offsets,
+            idf=np.zeros(len(terms), dtype=np.float64),
+            length_norms=None,
+            upper_bounds=np.zeros(len(terms), dtype=np.float64),
+            avgdl=0.0,
+            k1=self.k1,
+            b=self.b,
+            epsilon=self.epsilon
+        )
+
+        with self._lock:
+            # Segments appended while merging stay after the merged one
+            if self._segments[:len(segments)] == segments:
+                self._segments = [merged] + self._segments[len(segments):]
+                self._dirty = True
@@ -0,0 +1,242 @@
+# On-disk keyword index format
+#
+# An index directory holds flat .npy arrays that are opened with mmap, so a cold
+# start only maps files and several processes share the pages through the OS cache:
+#
+#   meta.json                      format version, BM25 parameters, corpus stats and the
+#                                  collection key, chunk count and chunk id hash the index was built from
+#   postings_docs.npy              doc ids of all postings, grouped by term
+#   postings_freqs.npy             term frequencies aligned with postings_docs
+#   postings_offsets.npy           start of each term's postings (vocabulary_size + 1)
+#   doc_lengths.npy                token count per document
+#   idf.npy, length_norms.npy, upper_bounds.npy
+#   content_days.npy               content_date as int64 epoch days (int64 min when undated)
+#   file_name_codes.npy, source_codes.npy, content_date_codes.npy, categories.json
+#                                  dictionary-encoded file_name, source and content_date columns
+#   date_order.npy, sorted_days.npy
+#                                  positions sorted by content day, for date range lookups
+#   <table>.blob.npy / <table>.offsets.npy
+#                                  string tables: terms (sorted), ids, documents, metadatas (JSON)
+#   ids_order.npy                  positions sorted by chunk id, for id -> position lookup
+
+import hashlib
+import json
+import os
+import shutil
+import uuid
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, Optional, Sequence, Tuple, Union
+import numpy as np
+
+from rag_query.bm25_index import BM25Index
+from rag_query.metadata_columns import MetadataColumns
+
+FORMAT_VERSION = 4
+
+_INDEX_ARRAYS = (
+    "postings_docs", "postings_freqs", "postings_offsets",
+    "doc_lengths", "idf", "length_norms", "upper_bounds"
+)
+
+
+class StringTable(Sequence):
+    """Read-only sequence of strings stored as one UTF-8 blob plus offsets."""
+
+    def __init__(self, blob: np.ndarray, offsets: np.ndarray):
+        self.blob = blob
+        self.offsets = offsets
+
+    @classmethod
+    def open(cls, directory: Union[str, Path], name: str) -> "StringTable":
+        directory = Path(directory)
+        return cls(
+            np.load(directory / f"{name}.blob.npy", mmap_mode="r"),
+            np.load(directory / f"{name}.offsets.npy", mmap_mode="r")
+        )
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("string table index out of range")
+        return self.blob[self.offsets[i]:self.offsets[i + 1]].tobytes().decode("utf-8")
+
+    def __iter__(self) -> Iterator[str]:
+        for i in range(len(self)):
+            yield self[i]
+
+
+class JsonTable(StringTable):
+    """String table whose entries are JSON documents, decoded on access."""
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        return json.loads(super().__getitem__(i))
+
+
+class SortedKeys:
+    """Key -> position lookup over a string table using binary search.
+
+    order lists table positions in ascending key order; None means the table
+    itself is sorted.
+    """
+
+    def __init__(self, keys: StringTable, order: Optional[np.ndarray] = None):
+        self.keys = keys
+        self.order = order
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def __iter__(self) -> Iterator[str]:
+        for i in range(len(self.keys)):
+            yield self._key_at(i)
+
+    def _key_at(self, rank: int) -> str:
+        return self.keys[int(self.order[rank]) if self.order is not None else rank]
+
+    def get(self, key: str, default: Optional[int] = None) -> Optional[int]:
+        low, high = 0, len(self.keys)
+        while low < high:
+            mid = (low + high) // 2
+            if self._key_at(mid) < key:
+                low = mid + 1
+            else:
+                high = mid
+        if low < len(self.keys) and self._key_at(low) == key:
+            return int(self.order[low]) if self.order is not None else low
+        return default
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key) is not None
+
+
+def write_string_table(directory: Path, name: str, strings: Iterable[str]):
+    """Write strings as a UTF-8 blob and an offsets array."""
+    encoded = [value.encode("utf-8") for value in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(value) for value in encoded], out=offsets[1:])
+    np.save(directory / f"{name}.blob.npy", np.frombuffer(b"".join(encoded), dtype=np.uint8))
+    np.save(directory / f"{name}.offsets.npy", offsets)
+
+
+def ids_fingerprint(ids: Iterable[str]) -> str:
+    """Hash of a set of chunk ids, independent of their order.
+
+    Chunk ids are derived from content, so replacing chunks changes it even when the count stays the same.
+    """
+    digest = hashlib.sha256()
+    for doc_id in sorted(ids):
+        digest.update(doc_id.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def save_index(
+    directory: Union[str, Path],
+    index: BM25Index,
+    data: Dict[str, Any],
+    columns: MetadataColumns,
+    collection_key: Optional[str] = None
+):
+    """Write a BM25 index and its corpus (ids, documents, metadatas) to directory.
+
+    Files are written to a temporary sibling directory which then replaces the
+    target, so readers never see a half-written index.
+    """
+    directory = Path(directory)
+    directory.parent.mkdir(parents=True, exist_ok=True)
+    staging = directory.with_name(f"{directory.name}.tmp-{uuid.uuid4().hex}")
+    staging.mkdir()
+
+    try:
+        for name in _INDEX_ARRAYS:
+            np.save(staging / f"{name}.npy", np.asarray(getattr(index, name)))
+        columns.save(staging)
+
+        write_string_table(staging, "terms", sorted(index.vocabulary))
+        documents = data.get("documents", [])
+        ids = list(data.get("ids", []))
+        write_string_table(staging, "ids", ids)
+        np.save(staging / "ids_order.npy", np.asarray(sorted(range(len(ids)), key=ids.__getitem__), dtype=np.int64))
+        write_string_table(staging, "documents", documents)
+        write_string_table(
+            staging,
+            "metadatas",
+            (json.dumps(meta or {}) for meta in (data.get("metadatas") or [{}] * len(documents)))
+        )
+
+        meta = {
+            "format_version": FORMAT_VERSION,
+            "k1": index.k1,
+            "b": index.b,
+            "epsilon": index.epsilon,
+            "avgdl": index.avgdl,
+            "corpus_size": index.corpus_size,
+            "vocabulary_size": len(index.vocabulary),
+            # Lets readers notice writes made since the build, e.g. by other processes
+            "collection": {"key": collection_key, "count": len(ids), "ids_sha256": ids_fingerprint(ids)}
+        }
+        with open(staging / "meta.json", "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+
+        previous = None
+        if directory.exists():
+            previous = directory.with_name(f"{directory.name}.old-{uuid.uuid4().hex}")
+            os.rename(directory, previous)
+        os.rename(staging, directory)
+        if previous is not None:
+            # Processes that still map the old files keep them until they unmap
+            shutil.rmtree(previous, ignore_errors=True)
+    except Exception:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+
+def index_exists(directory: Union[str, Path]) -> bool:
+    return (Path(directory) / "meta.json").exists()
+
+
+def read_meta(directory: Union[str, Path]) -> Dict[str, Any]:
+    with open(Path(directory) / "meta.json", "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def load_index(directory: Union[str, Path]) -> Tuple[BM25Index, Dict[str, Any], MetadataColumns, SortedKeys]:
+    """Open an index written by save_index.
+
+    Returns the BM25 index, a view_data()-shaped dict of lazy ids, documents
+    and metadatas, the metadata columns and a chunk id -> position lookup.
+    Nothing is decoded up front.
+    """
+    directory = Path(directory)
+    meta = read_meta(directory)
+    if meta.get("format_version") != FORMAT_VERSION:
+        raise ValueError(
+            f"Unsupported index format version: {meta.get('format_version')}. "
+            f"Expected: {FORMAT_VERSION}"
+        )
+
+    arrays = {name: np.load(directory / f"{name}.npy", mmap_mode="r") for name in _INDEX_ARRAYS}
+    index = BM25Index.from_arrays(
+        vocabulary=SortedKeys(StringTable.open(directory, "terms")),
+        avgdl=meta["avgdl"],
+        k1=meta["k1"],
+        b=meta["b"],
+        epsilon=meta["epsilon"],
+        **arrays
+    )
+    data = {
+        "ids": StringTable.open(directory, "ids"),
+        "documents": StringTable.open(directory, "documents"),
+        "metadatas": JsonTable.open(directory, "metadatas")
+    }
+    columns = MetadataColumns.load(directory)
+    id_lookup = SortedKeys(data["ids"], np.load(directory / "ids_order.npy", mmap_mode="r"))
+    return index, data, columns, id_lookup
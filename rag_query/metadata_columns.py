@@ -0,0 +1,142 @@
+# Columnar chunk metadata used by hybrid search
+
+import json
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Union
+import numpy as np
+
+from rag_query.fusion import UNDATED, to_epoch_day
+
+# Dictionary-encoded string columns; missing values get code -1
+ENCODED_COLUMNS = ("file_name", "source", "content_date")
+
+
+def _encode(values: Iterable[Optional[str]], categories: List[str], codes_by_value: Dict[str, int]) -> np.ndarray:
+    """Dictionary-encode values, appending unseen ones to categories."""
+    codes = []
+    for value in values:
+        if value is None:
+            codes.append(-1)
+            continue
+        code = codes_by_value.get(value)
+        if code is None:
+            code = codes_by_value[value] = len(categories)
+            categories.append(value)
+        codes.append(code)
+    return np.asarray(codes, dtype=np.int32)
+
+
+class MetadataColumns:
+    """Per-chunk metadata parsed once at index time and stored as arrays.
+
+    content_days holds content_date as int64 days since 1970-01-01 (UNDATED
+    when missing or invalid). file_name, source and the raw content_date
+    string are dictionary-encoded: an int32 code per chunk plus a list of
+    distinct values.
+
+    date_order lists every position sorted by content day. UNDATED is the
+    smallest int64, so undated chunks come first; a date range is then a
+    contiguous slice found by binary search over sorted_days.
+    """
+
+    def __init__(
+        self,
+        content_days: np.ndarray,
+        codes: Dict[str, np.ndarray],
+        categories: Dict[str, List[str]],
+        date_order: Optional[np.ndarray] = None,
+        sorted_days: Optional[np.ndarray] = None
+    ):
+        self.content_days = content_days
+        self.codes = codes
+        self.categories = categories
+        self._date_order = date_order
+        self._sorted_days = sorted_days
+        self._codes_by_value = {
+            column: {value: code for code, value in enumerate(values)}
+            for column, values in categories.items()
+        }
+
+    @classmethod
+    def from_metadatas(cls, metadatas: Sequence[Optional[dict]]) -> "MetadataColumns":
+        columns = cls(
+            np.zeros(0, dtype=np.int64),
+            {column: np.zeros(0, dtype=np.int32) for column in ENCODED_COLUMNS},
+            {column: [] for column in ENCODED_COLUMNS}
+        )
+        columns.extend(metadatas)
+        return columns
+
+    def __len__(self) -> int:
+        return len(self.content_days)
+
+    def extend(self, metadatas: Sequence[Optional[dict]]):
+        """Append the columns of newly indexed chunks."""
+        metadatas = [meta or {} for meta in metadatas]
+        days = np.fromiter(
+            (to_epoch_day(meta.get("content_date")) for meta in metadatas),
+            dtype=np.int64,
+            count=len(metadatas)
+        )
+        self.content_days = np.concatenate([self.content_days, days])
+        for column in ENCODED_COLUMNS:
+            codes = _encode(
+                (meta.get(column) for meta in metadatas),
+                self.categories[column],
+                self._codes_by_value[column]
+            )
+            self.codes[column] = np.concatenate([self.codes[column], codes])
+        self._date_order = self._sorted_days = None
+
+    def _date_index(self):
+        if self._date_order is None:
+            self._date_order = np.argsort(self.content_days, kind="stable")
+            self._sorted_days = np.asarray(self.content_days)[self._date_order]
+        return self._date_order, self._sorted_days
+
+    def date_window(self, start: Optional[int], end: Optional[int]) -> np.ndarray:
+        """Positions (ascending) of dated chunks inside [start, end] (epoch days)."""
+        order, days = self._date_index()
+        low = np.searchsorted(days, UNDATED, side="right")
+        if start is not None:
+            low = max(low, np.searchsorted(days, start, side="left"))
+        high = np.searchsorted(days, end, side="right") if end is not None else len(days)
+        return np.sort(order[low:high])
+
+    def undated_positions(self) -> np.ndarray:
+        """Positions (ascending) of chunks without a valid content date."""
+        order, days = self._date_index()
+        return np.asarray(order[:np.searchsorted(days, UNDATED, side="right")])
+
+    def distinct_values(self, column: str, positions: np.ndarray) -> List[str]:
+        """Distinct non-missing values of an encoded column at the given positions."""
+        codes = np.unique(self.codes[column][positions])
+        return [self.categories[column][code] for code in codes.tolist() if code >= 0]
+
+    def value(self, column: str, position: int) -> Optional[str]:
+        code = int(self.codes[column][position])
+        return self.categories[column][code] if code >= 0 else None
+
+    def save(self, directory: Union[str, Path]):
+        directory = Path(directory)
+        np.save(directory / "content_days.npy", self.content_days)
+        date_order, sorted_days = self._date_index()
+        np.save(directory / "date_order.npy", date_order)
+        np.save(directory / "sorted_days.npy", sorted_days)
+        for column in ENCODED_COLUMNS:
+            np.save(directory / f"{column}_codes.npy", self.codes[column])
+        with open(directory / "categories.json", "w", encoding="utf-8") as f:
+            json.dump(self.categories, f)
+
+    @classmethod
+    def load(cls, directory: Union[str, Path]) -> "MetadataColumns":
+        directory = Path(directory)
+        with open(directory / "categories.json", "r", encoding="utf-8") as f:
+            categories = json.load(f)
+        return cls(
+            np.load(directory / "content_days.npy", mmap_mode="r"),
+            {column: np.load(directory / f"{column}_codes.npy", mmap_mode="r") for column in ENCODED_COLUMNS},
+            categories,
+            np.load(directory / "date_order.npy", mmap_mode="r"),
+            np.load(directory / "sorted_days.npy", mmap_mode="r")
+        )
@@ -1,9 +1,12 @@
 import warnings
+import os
 import time
+from pathlib import Path
 from colorama import Fore, Style
 from typing import List, Optional, Dict, Any
 from datetime import datetime
 from rag_query.hybrid_search import RAG
+from data_ingestion.deduplication import ChunkDeduplicator
 from llm import LLMProvider
 from prompts.rag_query_prompt import get_rag_prompt
 
@@ -27,9 +30,23 @@ class RAGQuerySystem:
             provider=llm_provider,
             model=llm_model
         )
+        
+        # Near-duplicates skipped at ingestion are cited through the chunk stored in their place
+        dedup_path = Path(os.getenv("CHUNK_DEDUP_PATH") or Path(__file__).parent.parent / "chunk_dedup" / "dedup.sqlite")
+        self.deduplicator = None
+        if dedup_path.exists():
+            self.deduplicator = ChunkDeduplicator(dedup_path, self.rag.vector_store.collection_key)
+    
+    def _duplicate_sources(self, chunks) -> Dict[str, List[dict]]:
+        """Other files each retrieved chunk also appears in, keyed by chunk id."""
+        ids = [chunk.id for chunk in chunks if getattr(chunk, "id", None)]
+        if self.deduplicator is None or not ids:
+            return {}
+        return self.deduplicator.provenance(ids)
     
-    def _format_context(self, chunks):
+    def _format_context(self, chunks, duplicates: Optional[Dict[str, List[dict]]] = None):
         """Format retrieved chunks into context string with citations."""
+        duplicates = duplicates or {}
         context_parts = []
         for i, chunk in enumerate(chunks, 1):
             file_name = chunk.metadata.get('file_name', 'Unknown')
@@ -38,6 +55,11 @@ class RAGQuerySystem:
             citation = f"[Source {i}: {file_name}"
             if page:
                 citation += f", Page {page}"
+            also_in = sorted({
+                meta.get('file_name', 'Unknown') for meta in duplicates.get(getattr(chunk, "id", None), [])
+            } - {file_name})
+            if also_in:
+                citation += f"; also in {', '.join(also_in)}"
             citation += "]"
             
             context_parts.append(f"{citation}\n{chunk.page_content}")
@@ -94,7 +116,8 @@ class RAGQuerySystem:
             }
         
         # Step 2: Format context and generate prompt
-        context = self._format_context(chunks)
+        duplicates = self._duplicate_sources(chunks)
+        context = self._format_context(chunks, duplicates)
         prompt = get_rag_prompt(context, question)
         
         # Step 3: Generate answer
@@ -119,6 +142,12 @@ class RAGQuerySystem:
             citation = {"source": chunk.metadata.get('file_name', 'Unknown')}
             if chunk.metadata.get('page'):
                 citation["page"] = chunk.metadata['page']
+            also_in = [
+                {"source": meta.get('file_name', 'Unknown'), **({"page": meta['page']} if meta.get('page') else {})}
+                for meta in duplicates.get(getattr(chunk, "id", None), [])
+            ]
+            if also_in:
+                citation["also_in"] = also_in
             citations.append(citation)
         
         return {
@@ -0,0 +1,23 @@
+import sys
+import time
+from pathlib import Path
+
+parent_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(parent_dir))
+
+from rag_query.hybrid_search import RAG
+
+collection_name = sys.argv[1] if len(sys.argv) > 1 else "documents"
+index_dir = parent_dir / "bm25_index" / collection_name
+
+rag = RAG(
+    collection_name=collection_name,
+    bm25_backend="inverted",
+    bm25_index_dir=str(index_dir)
+)
+
+print(f"Building BM25 index for collection '{collection_name}'...")
+start = time.time()
+rag.rebuild_bm25_index()
+print(f"  ✓ Indexed {rag._bm25_index.corpus_size} chunks, {len(rag._bm25_index.vocabulary)} terms")
+print(f"  ✓ Saved to: {index_dir} ({time.time() - start:.1f}s)")
@@ -1,5 +1,5 @@
+import os
 import sys
-import time
 from pathlib import Path
 
 parent_dir = Path(__file__).parent.parent
@@ -7,30 +7,28 @@ sys.path.insert(0, str(parent_dir))
 
 from data_ingestion.inject_data import RAGSystem
 
-rag = RAGSystem(collection_name="documents", use_cloud=True)
+# Files are parsed and chunked on every core; repeated boilerplate (disclaimers, headers) is stored once
+rag = RAGSystem(
+    collection_name="documents",
+    use_cloud=True,
+    load_workers=os.cpu_count() or 1,
+    dedup_threshold=0.9
+)
 print("Using Cloud ChromaDB instance")
 
-data_files = list((parent_dir / "data").glob("*.txt"))
-print(f"Processing {len(data_files)} files...\n")
+data_dir = parent_dir / "data"
+print(f"Syncing {data_dir}...\n")
 
-all_ids = []
-rate_limit_delay = 21  
-
-for i, file_path in enumerate(data_files, 1):
-    print(f"[{i}/{len(data_files)}] Processing: {file_path.name}...")
-    try:
-        ids = rag.add_documents(file_path, auto_chunk=True)
-        all_ids.extend(ids)
-        print(f"  ✓ Added {len(ids)} chunks")
-        
-        if i < len(data_files):
-            print(f"  ⏳ Waiting {rate_limit_delay} seconds (rate limit)...\n")
-            time.sleep(rate_limit_delay)
-    except Exception as e:
-        print(f"  ✗ Error: {e}\n")
-        if i < len(data_files):
-            print(f"  ⏳ Waiting {rate_limit_delay} seconds before retry...\n")
-            time.sleep(rate_limit_delay)
+# Voyage rate limits (VOYAGE_RPM / VOYAGE_TPM) are enforced by the embedding dispatcher.
+# The ingestion manifest skips unchanged files, and chunk ids are derived from content,
+# so a re-run only embeds and writes what changed since the last one
+report = rag.sync_directory(data_dir, "*.txt")
+for outcome in ("added", "updated", "removed"):
+    for path in report[outcome]:
+        print(f"  ✓ {outcome.capitalize()}: {Path(path).name}")
 
 print(f"\n{'='*60}")
-print(f"Complete! Added {len(all_ids)} total chunks from {len(data_files)} files")
\ No newline at end of file
+print(
+    f"Complete! {len(report['added'])} added, {len(report['updated'])} updated, "
+    f"{len(report['removed'])} removed, {len(report['unchanged'])} unchanged files"
+)
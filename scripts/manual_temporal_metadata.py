@@ -1,6 +1,10 @@
 """
 Manually curated temporal metadata for all documents.
 Based on content analysis of each file.
+
+Optional: during ingestion, files without an entry here are dated from labels in
+their text such as "Last Updated: January 2026" (see data_ingestion/date_extractor.py).
+Curated content dates take precedence over extracted file dates.
 """
 
 from datetime import datetime
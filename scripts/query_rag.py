@@ -1,5 +1,4 @@
 import sys
-import time
 from pathlib import Path
 from rag_query.rag import RAG
 
@@ -7,26 +6,11 @@ from rag_query.rag import RAG
 parent_dir = Path(__file__).parent.parent
 sys.path.insert(0, str(parent_dir))
 
-# Rate limiting for Voyage AI (3 RPM = 20 seconds between requests)
-rate_limit_delay = 21
-last_query_time = 0
-
+# 429s from Voyage are retried inside EmbeddingProvider; set VOYAGE_RPM / VOYAGE_TPM to pace requests client-side
 rag = RAG(
     collection_name="documents"
 )
 
-def rate_limit_check():
-    global last_query_time
-    current_time = time.time()
-    time_since_last = current_time - last_query_time
-    
-    if time_since_last < rate_limit_delay:
-        wait_time = rate_limit_delay - time_since_last
-        print(f"⏳ Rate limiting: waiting {wait_time:.1f} seconds...")
-        time.sleep(wait_time)
-    
-    last_query_time = time.time()
-
 # Test queries
 test_queries = [
     "What is the engineering team structure?",
@@ -43,7 +27,6 @@ for i, question in enumerate(test_queries, 1):
     # Vector search (requires embedding call)
     print("\n[Vector Search Results - Top 3]")
     print("-"*70)
-    rate_limit_check()
     results = rag.query(question, k=3)
     
     for j, doc in enumerate(results, 1):
@@ -55,7 +38,6 @@ for i, question in enumerate(test_queries, 1):
     # Hybrid search (now integrated in query method)
     print("\n[Hybrid Search Results (Vector + BM25) - Top 3]")
     print("-"*70)
-    rate_limit_check()
     hybrid_results = rag.query(question, k=3, hybrid_alpha=0.5)
     
     for j, doc in enumerate(hybrid_results, 1):
@@ -86,7 +68,6 @@ while True:
     
     print(f"\n[Top {k} Results - Vector Search]")
     print("-"*70)
-    rate_limit_check()
     results = rag.query(question, k=k)
     
     for i, doc in enumerate(results, 1):
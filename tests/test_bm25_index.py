@@ -0,0 +1,73 @@
+import random
+
+import numpy as np
+import pytest
+from rank_bm25 import BM25Okapi
+
+from rag_query.bm25_index import BM25Index, max_score_top_k
+
+VOCABULARY = [f"t{i}" for i in range(40)]
+
+
+def random_corpus(rng: random.Random, size: int):
+    # "common" is in most documents, so its idf is negative and falls to the epsilon floor
+    docs = []
+    for _ in range(size):
+        tokens = [rng.choice(VOCABULARY[:rng.randint(5, 40)]) for _ in range(rng.randint(1, 30))]
+        if rng.random() < 0.8:
+            tokens.append("common")
+        docs.append(tokens)
+    return docs
+
+
+def random_query(rng: random.Random):
+    return [rng.choice(VOCABULARY + ["common", "missing"]) for _ in range(rng.randint(1, 6))]
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_scores_match_bm25okapi(seed):
+    rng = random.Random(seed)
+    docs = random_corpus(rng, rng.randint(1, 60))
+    index, reference = BM25Index(docs), BM25Okapi(docs)
+    queries = [random_query(rng) for _ in range(5)]
+    doc_ids = np.array([rng.randrange(len(docs)) for _ in range(10)])
+
+    expected = np.array([reference.get_scores(query) for query in queries])
+    for query, row in zip(queries, expected):
+        assert np.allclose(index.get_scores(query), row)
+        assert np.allclose(index.score_documents(query, doc_ids), row[doc_ids])
+    assert np.allclose(index.score_batch(queries), expected)
+    assert np.allclose(index.score_batch(queries, doc_ids), expected[:, doc_ids])
+
+
+def test_epsilon_floor_matches_bm25okapi():
+    docs = [["common", "a"], ["common", "b"], ["common", "c"], ["d"]]
+    index, reference = BM25Index(docs), BM25Okapi(docs)
+    assert np.allclose(index.get_scores(["common"]), reference.get_scores(["common"]))
+    assert index.idf[index.vocabulary["common"]] == pytest.approx(reference.idf["common"])
+
+
+def exhaustive_top_k(scores: np.ndarray, matched: np.ndarray, k: int):
+    docs = np.flatnonzero(matched)
+    return np.sort(scores[docs])[::-1][:k]
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_max_score_top_k_equals_exhaustive_scoring(seed):
+    rng = random.Random(seed)
+    docs = random_corpus(rng, rng.randint(1, 200))
+    index = BM25Index(docs)
+    for _ in range(5):
+        query = random_query(rng)
+        k = rng.randint(1, 20)
+        top_docs, top_scores = index.top_k(query, k)
+
+        scores = index.get_scores(query)
+        matched = np.array([any(term in doc for term in query) for doc in docs])
+        assert np.allclose(top_scores, exhaustive_top_k(scores, matched, k))
+        assert np.allclose(scores[top_docs], top_scores)
+
+
+def test_max_score_top_k_without_sources():
+    docs, scores = max_score_top_k([], 5, 10)
+    assert docs.size == 0 and scores.size == 0
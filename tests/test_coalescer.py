@@ -0,0 +1,83 @@
+import threading
+
+import pytest
+
+from data_ingestion.coalescer import QueryCoalescer
+
+
+def run_concurrently(coalescer, texts):
+    results = [None] * len(texts)
+    errors = [None] * len(texts)
+    start = threading.Barrier(len(texts))
+
+    def worker(i):
+        start.wait()
+        try:
+            results[i] = coalescer.embed(texts[i])
+        except Exception as e:
+            errors[i] = e
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(len(texts))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=10)
+    return results, errors
+
+
+def test_concurrent_queries_share_one_batch():
+    batches = []
+
+    def embed_batch(texts):
+        batches.append(list(texts))
+        return [[float(len(text))] for text in texts]
+
+    # The batch is sent as soon as it is full, well before max_wait
+    coalescer = QueryCoalescer(embed_batch, max_wait=5.0, max_batch_size=4)
+    results, errors = run_concurrently(coalescer, ["a", "bb", "ccc", "dddd"])
+    assert errors == [None] * 4
+    assert results == [[1.0], [2.0], [3.0], [4.0]]
+    assert len(batches) == 1 and sorted(batches[0]) == ["a", "bb", "ccc", "dddd"]
+    assert coalescer.batches == 1 and coalescer.queries == 4
+
+
+def test_identical_queries_are_embedded_once():
+    batches = []
+
+    def embed_batch(texts):
+        batches.append(list(texts))
+        return [[1.0] for _ in texts]
+
+    coalescer = QueryCoalescer(embed_batch, max_wait=5.0, max_batch_size=3)
+    results, _ = run_concurrently(coalescer, ["same", "same", "same"])
+    assert results == [[1.0]] * 3
+    assert batches == [["same"]]
+
+
+def test_batches_are_bounded_by_max_batch_size():
+    sizes = []
+
+    def embed_batch(texts):
+        sizes.append(len(texts))
+        return [[0.0] for _ in texts]
+
+    coalescer = QueryCoalescer(embed_batch, max_wait=0.05, max_batch_size=2)
+    results, errors = run_concurrently(coalescer, [f"q{i}" for i in range(7)])
+    assert all(result == [0.0] for result in results) and errors == [None] * 7
+    assert max(sizes) <= 2 and sum(sizes) == 7
+
+
+def test_errors_reach_every_caller_of_the_batch():
+    def embed_batch(texts):
+        raise RuntimeError("api down")
+
+    coalescer = QueryCoalescer(embed_batch, max_wait=5.0, max_batch_size=3)
+    results, errors = run_concurrently(coalescer, ["a", "b", "c"])
+    assert results == [None] * 3
+    assert all(isinstance(error, RuntimeError) for error in errors)
+
+
+def test_a_single_query_waits_at_most_max_wait():
+    coalescer = QueryCoalescer(lambda texts: [[2.0] for _ in texts], max_wait=0.01)
+    assert coalescer.embed("alone") == [2.0]
+    assert coalescer.batches == 1
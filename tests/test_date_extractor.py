@@ -0,0 +1,49 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from data_ingestion.date_extractor import DateExtractor
+
+DATA = Path(__file__).parent.parent / "data"
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Last Updated: January 2026", "2026-01-01T00:00:00"),
+    ("Effective Date: March 15, 2025", "2025-03-15T00:00:00"),
+    ("Effective as of 1 February 2024", "2024-02-01T00:00:00"),
+    ("Reporting Period: October 1, 2024 - December 31, 2024", "2024-10-01T00:00:00"),
+    ("Revision date - 2023-07-09", "2023-07-09T00:00:00"),
+    ("Published on Sept. 3rd, 2022", "2022-09-03T00:00:00"),
+])
+def test_chunk_date_reads_labelled_dates(text, expected):
+    assert DateExtractor().chunk_date(f"Intro line.\n{text}\nBody text.") == expected
+
+
+@pytest.mark.parametrize("text", [
+    "As of March 2021 the company had 40 employees.",
+    "The contract dated June 5, 2019 was renewed.",
+    "Revenue grew 20% compared to Q3 2023.",
+    "Submit reports by March 31, 2025.",
+    "Last updated: February 30, 2024",
+    "Last updated: January 1850",
+])
+def test_chunk_date_ignores_running_text_and_invalid_dates(text):
+    assert DateExtractor().chunk_date(text) is None
+
+
+def test_document_date_uses_header_quarter():
+    text = "2Care Q4 2024 Financial Report\n\nRevenue grew compared to Q3 2024."
+    assert DateExtractor().document_date(text) == "2024-10-01T00:00:00"
+    assert DateExtractor(header_chars=5).document_date(text) is None
+
+
+def test_document_dates_agree_with_curated_metadata():
+    curated = json.loads((DATA / "temporal_metadata.json").read_text(encoding="utf-8"))
+    extractor = DateExtractor()
+    found = 0
+    for file_name, metadata in curated.items():
+        date = extractor.document_date((DATA / file_name).read_text(encoding="utf-8"))
+        assert date in (None, metadata["content_date"]), file_name
+        found += date is not None
+    assert found >= len(curated) - 1
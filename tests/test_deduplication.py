@@ -0,0 +1,101 @@
+import pytest
+from langchain_core.documents import Document
+
+from data_ingestion.deduplication import ChunkDeduplicator, MinHasher
+
+WORDS = (
+    "the quarterly storage report shows revenue growth across every region while support "
+    "costs fell after the migration to the new ticketing system and the team hired two "
+    "engineers to cover weekend incidents and reduce the backlog of customer escalations"
+).split()
+BASE = " ".join(WORDS)
+# One word changed out of thirty-four
+NEAR = " ".join(WORDS[:-3] + ["complaints"] + WORDS[-2:])
+OTHER = "holiday calendar lists office closures for the winter break and the spring public holidays"
+
+
+@pytest.fixture
+def dedup(tmp_path):
+    return ChunkDeduplicator(tmp_path / "dedup.sqlite", "collection", threshold=0.7)
+
+
+def doc(chunk_id, text, **metadata):
+    return Document(page_content=text, metadata={"source": chunk_id, **metadata}, id=chunk_id)
+
+
+def test_near_duplicate_similarity_is_estimated():
+    hasher = MinHasher()
+    base, near, other = hasher.signature(BASE), hasher.signature(NEAR), hasher.signature(OTHER)
+    assert 0.7 <= (base == near).mean() < 1.0
+    assert (base == other).mean() < 0.1
+    assert hasher.signature("...") is None
+
+
+def test_filter_skips_near_duplicates(dedup):
+    duplicates, indexed = [], []
+    kept = list(dedup.filter([doc("a", BASE), doc("b", NEAR), doc("c", OTHER)], duplicates, indexed))
+    assert [document.id for document in kept] == ["a", "c"]
+    assert duplicates == ["b"]
+    assert indexed == ["a", "c"]
+
+    # Seen again: kept chunks pass, duplicates stay skipped, nothing is newly recorded
+    duplicates, indexed = [], []
+    kept = list(dedup.filter([doc("a", BASE), doc("b", NEAR)], duplicates, indexed))
+    assert [document.id for document in kept] == ["a"]
+    assert duplicates == [] and indexed == []
+
+
+def test_documents_without_ids_or_words_pass_through(dedup):
+    documents = [Document(page_content=BASE), doc("a", BASE), doc("punct", "?!")]
+    assert len(list(dedup.filter(documents))) == 3
+
+
+def test_forget_returns_orphaned_duplicates(dedup):
+    list(dedup.filter([doc("a", BASE), doc("b", NEAR, team="ops")]))
+    orphans = dedup.forget(["a"])
+    assert [(orphan.id, orphan.page_content, orphan.metadata) for orphan in orphans] == [
+        ("b", NEAR, {"source": "b", "team": "ops"})
+    ]
+    # The orphan is no longer linked, so ingesting it again keeps it
+    assert [document.id for document in dedup.filter(orphans)] == ["b"]
+
+
+def test_forget_skips_duplicates_deleted_together(dedup):
+    list(dedup.filter([doc("a", BASE), doc("b", NEAR)]))
+    assert dedup.forget(["a", "b"]) == []
+    assert dedup.provenance(["a"]) == {}
+
+
+def test_forget_undoes_a_failed_write(dedup):
+    duplicates, indexed = [], []
+    list(dedup.filter([doc("a", BASE), doc("b", NEAR)], duplicates, indexed))
+    dedup.forget(indexed + duplicates)
+    # Nothing recorded by the failed write remains; the retry decides afresh
+    duplicates, indexed = [], []
+    assert [document.id for document in dedup.filter([doc("b", NEAR)], duplicates, indexed)] == ["b"]
+    assert indexed == ["b"] and duplicates == []
+
+
+def test_provenance_lists_the_sources_a_chunk_stands_in_for(dedup):
+    list(dedup.filter([doc("a", BASE), doc("b", NEAR, team="ops"), doc("c", OTHER)]))
+    sources = dedup.provenance(["a", "c", "missing"])
+    assert list(sources) == ["a"]
+    [source] = sources["a"]
+    assert source["source"] == "b" and source["team"] == "ops"
+    assert 0.7 <= source["similarity"] < 1.0
+    assert dedup.provenance([]) == {}
+
+
+def test_collections_are_deduplicated_separately(tmp_path):
+    first = ChunkDeduplicator(tmp_path / "dedup.sqlite", "first", threshold=0.7)
+    second = ChunkDeduplicator(tmp_path / "dedup.sqlite", "second", threshold=0.7)
+    list(first.filter([doc("a", BASE)]))
+    assert [document.id for document in second.filter([doc("b", NEAR)])] == ["b"]
+
+
+def test_signature_settings_must_match(tmp_path):
+    ChunkDeduplicator(tmp_path / "dedup.sqlite", "collection", num_perm=128)
+    with pytest.raises(ValueError, match="num_perm=128"):
+        ChunkDeduplicator(tmp_path / "dedup.sqlite", "collection", num_perm=64)
+    with pytest.raises(ValueError):
+        ChunkDeduplicator(tmp_path / "dedup.sqlite", "other", threshold=0)
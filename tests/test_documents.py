@@ -0,0 +1,43 @@
+import pytest
+
+pytest.importorskip("langchain_community")
+
+from data_ingestion.documents import DocumentProcessor
+
+CURATED_FILE = "2care_sales_playbook.txt"
+CURATED_DATE = "2025-01-01T00:00:00"
+LABELLED = "Team update.\nLast Updated: March 2021\nAs of March 2021 the team had four engineers."
+
+
+def test_labelled_chunk_date_does_not_replace_curated_date(tmp_path):
+    path = tmp_path / CURATED_FILE
+    path.write_text(LABELLED, encoding="utf-8")
+    chunks = DocumentProcessor(chunk_size=200, chunk_overlap=0).load_file(path)
+    assert {chunk.metadata["content_date"] for chunk in chunks} == {CURATED_DATE}
+
+
+def test_labelled_chunk_date_does_not_replace_caller_date():
+    chunks = DocumentProcessor().load_text(LABELLED, metadata={"content_date": "2024-06-01T00:00:00"})
+    assert chunks[0].metadata["content_date"] == "2024-06-01T00:00:00"
+
+
+def test_labelled_chunk_date_does_not_replace_header_date(tmp_path):
+    path = tmp_path / "uncurated_report.txt"
+    body = "\n\n".join(["Filler paragraph about the product roadmap and staffing. " * 4] * 4)
+    path.write_text(f"Last Updated: January 2026\n\n{body}\n\nRevised on March 2021", encoding="utf-8")
+    chunks = DocumentProcessor(chunk_size=300, chunk_overlap=0).load_file(path)
+    assert len(chunks) > 1
+    assert {chunk.metadata["content_date"] for chunk in chunks} == {"2026-01-01T00:00:00"}
+
+
+def test_chunks_of_undated_text_take_their_labelled_date():
+    text = "Notes without a header.\n\n" + "x " * 600 + "\n\nPublished on May 4, 2023\nClosing remarks."
+    chunks = DocumentProcessor(chunk_size=200, chunk_overlap=0).load_text(text)
+    dated = [chunk for chunk in chunks if "Published" in chunk.page_content]
+    assert dated and dated[0].metadata["content_date"] == "2023-05-04T00:00:00"
+    assert all("content_date" not in chunk.metadata for chunk in chunks if "Published" not in chunk.page_content)
+
+
+def test_extraction_can_be_disabled():
+    chunks = DocumentProcessor(extract_dates=False).load_text(LABELLED)
+    assert "content_date" not in chunks[0].metadata
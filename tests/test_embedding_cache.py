@@ -0,0 +1,81 @@
+import pytest
+
+pytest.importorskip("langchain_voyageai")
+
+from langchain_voyageai import VoyageAIEmbeddings
+
+from data_ingestion import rate_limiter
+from data_ingestion.embedding_cache import CachedEmbeddings, QueryEmbeddingCache
+from data_ingestion.rate_limiter import EmbeddingDispatcher
+from data_ingestion.token_counter import TokenCounter
+
+
+class FakeResult:
+    def __init__(self, embeddings):
+        self.embeddings = embeddings
+
+
+@pytest.fixture
+def cached(monkeypatch):
+    # Budgets use the local estimate; the tokenizer would be fetched from the Hub
+    monkeypatch.setattr(rate_limiter, "get_token_counter", lambda model: TokenCounter(model))
+    embeddings = VoyageAIEmbeddings(api_key="test-key", model="voyage-3", output_dimension=256, truncation=False)
+    return CachedEmbeddings(
+        embeddings,
+        "voyage-3",
+        QueryEmbeddingCache(),
+        dispatcher=EmbeddingDispatcher(rpm=None, tpm=None, model="voyage-3"),
+        query_batch_wait=0.0
+    )
+
+
+def test_query_batches_send_the_wrapper_settings(cached, monkeypatch):
+    requests = []
+
+    def embed(texts, **options):
+        requests.append((list(texts), options))
+        return FakeResult([[float(i)] for i in range(len(texts))])
+
+    monkeypatch.setattr(cached.query_client, "embed", embed)
+    assert cached.embed_queries(["first", "second", "first"]) == [[0.0], [1.0], [0.0]]
+    assert requests == [(
+        ["first", "second"],
+        {"model": "voyage-3", "input_type": "query", "truncation": False, "output_dimension": 256}
+    )]
+    # Answered from the cache afterwards
+    assert cached.embed_query("second") == [1.0]
+    assert len(requests) == 1
+
+
+def test_documents_go_through_the_public_wrapper(cached, monkeypatch):
+    calls = []
+
+    def embed_documents(self, texts):
+        calls.append(list(texts))
+        return [[float(len(text))] for text in texts]
+
+    monkeypatch.setattr(VoyageAIEmbeddings, "embed_documents", embed_documents)
+    assert cached.embed_documents(["a", "bb", "a"]) == [[1.0], [2.0], [1.0]]
+    assert calls == [["a", "bb", "a"]]
+
+
+def test_contextualized_models_embed_queries_one_at_a_time(monkeypatch):
+    monkeypatch.setattr(rate_limiter, "get_token_counter", lambda model: TokenCounter(model))
+    embeddings = VoyageAIEmbeddings(api_key="test-key", model="voyage-context-3")
+    cached = CachedEmbeddings(
+        embeddings,
+        "voyage-context-3",
+        QueryEmbeddingCache(),
+        dispatcher=EmbeddingDispatcher(rpm=None, tpm=None, model="voyage-context-3"),
+        query_batch_wait=0.0
+    )
+    assert cached.query_client is None
+    calls = []
+
+    def embed_query(self, text):
+        calls.append(text)
+        return [1.0]
+
+    monkeypatch.setattr(VoyageAIEmbeddings, "embed_query", embed_query)
+    assert cached.embed_queries(["a", "b"]) == [[1.0], [1.0]]
+    assert calls == ["a", "b"]
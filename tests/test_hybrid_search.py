@@ -0,0 +1,160 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("chromadb")
+pytest.importorskip("langchain_chroma")
+
+from rag_query import fusion, index_store
+from rag_query.hybrid_search import RAG
+
+
+@pytest.fixture(autouse=True)
+def isolated_catalog(tmp_path, monkeypatch):
+    monkeypatch.setenv("STATS_CATALOG_PATH", str(tmp_path / "catalog.sqlite"))
+
+
+def make_rag(tmp_path, **kwargs):
+    return RAG(
+        collection_name="docs",
+        embedding_provider="local",
+        embedding_model="hash-64",
+        persist_directory=str(tmp_path / "chroma"),
+        use_cloud=False,
+        bm25_backend="inverted",
+        bm25_index_dir=str(tmp_path / "index"),
+        **kwargs
+    )
+
+
+def raw_upsert(rag, ids, texts, metadatas=None):
+    """Write to the collection without VectorStore, like another process would."""
+    rag.vector_store.get_collection().upsert(
+        ids=ids,
+        documents=texts,
+        metadatas=metadatas or [{"source": "s"}] * len(ids),
+        embeddings=rag.embedding_provider.embeddings.embed_documents(texts)
+    )
+
+
+TEXTS = [
+    "quarterly revenue grew in the storage division",
+    "the onboarding guide covers laptops and badges",
+    "security policy requires two factor authentication",
+    "holiday calendar lists office closures"
+]
+
+
+def test_saved_index_is_reused_when_collection_unchanged(tmp_path):
+    rag = make_rag(tmp_path)
+    raw_upsert(rag, [f"id{i}" for i in range(len(TEXTS))], TEXTS)
+    rag._build_bm25_index()
+    assert index_store.index_exists(tmp_path / "index")
+
+    reopened = make_rag(tmp_path)
+    reopened.rebuild_bm25_index = lambda: pytest.fail("an up-to-date saved index was rebuilt")
+    reopened._build_bm25_index()
+    assert reopened._position_of("id2") is not None
+
+
+def test_saved_index_is_rebuilt_after_same_count_replace(tmp_path):
+    rag = make_rag(tmp_path)
+    raw_upsert(rag, [f"id{i}" for i in range(len(TEXTS))], TEXTS)
+    rag._build_bm25_index()
+
+    # Another process replaces one chunk with a new one; the count is unchanged
+    rag.vector_store.get_collection().delete(ids=["id0"])
+    raw_upsert(rag, ["id_new"], ["penguins migrate across the glacier"])
+
+    reopened = make_rag(tmp_path)
+    reopened._build_bm25_index()
+    assert reopened._position_of("id0") is None
+    assert reopened._position_of("id_new") is not None
+
+    results = reopened.query("penguins glacier", k=1, recency_boost=False, hybrid_alpha=0.0)
+    assert [doc.id for doc in results] == ["id_new"]
+    assert "id0" not in [doc.id for doc in reopened.query("quarterly revenue", k=4, recency_boost=False)]
+
+    meta = index_store.read_meta(tmp_path / "index")["collection"]
+    assert meta["ids_sha256"] == index_store.ids_fingerprint(["id_new", "id1", "id2", "id3"])
+
+
+def test_ids_fingerprint_ignores_order():
+    assert index_store.ids_fingerprint(["b", "a", "c"]) == index_store.ids_fingerprint(["c", "b", "a"])
+    assert index_store.ids_fingerprint(["a", "b"]) != index_store.ids_fingerprint(["a", "c"])
+    assert index_store.ids_fingerprint(["ab"]) != index_store.ids_fingerprint(["a", "b"])
+
+
+def random_corpus(rng, size):
+    vocab = [f"w{i}" for i in range(40)]
+    texts, metadatas = [], []
+    for i in range(size):
+        if texts and rng.random() < 0.2:
+            # Exact copies tie in keyword score, including at the top-k boundary
+            texts.append(texts[rng.integers(len(texts))])
+        else:
+            length = int(rng.integers(3, 12))
+            texts.append(" ".join(rng.choice(vocab, length)) + f" filler{i}")
+        metadata = {"source": f"s{i % 3}"}
+        if rng.random() < 0.8:
+            metadata["content_date"] = f"{rng.integers(2015, 2026)}-{rng.integers(1, 13):02d}-01T00:00:00"
+        metadatas.append(metadata)
+    return texts, metadatas
+
+
+@pytest.mark.parametrize("seed", range(12))
+def test_pruned_ranking_matches_exhaustive(tmp_path, seed):
+    rng = np.random.default_rng(seed)
+    exhaustive = make_rag(tmp_path)
+    pruned = make_rag(tmp_path, bm25_pruning=True)
+    texts, metadatas = random_corpus(rng, int(rng.integers(30, 120)))
+    raw_upsert(exhaustive, [f"id{i}" for i in range(len(texts))], texts, metadatas)
+
+    for _ in range(20):
+        question = " ".join(f"w{term}" for term in rng.integers(0, 40, int(rng.integers(1, 4))))
+        options = dict(
+            k=int(rng.integers(1, 6)),
+            recency_boost=bool(rng.random() < 0.7),
+            hybrid_alpha=float(rng.choice([0.0, 0.3, 0.5, 0.9]))
+        )
+        expected = [doc.id for doc in exhaustive.query(question, **options)]
+        assert [doc.id for doc in pruned.query(question, **options)] == expected, (question, options)
+
+
+def test_date_ranged_query_searches_vectors_once_including_undated(tmp_path):
+    rag = make_rag(tmp_path)
+    raw_upsert(rag, ["old", "new", "undated"], [
+        "storage revenue report",
+        "storage revenue report for this year",
+        "storage revenue report without a date"
+    ], [
+        {"source": "s", "content_date": "2019-05-01T00:00:00"},
+        {"source": "s", "content_date": "2024-05-01T00:00:00"},
+        {"source": "s"}
+    ])
+    searches = []
+    search = rag.vector_store.similarity_search_ids_by_vectors
+
+    def recording_search(embeddings, k, filter=None):
+        results = search(embeddings, k=k, filter=filter)
+        searches.append((filter, [doc_id for doc_id, _ in results[0]]))
+        return results
+
+    rag.vector_store.similarity_search_ids_by_vectors = recording_search
+    results = rag.query("storage revenue", k=3, date_range={"start": "2024-01-01"}, recency_boost=False)
+    assert [doc.id for doc in results] == ["new", "undated"]
+    [(vector_filter, hits)] = searches
+    assert vector_filter == {"content_date": {"$nin": ["2019-05-01T00:00:00"]}}
+    assert sorted(hits) == ["new", "undated"]
+
+
+def test_date_filter_lists_dates_in_range_without_undated_chunks(tmp_path):
+    rag = make_rag(tmp_path)
+    raw_upsert(rag, ["old", "new"], ["storage revenue", "storage revenue report"], [
+        {"source": "s", "content_date": "2019-05-01T00:00:00"},
+        {"source": "s", "content_date": "2024-05-01T00:00:00"}
+    ])
+    rag._build_bm25_index()
+    window = rag._columns.date_window(fusion.to_epoch_day("2024-01-01"), None)
+    assert rag._date_filter({"source": "s"}, window) == {
+        "$and": [{"source": "s"}, {"content_date": {"$in": ["2024-05-01T00:00:00"]}}]
+    }
@@ -0,0 +1,70 @@
+import random
+
+import numpy as np
+import pytest
+from rank_bm25 import BM25Okapi
+
+from rag_query.bm25_index import BM25Index
+from rag_query.incremental_index import IncrementalBM25Index
+
+VOCABULARY = [f"t{i}" for i in range(30)] + ["common"]
+
+
+def random_doc(rng: random.Random):
+    return [rng.choice(VOCABULARY) for _ in range(rng.randint(1, 25))]
+
+
+def assert_matches_rebuild(index: IncrementalBM25Index, docs, live, queries):
+    """Scores of live positions equal a BM25Okapi rebuilt over the live documents only."""
+    live_positions = [position for position in range(len(docs)) if live[position]]
+    reference = BM25Okapi([docs[position] for position in live_positions])
+    for query in queries:
+        scores = index.get_scores(query)
+        assert np.allclose(scores[live_positions], reference.get_scores(query))
+        assert not scores[[position for position in range(len(docs)) if not live[position]]].any()
+
+        k = 5
+        top_docs, top_scores = index.top_k(query, k)
+        assert all(live[position] for position in top_docs)
+        assert np.allclose(scores[top_docs], top_scores)
+
+
+@pytest.mark.parametrize("seed", range(15))
+@pytest.mark.parametrize("with_base", [False, True])
+def test_incremental_scores_equal_rebuild_over_live_documents(seed, with_base):
+    rng = random.Random(seed)
+    docs = [random_doc(rng) for _ in range(rng.randint(2, 30))]
+    base = BM25Index(docs) if with_base else None
+    index = IncrementalBM25Index(base, max_segments=2, background_merge=False)
+    if not with_base:
+        index.add_documents(docs)
+    live = [True] * len(docs)
+
+    for _ in range(8):
+        if rng.random() < 0.6:
+            added = [random_doc(rng) for _ in range(rng.randint(1, 6))]
+            positions = index.add_documents(added)
+            assert positions.tolist() == list(range(len(docs), len(docs) + len(added)))
+            docs.extend(added)
+            live.extend([True] * len(added))
+        else:
+            candidates = [position for position in range(len(docs)) if live[position]]
+            removed = rng.sample(candidates, min(len(candidates) - 1, rng.randint(1, 4)))
+            index.remove_documents(removed, [docs[position] for position in removed])
+            for position in removed:
+                live[position] = False
+        queries = [[rng.choice(VOCABULARY) for _ in range(rng.randint(1, 4))] for _ in range(3)]
+        assert_matches_rebuild(index, docs, live, queries)
+
+    index.merge()
+    assert_matches_rebuild(index, docs, live, [["common"], ["t1", "t2", "t2"]])
+
+
+def test_query_after_merge_published_between_refresh_and_snapshot():
+    docs = [["a", "b"], ["b", "c"], ["c", "d"], ["d", "a"]]
+    index = IncrementalBM25Index(max_segments=10, background_merge=False)
+    for doc in docs:
+        index.add_documents([doc])
+    index._refresh()
+    index.merge()
+    assert np.allclose(index.get_scores(["a"]), BM25Okapi(docs).get_scores(["a"]))
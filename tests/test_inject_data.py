@@ -0,0 +1,116 @@
+import pytest
+
+pytest.importorskip("chromadb")
+pytest.importorskip("langchain_chroma")
+
+from data_ingestion.inject_data import RAGSystem
+
+
+@pytest.fixture
+def rag(tmp_path, monkeypatch):
+    monkeypatch.setenv("STATS_CATALOG_PATH", str(tmp_path / "catalog.sqlite"))
+    return RAGSystem(
+        collection_name="docs",
+        embedding_provider="local",
+        embedding_model="hash-64",
+        chunk_size=200,
+        chunk_overlap=0,
+        persist_directory=str(tmp_path / "chroma"),
+        use_cloud=False,
+        manifest_path=str(tmp_path / "manifest.sqlite")
+    )
+
+
+def stored(rag):
+    data = rag.vector_store.get_collection().get(include=["documents", "metadatas"])
+    return list(zip(data["ids"], data["documents"], data["metadatas"]))
+
+
+def test_add_texts_keeps_identical_texts_with_different_metadata(rag):
+    ids = rag.add_texts(["same text", "same text"], metadatas=[{"team": "a"}, {"team": "b"}])
+    assert len(set(ids)) == 2
+    assert sorted(metadata["team"] for _, _, metadata in stored(rag)) == ["a", "b"]
+
+
+def test_add_texts_applies_metadata_to_every_chunk_of_its_text(rag):
+    long_text = " ".join(f"word{i}" for i in range(200))
+    rag.add_texts([long_text, "short"], metadatas=[{"team": "long"}, {"team": "short"}])
+    rows = stored(rag)
+    assert len(rows) > 2
+    for _, text, metadata in rows:
+        assert metadata["team"] == ("short" if text == "short" else "long")
+
+
+def test_add_documents_rewrites_metadata_of_unchanged_content(rag, tmp_path):
+    path = tmp_path / "notes.txt"
+    path.write_text("Quarterly planning notes for the storage team.", encoding="utf-8")
+    first = rag.add_documents(str(path), metadata={"owner": "ana"})
+    second = rag.add_documents(str(path), metadata={"owner": "li"})
+    assert first == second
+    assert [metadata["owner"] for _, _, metadata in stored(rag)] == ["li"]
+
+
+NOTES = (
+    "the quarterly storage report shows revenue growth across every region while support "
+    "costs fell after the migration to the new ticketing system and the team hired two "
+    "engineers to cover weekend incidents and reduce the backlog of customer escalations"
+)
+NEAR_NOTES = NOTES.replace("escalations", "complaints")
+
+
+@pytest.fixture
+def dedup_rag(tmp_path, monkeypatch):
+    monkeypatch.setenv("STATS_CATALOG_PATH", str(tmp_path / "catalog.sqlite"))
+    return RAGSystem(
+        collection_name="docs",
+        embedding_provider="local",
+        embedding_model="hash-64",
+        chunk_size=2000,
+        chunk_overlap=0,
+        persist_directory=str(tmp_path / "chroma"),
+        use_cloud=False,
+        manifest_path=str(tmp_path / "manifest.sqlite"),
+        dedup_threshold=0.7,
+        dedup_path=str(tmp_path / "dedup.sqlite")
+    )
+
+
+def test_failed_write_does_not_record_dedup_signatures(dedup_rag, monkeypatch):
+    store = dedup_rag.vector_store
+    write = store.add_documents_stream
+
+    def failing_write(documents, **options):
+        list(documents)
+        raise ConnectionError("store unavailable")
+
+    monkeypatch.setattr(store, "add_documents_stream", failing_write)
+    with pytest.raises(ConnectionError):
+        dedup_rag.add_texts([NOTES, NEAR_NOTES])
+
+    # Nothing was stored, so on retry the first text is written rather than treated as a duplicate
+    monkeypatch.setattr(store, "add_documents_stream", write)
+    ids = dedup_rag.add_texts([NEAR_NOTES])
+    assert [text for _, text, _ in stored(dedup_rag)] == [NEAR_NOTES]
+    assert dedup_rag.deduplicator.provenance(ids) == {}
+
+
+def test_only_stored_duplicates_are_deleted(dedup_rag, monkeypatch):
+    dedup_rag.add_texts([NOTES])
+    deleted = []
+    delete = dedup_rag.vector_store.delete
+
+    def recording_delete(ids=None, filter=None):
+        deleted.append(ids)
+        delete(ids=ids, filter=filter)
+
+    monkeypatch.setattr(dedup_rag.vector_store, "delete", recording_delete)
+    dedup_rag.add_texts([NEAR_NOTES])
+    assert deleted == []
+    assert [text for _, text, _ in stored(dedup_rag)] == [NOTES]
+
+    # A near-duplicate written before deduplication saw it is removed from the store
+    [chunk] = dedup_rag.document_processor.load_texts([NEAR_NOTES + " again"])
+    dedup_rag.vector_store.add_documents_stream([chunk])
+    dedup_rag.add_texts([NEAR_NOTES + " again"])
+    assert deleted == [[chunk.id]]
+    assert [text for _, text, _ in stored(dedup_rag)] == [NOTES]
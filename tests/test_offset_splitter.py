@@ -0,0 +1,128 @@
+import hashlib
+import json
+import random
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from data_ingestion.offset_splitter import OffsetTextSplitter
+from data_ingestion.token_counter import TokenCounter
+
+# LangChain's RecursiveCharacterTextSplitter output for every case below, stored so parity
+# is checked without importing it; regenerate with `python -m tests.test_offset_splitter`
+LANGCHAIN_OUTPUTS = Path(__file__).parent / "fixtures" / "langchain_splits.json"
+
+PIECES = ["alpha", "be", "gamma", "delta", "x", "epsilonlongword", "\n", "\n\n", " ", "  ", "\t",
+          "zz" * 50, "a" * 300, "\n\n\n", " \n ", "é\U0001F600"]
+SEPARATORS = [None, ["\n\n", "\n", " ", ""], ["\n", " "], [" "], ["\n\n", "\n"], ["\n\n", "\n", " ", "", "x"]]
+CHARACTER_CASES = 300
+TOKEN_CASES = 100
+
+
+def random_text(rng: random.Random) -> str:
+    return "".join(
+        rng.choice(PIECES) if rng.random() < 0.5 else rng.choice(PIECES[:6]) + " "
+        for _ in range(rng.randint(0, 400))
+    )
+
+
+class AdditiveCounter(TokenCounter):
+    """Per-character weights (letters 1, whitespace 0, others 2), so the count of a
+    joined text is the sum over its pieces, as LangChain's merging assumes."""
+
+    def token_weights(self, codes: np.ndarray) -> np.ndarray:
+        weights = np.where(np.isin(codes, [9, 10, 32]), 0, np.where(codes < 97, 2, 1))
+        return weights.astype(np.int64)
+
+
+def character_case(seed: int):
+    rng = random.Random(seed)
+    chunk_size = rng.choice([1, 2, 5, 10, 50, 100, 300, 1000])
+    chunk_overlap = rng.randint(0, chunk_size)
+    separators = rng.choice(SEPARATORS)
+    return random_text(rng), dict(chunk_size=chunk_size, chunk_overlap=chunk_overlap, separators=separators)
+
+
+def token_case(seed: int):
+    rng = random.Random(seed)
+    chunk_size = rng.choice([1, 2, 5, 10, 50, 100, 300])
+    chunk_overlap = rng.randint(0, chunk_size)
+    separators = rng.choice(SEPARATORS[:5])
+    return random_text(rng), dict(chunk_size=chunk_size, chunk_overlap=chunk_overlap, separators=separators)
+
+
+def summary(chunks):
+    """Chunk count and a digest of the chunks, which is all the stored outputs keep."""
+    return [len(chunks), hashlib.sha256(json.dumps(chunks).encode("utf-8")).hexdigest()]
+
+
+def langchain_outputs(text_splitters):
+    counter = AdditiveCounter()
+    outputs = {"character": [], "token": []}
+    for seed in range(CHARACTER_CASES):
+        text, options = character_case(seed)
+        outputs["character"].append(summary(text_splitters.RecursiveCharacterTextSplitter(**options).split_text(text)))
+    for seed in range(TOKEN_CASES):
+        text, options = token_case(seed)
+        splitter = text_splitters.RecursiveCharacterTextSplitter(length_function=counter.count, **options)
+        outputs["token"].append(summary(splitter.split_text(text)))
+    return outputs
+
+
+@pytest.fixture(scope="module")
+def stored_outputs():
+    with open(LANGCHAIN_OUTPUTS, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+@pytest.mark.parametrize("seed", range(CHARACTER_CASES))
+def test_chunks_match_langchain(seed, stored_outputs):
+    text, options = character_case(seed)
+    splitter = OffsetTextSplitter(options["chunk_size"], options["chunk_overlap"], options["separators"])
+    chunks = splitter.split_text(text)
+    assert summary(chunks) == stored_outputs["character"][seed]
+    assert [text[start:end] for start, end in splitter.split_offsets(text)] == chunks
+
+
+@pytest.mark.parametrize("seed", range(TOKEN_CASES))
+def test_token_sized_chunks_match_langchain_length_function(seed, stored_outputs):
+    text, options = token_case(seed)
+    splitter = OffsetTextSplitter(
+        options["chunk_size"], options["chunk_overlap"], options["separators"], token_counter=AdditiveCounter()
+    )
+    assert summary(splitter.split_text(text)) == stored_outputs["token"][seed]
+
+
+def test_stored_outputs_match_installed_langchain(stored_outputs):
+    # langchain-text-splitters is a runtime dependency (requirements.txt), so this never skips
+    import langchain_text_splitters
+
+    assert langchain_outputs(langchain_text_splitters) == {
+        "character": stored_outputs["character"],
+        "token": stored_outputs["token"]
+    }
+
+
+def test_split_documents_records_offsets():
+    langchain_documents = pytest.importorskip("langchain_core.documents")
+    text = "First paragraph here.\n\nSecond paragraph follows.\n\nThird one."
+    document = langchain_documents.Document(page_content=text, metadata={"source": "s"})
+    chunks = OffsetTextSplitter(chunk_size=30, chunk_overlap=0).split_documents([document])
+    assert [chunk.page_content for chunk in chunks] == [
+        text[chunk.metadata["start_index"]:chunk.metadata["end_index"]] for chunk in chunks
+    ]
+    assert all(chunk.metadata["source"] == "s" for chunk in chunks)
+
+
+if __name__ == "__main__":
+    import langchain_text_splitters
+    from importlib.metadata import version
+
+    LANGCHAIN_OUTPUTS.parent.mkdir(exist_ok=True)
+    with open(LANGCHAIN_OUTPUTS, "w", encoding="utf-8") as f:
+        json.dump(
+            {"langchain_text_splitters": version("langchain-text-splitters"), **langchain_outputs(langchain_text_splitters)},
+            f,
+            indent=0
+        )
@@ -0,0 +1,140 @@
+import pytest
+
+from data_ingestion import rate_limiter
+from data_ingestion.rate_limiter import EmbeddingDispatcher, TokenBucket
+
+
+class FakeClock:
+    """Stands in for the time module: sleeping advances the clock instantly."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class RateLimited(Exception):
+    status_code = 429
+
+    def __init__(self, retry_after=None):
+        super().__init__("rate limited")
+        self.headers = {"retry-after": str(retry_after)} if retry_after is not None else {}
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limiter, "time", clock)
+    return clock
+
+
+def vectors(texts):
+    return [[float(len(text))] for text in texts]
+
+
+def test_bucket_refills_at_its_rate(clock):
+    bucket = TokenBucket(per_minute=60)
+    assert bucket.reserve(60) == 0.0
+    assert bucket.reserve(30) == pytest.approx(30.0)
+    clock.now += 30
+    assert bucket.reserve(6) == pytest.approx(6.0)
+    clock.now += 600
+    # Refill stops at capacity
+    assert bucket.reserve(60) == 0.0
+    assert bucket.reserve(1) == pytest.approx(1.0)
+
+
+def test_bucket_caps_reservations_at_capacity(clock):
+    bucket = TokenBucket(per_minute=60)
+    bucket.reserve(60)
+    assert bucket.reserve(1000) == pytest.approx(60.0)
+
+
+def test_drained_bucket_waits_a_full_refill(clock):
+    bucket = TokenBucket(per_minute=120)
+    bucket.drain()
+    assert bucket.reserve(120) == pytest.approx(60.0)
+
+
+def test_token_quota_delays_batches(clock):
+    dispatcher = EmbeddingDispatcher(rpm=None, tpm=100, model="hash-64")
+    dispatcher.count_tokens = lambda text: 40
+    calls = []
+
+    def embed_batch(texts):
+        calls.append(len(texts))
+        return vectors(texts)
+
+    assert dispatcher.embed(["a", "bb", "ccc", "dddd"], embed_batch) == [[1.0], [2.0], [3.0], [4.0]]
+    # Batches hold at most tpm tokens; the second one waits for 60 of them to refill
+    assert calls == [2, 2]
+    assert clock.sleeps == [pytest.approx(36.0)]
+
+
+def test_request_quota_spaces_requests(clock):
+    dispatcher = EmbeddingDispatcher(rpm=2, tpm=None, max_batch_size=1, max_concurrency=1, model="hash-64")
+    dispatcher.embed(["a", "b", "c"], vectors)
+    assert clock.sleeps == [pytest.approx(30.0)]
+
+
+def test_rate_limit_waits_retry_after_and_splits_the_batch(clock, capsys):
+    dispatcher = EmbeddingDispatcher(rpm=None, tpm=None, max_batch_size=8, model="hash-64")
+    calls = []
+
+    def embed_batch(texts):
+        calls.append(len(texts))
+        if len(calls) == 1:
+            raise RateLimited(retry_after=7)
+        return vectors(texts)
+
+    texts = ["x" * (i + 1) for i in range(8)]
+    assert dispatcher.embed(texts, embed_batch) == vectors(texts)
+    assert calls == [8, 4, 4]
+    assert clock.sleeps == [pytest.approx(7.0)]
+    assert dispatcher.rate_limited == 1
+    # Halved to 4 on the 429, then grown by one per success
+    assert dispatcher.batch_size == 6
+    assert "retrying in 7.0s" in capsys.readouterr().out
+
+
+def test_rate_limit_without_retry_after_backs_off_exponentially(clock):
+    dispatcher = EmbeddingDispatcher(rpm=None, tpm=None, max_batch_size=1, model="hash-64")
+    failures = [RateLimited(), RateLimited(), RateLimited()]
+
+    def embed_batch(texts):
+        if failures:
+            raise failures.pop()
+        return vectors(texts)
+
+    assert dispatcher.embed(["a"], embed_batch) == [[1.0]]
+    assert clock.sleeps == [pytest.approx(1.0), pytest.approx(2.0), pytest.approx(4.0)]
+
+
+def test_rate_limit_gives_up_after_max_retries(clock):
+    dispatcher = EmbeddingDispatcher(rpm=None, tpm=None, max_retries=2, model="hash-64")
+
+    def embed_batch(texts):
+        raise RateLimited(retry_after=1)
+
+    with pytest.raises(RateLimited):
+        dispatcher.embed(["a"], embed_batch)
+    assert dispatcher.rate_limited == 2
+
+
+def test_other_errors_are_not_retried(clock):
+    dispatcher = EmbeddingDispatcher(rpm=None, tpm=None, model="hash-64")
+    calls = []
+
+    def embed_batch(texts):
+        calls.append(texts)
+        raise ValueError("bad input")
+
+    with pytest.raises(ValueError):
+        dispatcher.embed(["a"], embed_batch)
+    assert len(calls) == 1 and clock.sleeps == []
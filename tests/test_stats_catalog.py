@@ -0,0 +1,82 @@
+import pytest
+
+from data_ingestion.stats_catalog import StatsCatalog
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    return StatsCatalog(tmp_path / "stats" / "catalog.sqlite", "collection")
+
+
+def test_reads_before_any_write_create_no_file(catalog):
+    assert catalog.total() == 0
+    assert catalog.stats()["metadata_keys"] == set()
+    assert catalog.stats()["content_date_range"] is None
+    assert not catalog.path.parent.exists()
+
+
+def test_first_write_creates_the_catalog(catalog):
+    catalog.on_documents_added(["a"], ["text"], [{"source": "x.txt"}])
+    assert catalog.path.exists()
+    assert catalog.total() == 1
+
+
+def test_counts_follow_adds_upserts_and_deletes(catalog):
+    catalog.on_documents_added(
+        ["a", "b", "c"],
+        ["", "", ""],
+        [
+            {"source": "x.txt", "content_date": "2024-01-01"},
+            {"source": "x.txt", "content_date": "2024-03-01"},
+            {"source": "y.txt"}
+        ]
+    )
+    stats = catalog.stats()
+    assert stats["chunks_per_source"] == {"x.txt": 2, "y.txt": 1}
+    assert stats["metadata_key_cardinality"] == {"source": 2, "content_date": 2}
+    assert stats["content_date_range"] == ("2024-01-01", "2024-03-01")
+
+    # Upserting an id replaces its previous metadata
+    catalog.on_documents_added(["c"], [""], [{"source": "x.txt"}])
+    catalog.on_documents_deleted(["b", "missing"])
+    stats = catalog.stats()
+    assert catalog.total() == 2
+    assert stats["chunks_per_source"] == {"x.txt": 2}
+    assert stats["metadata_key_counts"] == {"source": 2, "content_date": 1}
+    assert stats["content_date_range"] == ("2024-01-01", "2024-01-01")
+
+
+def test_catalog_reopens_written_file(catalog):
+    catalog.on_documents_added(["a"], [""], [{"source": "x.txt"}])
+    reopened = StatsCatalog(catalog.path, "collection")
+    assert reopened.total() == 1
+    assert StatsCatalog(catalog.path, "other").total() == 0
+
+
+def test_rebuild_replaces_the_collection_catalog(catalog):
+    catalog.on_documents_added(["stale"], [""], [{"source": "old.txt"}])
+    catalog.rebuild([{"ids": ["a", "b"], "metadatas": [{"source": "x.txt"}, None]}])
+    assert catalog.total() == 2
+    assert catalog.stats()["chunks_per_source"] == {"x.txt": 1}
+
+
+def test_vector_store_stats_without_writes(tmp_path):
+    pytest.importorskip("langchain_chroma")
+    from data_ingestion.local_embeddings import HashingEmbeddings
+    from data_ingestion.vector_store import VectorStore
+
+    path = tmp_path / "stats" / "catalog.sqlite"
+    store = VectorStore(
+        "docs", HashingEmbeddings(dimension=64), str(tmp_path / "chroma"), use_cloud=False, stats_catalog_path=str(path)
+    )
+    stats = store.get_stats()
+    assert not path.exists()
+    assert stats["total_documents"] == 0 and not stats["has_metadata"] and stats["stats_current"]
+
+    # Chunks without metadata: the collection is not empty, but there is no metadata
+    store.add_texts(["plain text"], ids=["p"])
+    assert path.exists()
+    stats = store.get_stats()
+    assert stats["has_ids"] and not stats["has_metadata"]
+    store.add_texts(["dated text"], metadatas=[{"source": "x.txt"}], ids=["d"])
+    assert store.get_stats()["has_metadata"]
@@ -0,0 +1,89 @@
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+pytest.importorskip("tokenizers")
+
+from tokenizers import Tokenizer, models, pre_tokenizers, trainers
+
+from data_ingestion import token_counter
+from data_ingestion.offset_splitter import OffsetTextSplitter
+from data_ingestion.rate_limiter import EmbeddingDispatcher
+from data_ingestion.token_counter import TokenCounter, TokenizerCounter, get_token_counter, text_codes
+
+DATA = Path(__file__).parent.parent / "data"
+
+
+@pytest.fixture(scope="module")
+def corpus():
+    return [path.read_text(encoding="utf-8") for path in sorted(DATA.glob("*.txt"))]
+
+
+@pytest.fixture(scope="module")
+def tokenizer(corpus):
+    # A small byte-level BPE trained offline stands in for the Voyage tokenizer
+    tokenizer = Tokenizer(models.BPE())
+    tokenizer.pre_tokenizer = pre_tokenizers.ByteLevel(add_prefix_space=False)
+    tokenizer.train_from_iterator(corpus, trainers.BpeTrainer(vocab_size=2000, show_progress=False))
+    return tokenizer
+
+
+@pytest.fixture
+def fresh_counters():
+    get_token_counter.cache_clear()
+    yield
+    get_token_counter.cache_clear()
+
+
+def test_prefix_counts_match_the_tokenizer(tokenizer, corpus):
+    counter = TokenizerCounter(tokenizer)
+    rng = np.random.default_rng(0)
+    for text in corpus:
+        counts = counter.prefix_counts(text_codes(text))
+        assert counts[-1] == counter.count(text) == len(tokenizer.encode(text).ids)
+        # The splitter cuts at separators, where a slice's own tokenization can
+        # differ from the full text's by at most one token at each end
+        cuts = [0] + [i for i, char in enumerate(text) if char.isspace()] + [len(text)]
+        for start, end in np.sort(rng.choice(cuts, size=(50, 2)), axis=1):
+            assert abs((counts[end] - counts[start]) - counter.count(text[start:end])) <= 2
+
+
+def test_token_sized_chunks_stay_within_budget(tokenizer, corpus):
+    counter = TokenizerCounter(tokenizer)
+    splitter = OffsetTextSplitter(chunk_size=120, chunk_overlap=20, token_counter=counter)
+    for text in corpus:
+        for chunk in splitter.split_text(text):
+            assert counter.count(chunk) <= 120 + 2
+
+
+def test_voyage_models_use_the_tokenizer_file(tokenizer, tmp_path, monkeypatch, fresh_counters):
+    path = tmp_path / "tokenizer.json"
+    tokenizer.save(str(path))
+    monkeypatch.setenv("VOYAGE_TOKENIZER_PATH", str(path))
+    counter = get_token_counter("voyage-large-2")
+    assert isinstance(counter, TokenizerCounter)
+    assert counter.max_tokens == 16000
+    assert counter.count("Quarterly revenue report") == len(tokenizer.encode("Quarterly revenue report").ids)
+
+
+def test_falls_back_to_the_estimate_when_the_tokenizer_is_unavailable(monkeypatch, capsys, fresh_counters):
+    def unavailable(model):
+        raise OSError("offline")
+
+    monkeypatch.setattr(token_counter, "_load_tokenizer", unavailable)
+    counter = get_token_counter("voyage-large-2")
+    assert type(counter) is TokenCounter
+    assert "could not load the voyage-large-2 tokenizer" in capsys.readouterr().out
+    # Models without a Voyage tokenizer use the estimate without trying to load one
+    assert type(get_token_counter("hash-64")) is TokenCounter
+
+
+def test_rate_limiter_budgets_with_the_same_counter(tokenizer, tmp_path, monkeypatch, fresh_counters):
+    path = tmp_path / "tokenizer.json"
+    tokenizer.save(str(path))
+    monkeypatch.setenv("VOYAGE_TOKENIZER_PATH", str(path))
+    dispatcher = EmbeddingDispatcher(rpm=None, tpm=None, model="voyage-large-2")
+    text = "Revenue grew 12% to $4.2M in Q4 2024."
+    assert dispatcher.count_tokens(text) == get_token_counter("voyage-large-2").count(text)
+    assert dispatcher.count_tokens("") == 1